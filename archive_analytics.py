@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Multi-day analytics over the collected archive.
+
+Scans every open_events/events_*.json and processed_markets/processed_markets_*.csv
+snapshot (in parallel, per file), caches each file's extracted frame by content
+fingerprint, then computes with vectorized group-bys:
+- per-day and per-category event counts
+- event lifetimes (first seen / last seen / days seen)
+- per-day market volume, open interest and spread series by category
+
+Usage: python archive_analytics.py [--data-dir historical_data] [--workers N]
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+import day_archive
+from file_cache import FingerprintCache
+from log_config import setup_logging
+from market_snapshot import MarketSnapshot
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Bump when the extracted columns change so stale cache entries are ignored
+CACHE_VERSION = 1
+
+EVENT_COLUMNS = ['event_ticker', 'series_ticker', 'category']
+MARKET_COLUMNS = ['ticker', 'event_ticker', 'category', 'status', 'volume', 'open_interest',
+                  'liquidity', 'bid_ask_spread', 'mid_price']
+
+
+def snapshot_date(path: str) -> str:
+    """YYYYMMDD embedded in a snapshot filename."""
+    match = re.search(r'(\d{8})', os.path.basename(path))
+    if not match:
+        raise ValueError(f"No date in snapshot filename: {path}")
+    return match.group(1)
+
+
+def load_events_snapshot(path: str) -> pd.DataFrame:
+    """Extract the columns analytics needs from one open_events snapshot."""
+    events = day_archive.load_json(path).get('events', [])
+    df = pd.DataFrame(events, columns=EVENT_COLUMNS)
+    df['category'] = df['category'].fillna('unknown').astype('category')
+    df['series_ticker'] = df['series_ticker'].astype('category')
+    return df
+
+
+def load_markets_snapshot(path: str) -> pd.DataFrame:
+    """Extract the columns analytics needs from one processed_markets CSV (or its columnar snapshot)."""
+    columnar = os.path.join(os.path.dirname(path), f"markets_{snapshot_date(path)}.cols")
+    if os.path.exists(columnar):
+        snapshot = MarketSnapshot(columnar)
+        df = snapshot.to_dataframe([c for c in MARKET_COLUMNS if c in snapshot.schema])
+    else:
+        df = pd.read_csv(path, usecols=lambda c: c in MARKET_COLUMNS, low_memory=False)
+    for column in MARKET_COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.NA
+    df = df[MARKET_COLUMNS]
+    for column in ('category', 'status'):
+        df[column] = df[column].fillna('unknown').astype('category')
+    return df
+
+
+class ArchiveAnalytics:
+    def __init__(self, data_dir: str = "historical_data", workers: Optional[int] = None):
+        self.data_dir = data_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = FingerprintCache(os.path.join(data_dir, "cache"), f"archive_analytics_v{CACHE_VERSION}")
+
+    def _load_snapshots(self, pattern: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """Load every snapshot matching pattern, parsing only files not already cached."""
+        # Past days of raw JSON may have been packed into day bundles
+        files = day_archive.list_files(self.data_dir, *os.path.split(pattern))
+        frames: Dict[str, pd.DataFrame] = {}
+        missing: List[str] = []
+        for path in files:
+            cached = self.cache.get(path)
+            if cached is None:
+                missing.append(path)
+            else:
+                frames[path] = cached
+
+        if missing:
+            logger.info("Parsing %d of %d snapshots for %s (%d cached)", len(missing), len(files),
+                        pattern, len(files) - len(missing))
+            if self.workers > 1 and len(missing) > 1:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                    parsed = list(pool.map(loader, missing))
+            else:
+                parsed = [loader(path) for path in missing]
+            for path, frame in zip(missing, parsed):
+                self.cache.put(path, frame)
+                frames[path] = frame
+            self.cache.flush()
+
+        if not frames:
+            return pd.DataFrame()
+        # The cache is keyed by content, so the snapshot date comes from the path, not the cached frame.
+        # Categories differ per file so concat falls back to object; re-encode once on the combined frame
+        combined = pd.concat([frames[path].assign(date=snapshot_date(path)) for path in files],
+                             ignore_index=True)
+        for column in ('category', 'status', 'series_ticker'):
+            if column in combined.columns:
+                combined[column] = combined[column].astype('category')
+        return combined
+
+    def load_events(self) -> pd.DataFrame:
+        return self._load_snapshots(os.path.join("open_events", "events_*.json"), load_events_snapshot)
+
+    def load_markets(self) -> pd.DataFrame:
+        return self._load_snapshots(os.path.join("processed_markets", "processed_markets_*.csv"),
+                                    load_markets_snapshot)
+
+    @staticmethod
+    def daily_category_counts(events: pd.DataFrame) -> pd.DataFrame:
+        """Events per day (rows) and category (columns), with a total column."""
+        counts = events.groupby(['date', 'category'], observed=True).size().unstack(fill_value=0)
+        counts['total'] = counts.sum(axis=1)
+        return counts
+
+    @staticmethod
+    def event_lifetimes(events: pd.DataFrame) -> pd.DataFrame:
+        """First/last snapshot date each event ticker appeared in, and how many snapshots."""
+        dated = events.assign(day=pd.to_datetime(events['date'], format='%Y%m%d'))
+        lifetimes = dated.groupby('event_ticker', observed=True).agg(
+            category=('category', 'first'),
+            series_ticker=('series_ticker', 'first'),
+            first_seen=('day', 'min'),
+            last_seen=('day', 'max'),
+            days_seen=('date', 'nunique')
+        )
+        lifetimes['lifetime_days'] = (lifetimes['last_seen'] - lifetimes['first_seen']).dt.days + 1
+        return lifetimes.sort_values('first_seen')
+
+    @staticmethod
+    def market_daily_series(markets: pd.DataFrame) -> pd.DataFrame:
+        """Per day and category: market count, volume, open interest, liquidity and spread."""
+        series = markets.groupby(['date', 'category'], observed=True).agg(
+            markets=('ticker', 'size'),
+            total_volume=('volume', 'sum'),
+            total_open_interest=('open_interest', 'sum'),
+            total_liquidity=('liquidity', 'sum'),
+            mean_spread=('bid_ask_spread', 'mean'),
+            median_spread=('bid_ask_spread', 'median'),
+            mean_mid_price=('mid_price', 'mean')
+        )
+        return series.reset_index()
+
+    def run(self, output_dir: Optional[str] = None) -> Dict[str, str]:
+        """Compute all reports and write them as CSVs. Returns report name -> path."""
+        stage_start = time.perf_counter()
+        output_dir = output_dir or os.path.join(self.data_dir, "analytics")
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = {}
+
+        events = self.load_events()
+        if not events.empty:
+            reports = {
+                'daily_category_counts': self.daily_category_counts(events),
+                'event_lifetimes': self.event_lifetimes(events)
+            }
+            for name, report in reports.items():
+                outputs[name] = os.path.join(output_dir, f"{name}.csv")
+                report.to_csv(outputs[name])
+
+        markets = self.load_markets()
+        if not markets.empty:
+            outputs['market_daily_series'] = os.path.join(output_dir, "market_daily_series.csv")
+            self.market_daily_series(markets).to_csv(outputs['market_daily_series'], index=False)
+
+        registry.record_stage("archive_analytics", time.perf_counter() - stage_start,
+                              len(events) + len(markets))
+        logger.info("Analysed %d event rows and %d market rows; reports in %s",
+                    len(events), len(markets), output_dir,
+                    extra={'event': 'analytics_completed', 'event_rows': len(events),
+                           'market_rows': len(markets), 'outputs': outputs})
+        return outputs
+
+
+def main():
+    setup_logging("archive_analytics")
+    parser = argparse.ArgumentParser(description="Multi-day analytics over the collected archive")
+    parser.add_argument("--data-dir", default="historical_data")
+    parser.add_argument("--output-dir", help="Where to write reports (default: <data-dir>/analytics)")
+    parser.add_argument("--workers", type=int, help="Parallel parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    analytics = ArchiveAnalytics(args.data_dir, args.workers)
+    for name, path in analytics.run(args.output_dir).items():
+        logger.info("%s: %s", name, path)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 import base64
 import datetime
+import time
+from metrics import registry, SIGNING_BUCKETS
+from profiling import timed
 
 class AuthManager:
     def __init__(self, key_id: str, key_file_path: str):
@@ -29,13 +32,17 @@ class AuthManager:
         }
 
     def _sign_message(self, message: str) -> str:
-        msg_bytes = message.encode('utf-8')
-        signature = self.private_key.sign(
-            msg_bytes,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.DIGEST_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return base64.b64encode(signature).decode('utf-8')
+        start = time.perf_counter()
+        with timed('signing'):
+            msg_bytes = message.encode('utf-8')
+            signature = self.private_key.sign(
+                msg_bytes,
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.DIGEST_LENGTH
+                ),
+                hashes.SHA256()
+            )
+            encoded = base64.b64encode(signature).decode('utf-8')
+        registry.observe("kalshi_sign_duration_seconds", time.perf_counter() - start, SIGNING_BUCKETS)
+        return encoded
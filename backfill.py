@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Historical backfill of settled/closed events and their markets.
+
+Walks the events endpoint for each requested status and fetches every event in
+the date range together with its markets (GET /events/{ticker}), many at a time,
+while discovery pages are still arriving. Events can also be seeded from past
+processed-market snapshots (--from-snapshots): events seen during the range are
+fetched once they are no longer open.
+
+Each event is stored once as historical_data/backfill/<YYYYMM>/<event_ticker>.json,
+so reruns and overlapping ranges skip what is already on disk. Discovery cursors
+and completed tickers are saved to historical_data/backfill/state_<key>.json, so an
+interrupted run resumes where it stopped.
+
+Usage: python backfill.py --start 20250101 --end 20250331 [--status settled closed] [--workers 16]
+"""
+
+import argparse
+import glob
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import day_archive
+from auth_manager import AuthManager
+from failure_queue import FailureQueue
+from log_config import SAMPLED, setup_logging
+from market_data import MarketDataManager
+from metrics import registry
+from output_writer import writer
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = {'active', 'open', 'initialized', 'unopened'}
+
+
+def event_date(event: Dict, markets: Optional[List[Dict]] = None) -> Optional[str]:
+    """YYYYMMDD an event is filed under: its strike date, else its last market close."""
+    stamp = event.get('strike_date')
+    if not stamp:
+        closes = [m['close_time'] for m in markets or [] if m.get('close_time')]
+        stamp = max(closes) if closes else None
+    return stamp[:10].replace('-', '') if stamp else None
+
+
+class BackfillEngine:
+    def __init__(self, auth_manager: AuthManager, start_date: str, end_date: str,
+                 statuses: Optional[List[str]] = None, workers: int = 16, page_limit: int = 200):
+        self.market_data = MarketDataManager(auth_manager)
+        self.data_dir = "historical_data"
+        self.backfill_dir = os.path.join(self.data_dir, "backfill")
+        self.start_date = start_date
+        self.end_date = end_date
+        self.statuses = statuses or ['settled']
+        self.workers = workers
+        self.page_limit = page_limit
+        self.redrive_wait = 60.0  # Seconds to wait at end of run for failed events to become eligible
+        self.checkpoint_every = 100  # Completed events between state saves
+        os.makedirs(self.backfill_dir, exist_ok=True)
+        key = f"{'-'.join(sorted(self.statuses))}_{start_date}_{end_date}"
+        self.state_file = os.path.join(self.backfill_dir, f"state_{key}.json")
+        self.failure_queue = FailureQueue(os.path.join(self.backfill_dir, f"failure_queue_{key}.json"))
+        self.state = self.load_state()
+        self.stored: Set[str] = self.stored_events()
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._since_save = 0
+
+    def load_state(self) -> Dict:
+        if os.path.exists(self.state_file):
+            try:
+                state = day_archive.load_json(self.state_file)
+                logger.info("Resuming backfill: %d events done, %d candidates known",
+                            len(state['completed']), len(state['candidates']))
+                return state
+            except (ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable backfill state %s: %s", self.state_file, e)
+        return {'cursors': {}, 'candidates': [], 'completed': []}
+
+    def save_state(self):
+        with self._lock:
+            state = {
+                'cursors': {status: dict(position) for status, position in self.state['cursors'].items()},
+                'candidates': list(self.state['candidates']),
+                'completed': list(self.state['completed']),
+                'last_update': datetime.now().isoformat()
+            }
+        writer.write_json(self.state_file, state, indent=None, volatile_keys=('last_update',))
+
+    def stored_events(self) -> Set[str]:
+        """Event tickers already backfilled by any earlier run."""
+        paths = glob.glob(os.path.join(self.backfill_dir, "[0-9]" * 6, "*.json"))
+        return {os.path.basename(path)[:-len(".json")] for path in paths}
+
+    def in_range(self, date_str: Optional[str]) -> bool:
+        return date_str is None or self.start_date <= date_str <= self.end_date
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        registry.inc("kalshi_backfill_events_total", outcome=outcome)
+
+    def snapshot_candidates(self) -> List[str]:
+        """Event tickers of processed-market snapshots dated in the range (memory-mapped, no CSV parsing)."""
+        from market_snapshot import MarketSnapshot
+        tickers: Set[str] = set()
+        for path in sorted(glob.glob(os.path.join(self.data_dir, "processed_markets", "markets_*.cols"))):
+            date_str = os.path.basename(path)[len("markets_"):-len(".cols")]
+            if self.in_range(date_str):
+                snapshot = MarketSnapshot(path)
+                codes = snapshot.array('event_ticker')
+                categories = snapshot.categories('event_ticker')
+                tickers.update(categories[code] for code in set(codes.tolist()) if code >= 0)
+        return sorted(tickers)
+
+    def fetch_event(self, ticker: str, require_closed: bool = False):
+        """Fetch one event with its markets and store it if it falls in the range."""
+        response = self.market_data.get_event(ticker, with_nested_markets=True)
+        event = response.get('event') or {}
+        markets = response.get('markets') or event.pop('markets', None) or []
+        if require_closed and any(m.get('status') in OPEN_STATUSES for m in markets):
+            self._count('still_open')
+            return False  # Not completed: a later run picks it up once it has closed
+        date_str = event_date(event, markets)
+        if not self.in_range(date_str):
+            self._count('out_of_range')
+            return True
+        month_dir = os.path.join(self.backfill_dir, (date_str or "unknown")[:6])
+        os.makedirs(month_dir, exist_ok=True)
+        writer.write_json(os.path.join(month_dir, f"{ticker}.json"), {
+            'timestamp': datetime.now().isoformat(),
+            'event_ticker': ticker,
+            'event_date': date_str,
+            'event': event,
+            'total_markets': len(markets),
+            'markets': markets
+        }, indent=None)
+        self._count('stored')
+        return True
+
+    def _complete(self, ticker: str, future: Future):
+        try:
+            completed = future.result()
+        except Exception as e:
+            logger.warning("Backfill of %s failed, queued for retry: %s", ticker, e, extra=SAMPLED)
+            with self._lock:
+                self.failure_queue.record(ticker, "event", e)
+            self._count('failed')
+            return
+        with self._lock:
+            self.failure_queue.resolve(ticker, "event")
+        self._mark_done(ticker, completed)
+
+    def _mark_done(self, ticker: str, completed: bool):
+        with self._lock:
+            if completed:
+                self.state['completed'].append(ticker)
+                self.stored.add(ticker)
+            self._since_save += 1
+            due = self._since_save >= self.checkpoint_every
+            if due:
+                self._since_save = 0
+        if due:
+            self.save_state()
+            self.failure_queue.save()
+
+    def discover(self, status: str):
+        """Yield candidate tickers from the events endpoint for one status, resuming from the saved cursor."""
+        position = self.state['cursors'].setdefault(status, {'cursor': None, 'done': False, 'pages': 0})
+        while not position['done']:
+            response = self.market_data.get_events(cursor=position['cursor'], limit=self.page_limit, status=status)
+            events = response.get('events', [])
+            cursor = response.get('cursor')
+            for event in events:
+                # Listings carry the strike date, so out-of-range events are dropped without a fetch
+                if self.in_range(event_date(event)):
+                    yield event['event_ticker']
+            position['pages'] += 1
+            position['cursor'] = cursor
+            position['done'] = not events or not cursor or cursor == position.get('previous_cursor')
+            position['previous_cursor'] = cursor
+
+    def run(self, from_snapshots: bool = False) -> Dict:
+        stage_start = time.perf_counter()
+        done = set(self.state['completed']) | self.stored
+        known = set(self.state['candidates'])
+        seeded = set(self.snapshot_candidates()) if from_snapshots else set()
+        pending: Dict[str, Future] = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def submit(ticker: str):
+                # Keep a bounded number of requests queued so discovery doesn't run far ahead
+                while len(pending) >= self.workers * 4:
+                    finished, _ = wait(pending.values(), return_when=FIRST_COMPLETED)
+                    for name in [name for name, future in pending.items() if future in finished]:
+                        self._complete(name, pending.pop(name))
+                pending[ticker] = pool.submit(self.fetch_event, ticker, ticker in seeded)
+
+            def candidate(ticker: str):
+                if ticker in known:
+                    return
+                known.add(ticker)
+                with self._lock:
+                    self.state['candidates'].append(ticker)
+                if ticker in done:
+                    self._count('already_stored')
+                else:
+                    submit(ticker)
+
+            try:
+                # Candidates found by an interrupted run first, then snapshot seeds, then discovery
+                resumed = [ticker for ticker in self.state['candidates'] if ticker not in done]
+                retried = [entry['ticker'] for entry in self.failure_queue.due("event")]
+                for ticker in dict.fromkeys(resumed + retried):
+                    known.add(ticker)
+                    submit(ticker)
+                for ticker in sorted(seeded):
+                    candidate(ticker)
+                for status in self.statuses:
+                    for ticker in self.discover(status):
+                        candidate(ticker)
+                    self.save_state()
+                for name, future in list(pending.items()):
+                    self._complete(name, future)
+                pending.clear()
+                self.failure_queue.redrive("event", lambda entry: self._mark_done(
+                    entry['ticker'], self.fetch_event(entry['ticker'], entry['ticker'] in seeded)),
+                    wait_up_to=self.redrive_wait)
+            except KeyboardInterrupt:
+                logger.warning("Backfill interrupted. Saving progress...")
+                for future in pending.values():
+                    future.cancel()
+            finally:
+                for name, future in pending.items():
+                    if future.done() and not future.cancelled():
+                        self._complete(name, future)
+                self.save_state()
+                self.failure_queue.save()
+                writer.flush()
+
+        duration = time.perf_counter() - stage_start
+        stored = self.counts.get('stored', 0)
+        registry.record_stage("backfill", duration, stored)
+        summary = {
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'statuses': self.statuses,
+            'duration_s': round(duration, 2),
+            'candidates': len(self.state['candidates']),
+            'outcomes': dict(self.counts),
+            'failed_pending': len(self.failure_queue.pending("event"))
+        }
+        logger.info("Backfill %s-%s: %d events stored in %.1fs (%s)", self.start_date, self.end_date,
+                    stored, duration, self.counts,
+                    extra=dict(summary, event='backfill_completed'))
+        return summary
+
+
+def load_backfill(start_date: str, end_date: str, data_dir: str = "historical_data") -> List[Dict]:
+    """Stored backfill records for events dated in an inclusive YYYYMMDD range."""
+    records = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "backfill", "[0-9]" * 6, "*.json"))):
+        month = os.path.basename(os.path.dirname(path))
+        if start_date[:6] <= month <= end_date[:6]:
+            record = day_archive.load_json(path)
+            if start_date <= (record.get('event_date') or '') <= end_date:
+                records.append(record)
+    return records
+
+
+def main():
+    setup_logging("backfill")
+    parser = argparse.ArgumentParser(description="Backfill settled/closed events and their markets")
+    parser.add_argument("--start", required=True, help="First settlement date, YYYYMMDD")
+    parser.add_argument("--end", required=True, help="Last settlement date, YYYYMMDD")
+    parser.add_argument("--status", nargs="+", default=['settled'], choices=['settled', 'closed'],
+                        help="Event statuses to walk")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent event requests")
+    parser.add_argument("--page-limit", type=int, default=200, help="Events per discovery page")
+    parser.add_argument("--from-snapshots", action="store_true",
+                        help="Also backfill events seen in processed-market snapshots of the range")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write a cProfile dump, collapsed stacks and a time breakdown to historical_data/profiles/")
+    args = parser.parse_args()
+    for value in (args.start, args.end):
+        datetime.strptime(value, "%Y%m%d")
+
+    auth = AuthManager(key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd", key_file_path="private_key.pem")
+    engine = BackfillEngine(auth, args.start, args.end, args.status, args.workers, args.page_limit)
+    try:
+        with profiled("backfill", args.profile):
+            return engine.run(from_snapshots=args.from_snapshots)
+    finally:
+        registry.export("backfill")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Kalshi collection and processing pipeline.
+
+Each stage runs in a fresh interpreter against a scratch working directory so
+that peak RSS and bytes written are attributable to that stage alone:
+- event_pagination: EventsCollector.collect_events (open_events_collector.py)
+- market_fetch: OpenMarketCollector.collect_open_markets
+- market_fetch_sharded: the same sweep split across --shards local processes, then merged
+- process_events: EventProcessor.process_events / save_to_csv
+- process_markets: MarketDetailsProcessor.process_markets
+- fixtures_process_events: EventProcessor over historical_data_example/
+- cli_import_time: fresh-interpreter import time of each kalshi_cli.py subcommand
+- market_records_dict / market_records_slots: every individual market file held in
+  memory as plain dicts vs records.Market objects, for comparing peak RSS
+
+API stages talk to a local fake Kalshi server backed by a deterministic
+synthetic data generator (10k events / 200k markets by default).
+
+Results are written as JSON so runs can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(REPO_DIR, "historical_data_example")
+
+CATEGORIES = [
+    "Climate and Weather", "Companies", "Crypto", "Economics", "Elections",
+    "Entertainment", "Financials", "Health", "Politics",
+    "Science and Technology", "Sports", "Transportation", "World"
+]
+
+RULES_TEMPLATE = (
+    "If {subject} is above {strike} as reported by the source agency on {date}, "
+    "then the market resolves to Yes. Outcome verified from the official release. "
+    "Revisions after expiration will not be considered for settlement purposes."
+)
+
+
+class SyntheticDataGenerator:
+    """Deterministic generator of API-shaped events and markets."""
+
+    def __init__(self, num_events: int = 10000, num_markets: int = 200000, seed: int = 42):
+        self.num_events = num_events
+        self.num_markets = num_markets
+        self.seed = seed
+        self.now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+        self.events = self._generate_events()
+        self.market_counts = self._distribute_markets()
+
+    def _generate_events(self) -> List[Dict]:
+        rng = random.Random(self.seed)
+        num_series = max(1, self.num_events // 20)
+        events = []
+        for i in range(self.num_events):
+            series = f"KXSYN{i % num_series:04d}"
+            event = {
+                'event_ticker': f"{series}-{i:06d}",
+                'series_ticker': series,
+                'sub_title': f"On {(self.now + timedelta(days=i % 90)).strftime('%b %d, %Y')}",
+                'title': f"Synthetic event {i} for series {series}?",
+                'collateral_return_type': rng.choice(["", "MECNET"]),
+                'mutually_exclusive': rng.random() < 0.4,
+                'category': CATEGORIES[i % len(CATEGORIES)]
+            }
+            if i % 5:
+                strike = self.now + timedelta(hours=rng.randint(1, 24 * 120))
+                event['strike_date'] = strike.strftime('%Y-%m-%dT%H:%M:%SZ')
+            else:
+                event['strike_period'] = str(self.now.year)
+            events.append(event)
+        return events
+
+    def _distribute_markets(self) -> Dict[str, int]:
+        """Split num_markets across events with some skew, summing exactly."""
+        rng = random.Random(self.seed + 1)
+        if not self.events:
+            return {}
+        weights = [rng.uniform(0.1, 1.9) for _ in self.events]
+        total_weight = sum(weights)
+        counts = [int(self.num_markets * w / total_weight) for w in weights]
+        remainder = self.num_markets - sum(counts)
+        for i in range(remainder):
+            counts[i % len(counts)] += 1
+        return {e['event_ticker']: c for e, c in zip(self.events, counts)}
+
+    def generate_markets(self, event_ticker: str) -> List[Dict]:
+        """Generate the markets for one event; same ticker always yields the same markets."""
+        rng = random.Random(f"{self.seed}:{event_ticker}")
+        markets = []
+        for j in range(self.market_counts.get(event_ticker, 0)):
+            open_time = self.now - timedelta(days=rng.randint(1, 30))
+            close_time = self.now + timedelta(minutes=rng.randint(5, 60 * 24 * 120))
+            yes_bid = rng.randint(1, 97)
+            yes_ask = min(99, yes_bid + rng.randint(1, 5))
+            strike = rng.randint(10, 500)
+            markets.append({
+                'ticker': f"{event_ticker}-T{j}",
+                'event_ticker': event_ticker,
+                'market_type': 'binary',
+                'title': f"Will the value be above {strike}?",
+                'subtitle': f"{strike} or above",
+                'yes_sub_title': f"{strike} or above",
+                'no_sub_title': f"Below {strike}",
+                'open_time': open_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'close_time': close_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'expected_expiration_time': close_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'expiration_time': close_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'latest_expiration_time': (close_time + timedelta(days=7)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'settlement_timer_seconds': 3600,
+                'status': 'active' if rng.random() < 0.9 else 'closed',
+                'response_price_units': 'usd_cent',
+                'notional_value': 100,
+                'tick_size': 1,
+                'yes_bid': yes_bid,
+                'yes_ask': yes_ask,
+                'no_bid': 100 - yes_ask,
+                'no_ask': 100 - yes_bid,
+                'last_price': rng.randint(yes_bid, yes_ask),
+                'previous_yes_bid': max(0, yes_bid - rng.randint(0, 3)),
+                'previous_yes_ask': min(100, yes_ask + rng.randint(0, 3)),
+                'previous_price': rng.randint(1, 99),
+                'volume': rng.randint(0, 50000),
+                'volume_24h': rng.randint(0, 5000),
+                'liquidity': rng.randint(0, 5000000),
+                'open_interest': rng.randint(0, 20000),
+                'result': '',
+                'can_close_early': rng.random() < 0.5,
+                'expiration_value': '',
+                'category': '',
+                'risk_limit_cents': 0,
+                'rules_primary': RULES_TEMPLATE.format(
+                    subject=event_ticker, strike=strike, date=close_time.strftime('%b %d, %Y')),
+                'rules_secondary': "Not applicable."
+            })
+        return markets
+
+    def write_open_events(self, data_dir: str, date_str: str) -> str:
+        """Write an open_events snapshot as produced by open_events_collector.py."""
+        out_dir = os.path.join(data_dir, "open_events")
+        os.makedirs(out_dir, exist_ok=True)
+        filename = os.path.join(out_dir, f"events_{date_str}.json")
+        with open(filename, 'w') as f:
+            json.dump({
+                'timestamp': self.now.isoformat(),
+                'total_open_events': len(self.events),
+                'events': self.events
+            }, f, indent=2)
+        return filename
+
+    def write_processed_events(self, data_dir: str, date_str: str) -> str:
+        """Write a processed_events CSV as produced by process_open_events.py."""
+        import csv
+        out_dir = os.path.join(data_dir, "processed_events")
+        os.makedirs(out_dir, exist_ok=True)
+        filename = os.path.join(out_dir, f"processed_events_{date_str}.csv")
+        columns = ['timestamp', 'total_open_events', 'event_ticker', 'series_ticker', 'sub_title',
+                   'title', 'collateral_return_type', 'mutually_exclusive', 'category', 'strike_date']
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for event in self.events:
+                writer.writerow([
+                    self.now.isoformat(), len(self.events), event['event_ticker'],
+                    event['series_ticker'], event['sub_title'], event['title'],
+                    event['collateral_return_type'], event['mutually_exclusive'],
+                    event['category'], event.get('strike_date', '')
+                ])
+        return filename
+
+    def write_individual_markets(self, data_dir: str, date_str: str):
+        """Write per-event market files as produced by open_market_collector.py."""
+        out_dir = os.path.join(data_dir, "open_markets_individual")
+        os.makedirs(out_dir, exist_ok=True)
+        for event in self.events:
+            markets = self.generate_markets(event['event_ticker'])
+            open_markets = [m for m in markets if m['status'] == 'active']
+            filename = os.path.join(out_dir, f"open_markets_{event['event_ticker']}_{date_str}.json")
+            with open(filename, 'w') as f:
+                json.dump({
+                    'timestamp': self.now.isoformat(),
+                    'event_ticker': event['event_ticker'],
+                    'total_markets': len(markets),
+                    'total_open_markets': len(open_markets),
+                    'all_markets': markets,
+                    'open_markets': open_markets
+                }, f, indent=2)
+
+
+class FakeKalshiServer:
+    """Local HTTP server answering the trade-api endpoints used by the collectors."""
+
+    def __init__(self, generator: SyntheticDataGenerator, latency: float = 0.0, error_rate: float = 0.0,
+                 capacity: Optional[int] = None):
+        self.generator = generator
+        self._events_by_ticker = {event['event_ticker']: event for event in generator.events}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.capacity = capacity  # Requests served at once; beyond that the server answers 429 like a rate limiter
+        self._error_rng = random.Random(generator.seed)
+        self.request_count = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self):
+        with self._lock:
+            self.request_count += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server._count()
+                with server._lock:
+                    server.in_flight += 1
+                    throttled = server.capacity is not None and server.in_flight > server.capacity
+                try:
+                    if throttled:
+                        self.send_response(429)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self._respond()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _respond(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and server._error_rng.random() < server.error_rate:
+                    # Mix of throttling and transient upstream failures
+                    self.send_response(server._error_rng.choice([429, 503]))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path == "/trade-api/v2/events":
+                    body = server._events_page(query)
+                elif parsed.path == "/trade-api/v2/markets":
+                    body = {'markets': server.generator.generate_markets(query.get('event_ticker', '')),
+                            'cursor': ''}
+                elif parsed.path.startswith("/trade-api/v2/events/"):
+                    body = server._event(parsed.path.split("/")[-1])
+                    if body is None:
+                        self.send_error(404)
+                        return
+                elif parsed.path.startswith("/trade-api/v2/markets/") and parsed.path.endswith("/orderbook"):
+                    body = server._orderbook(parsed.path.split("/")[-2], int(query.get('depth', 5)))
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def _events_page(self, query: Dict) -> Dict:
+        limit = int(query.get('limit', 100))
+        start = int(query.get('cursor') or 0)
+        events = self.generator.events[start:start + limit]
+        next_start = start + limit
+        cursor = str(next_start) if next_start < len(self.generator.events) else ''
+        return {'events': events, 'cursor': cursor}
+
+    def _event(self, event_ticker: str) -> Optional[Dict]:
+        event = self._events_by_ticker.get(event_ticker)
+        if event is None:
+            return None
+        return {'event': event, 'markets': self.generator.generate_markets(event_ticker)}
+
+    def _orderbook(self, ticker: str, depth: int) -> Dict:
+        rng = random.Random(ticker)
+        yes = [[p, rng.randint(1, 500)] for p in sorted(rng.sample(range(1, 99), depth))]
+        no = [[p, rng.randint(1, 500)] for p in sorted(rng.sample(range(1, 99), depth))]
+        return {'orderbook': {'yes': yes, 'no': no}}
+
+
+def generate_key_file(path: str):
+    """Write a throwaway RSA key so AuthManager signs requests as it would in production."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    with open(path, 'wb') as f:
+        f.write(key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.TraditionalOpenSSL,
+            encryption_algorithm=serialization.NoEncryption()
+        ))
+
+
+def bytes_written_since(root: str, start_time: float) -> int:
+    """Total size of files under root modified at or after start_time."""
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            if st.st_mtime >= start_time:
+                total += st.st_size
+    return total
+
+
+def import_time(command: str, repeats: int = 3) -> Dict:
+    """Best-of-N seconds for a fresh interpreter to import what a CLI subcommand needs."""
+    script = ("import sys, time; start = time.perf_counter(); import kalshi_cli; "
+              f"kalshi_cli.load_command({command!r}); elapsed = time.perf_counter() - start; "
+              "print(elapsed, int('pandas' in sys.modules))")
+    best = None
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", script], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.split()
+        best = min(best, float(output[0])) if best is not None else float(output[0])
+    return {'import_s': round(best, 4), 'imports_pandas': bool(int(output[1]))}
+
+
+def run_stage(stage: str, workdir: str, server_url: Optional[str], key_file: Optional[str],
+              date_str: str, quiet: bool = True, num_shards: int = 4) -> Dict:
+    """Run one stage inside a fresh interpreter. Returns raw measurements."""
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+    if quiet:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        sys.stdout = open(1, 'w', closefd=False)
+
+    rows = 0
+    details = None
+    start_time = time.time()
+    # mtime resolution can be coarse; anything touched from here on counts as written
+    fs_start = start_time - 1e-3
+    wall_start = time.perf_counter()
+
+    if stage == "event_pagination":
+        from auth_manager import AuthManager
+        from open_events_collector import EventsCollector
+        collector = EventsCollector(AuthManager(key_id="benchmark", key_file_path=key_file))
+        collector.market_data.base_url = server_url
+        filename = collector.collect_events()
+        with open(filename) as f:
+            rows = json.load(f)['total_open_events']
+    elif stage == "market_fetch":
+        from auth_manager import AuthManager
+        from open_market_collector import OpenMarketCollector
+        collector = OpenMarketCollector(AuthManager(key_id="benchmark", key_file_path=key_file))
+        collector.market_data.base_url = server_url
+        collector.request_delay = 0
+        filename = collector.collect_open_markets()
+        with open(filename) as f:
+            rows = json.load(f)['total_open_markets']
+    elif stage == "market_fetch_sharded":
+        from open_market_collector import run_sharded
+        filename = run_sharded("benchmark", key_file, num_shards, base_url=server_url, request_delay=0)
+        with open(filename) as f:
+            rows = json.load(f)['total_open_markets']
+    elif stage == "backfill":
+        from auth_manager import AuthManager
+        from backfill import BackfillEngine
+        # Synthetic strike dates fall within the next 120 days
+        end_str = (datetime.strptime(date_str, '%Y%m%d') + timedelta(days=121)).strftime('%Y%m%d')
+        engine = BackfillEngine(AuthManager(key_id="benchmark", key_file_path=key_file), date_str, end_str)
+        engine.market_data.base_url = server_url
+        details = engine.run()
+        rows = details['outcomes'].get('stored', 0)
+    elif stage == "process_events":
+        from process_open_events import EventProcessor
+        processor = EventProcessor(f"events_{date_str}.json")
+        rows = len(processor.save_to_csv(f"processed_events_{date_str}.csv"))
+    elif stage == "process_markets":
+        from process_market_details import MarketDetailsProcessor
+        rows = len(MarketDetailsProcessor().process_markets(date_str))
+    elif stage == "fixtures_process_events":
+        from process_open_events import EventProcessor
+        fixture_dir = os.path.join("historical_data", "open_events")
+        for name in sorted(os.listdir(fixture_dir)):
+            fixture_date = name[len("events_"):-len(".json")]
+            processor = EventProcessor(name)
+            rows += len(processor.save_to_csv(f"processed_events_{fixture_date}.csv"))
+    elif stage in ("market_records_dict", "market_records_slots"):
+        from records import Market
+        market_dir = os.path.join("historical_data", "open_markets_individual")
+        held = []
+        for name in sorted(os.listdir(market_dir)):
+            with open(os.path.join(market_dir, name)) as f:
+                markets = json.load(f).get('all_markets', [])
+            if stage == "market_records_slots":
+                held.extend(Market.from_api_list(markets))
+            else:
+                held.extend({field: m.get(field) for field in Market.FIELDS} for m in markets)
+        rows = len(held)
+    elif stage in ("markets_load_csv", "markets_load_snapshot"):
+        from process_market_details import MarketDetailsProcessor
+        rows = len(MarketDetailsProcessor().load_processed_markets(date_str))
+    elif stage == "markets_query_snapshot":
+        # Read-only query straight off the memory-mapped columns: volume of active markets
+        from market_snapshot import MarketSnapshot
+        snapshot = MarketSnapshot.for_date(date_str)
+        active = snapshot.equals('status', 'active')
+        details = {'active_volume': int(snapshot.array('volume')[active].sum())}
+        rows = int(active.sum())
+    elif stage == "cli_import_time":
+        from kalshi_cli import COMMANDS
+        details = {command: import_time(command) for command in COMMANDS}
+        rows = len(details)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    wall_time = time.perf_counter() - wall_start
+    # Sharded stages do their work in child processes; report the largest of them
+    peak_rss_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        'wall_time_s': wall_time,
+        'rows': rows,
+        'peak_rss_mb': peak_rss_kb / 1024,
+        'bytes_written': bytes_written_since(workdir, fs_start),
+        'details': details
+    }
+
+
+class PipelineBenchmark:
+    STAGES = ["event_pagination", "market_fetch", "market_fetch_sharded", "backfill", "process_events", "process_markets",
+              "fixtures_process_events", "market_records_dict", "market_records_slots", "cli_import_time",
+              "markets_load_csv", "markets_load_snapshot", "markets_query_snapshot"]
+    API_STAGES = {"event_pagination", "market_fetch", "market_fetch_sharded", "backfill"}
+
+    def __init__(self, num_events: int, num_markets: int, seed: int = 42,
+                 latency: float = 0.0, keep_workdir: bool = False, error_rate: float = 0.0,
+                 num_shards: int = 4, capacity: Optional[int] = None):
+        self.generator = SyntheticDataGenerator(num_events, num_markets, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.keep_workdir = keep_workdir
+        self.num_shards = num_shards
+        self.capacity = capacity
+        self.date_str = datetime.now().strftime('%Y%m%d')
+        self.root = tempfile.mkdtemp(prefix="kalshi_bench_")
+        self.key_file = os.path.join(self.root, "bench_key.pem")
+        generate_key_file(self.key_file)
+
+    def prepare_stage(self, stage: str) -> str:
+        """Create a scratch directory containing the inputs the stage reads."""
+        workdir = os.path.join(self.root, stage)
+        data_dir = os.path.join(workdir, "historical_data")
+        os.makedirs(data_dir)
+        if stage in ("market_fetch", "market_fetch_sharded", "process_events"):
+            self.generator.write_open_events(data_dir, self.date_str)
+        elif stage == "process_markets":
+            self.generator.write_processed_events(data_dir, self.date_str)
+            self.generator.write_individual_markets(data_dir, self.date_str)
+        elif stage in ("market_records_dict", "market_records_slots"):
+            self.generator.write_individual_markets(data_dir, self.date_str)
+        elif stage in ("markets_load_csv", "markets_load_snapshot", "markets_query_snapshot"):
+            self.generator.write_processed_events(data_dir, self.date_str)
+            self.generator.write_individual_markets(data_dir, self.date_str)
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                pool.submit(run_stage, "process_markets", workdir, None, None, self.date_str).result()
+            if stage == "markets_load_csv":
+                shutil.rmtree(os.path.join(data_dir, "processed_markets", f"markets_{self.date_str}.cols"))
+        elif stage == "fixtures_process_events":
+            shutil.copytree(os.path.join(FIXTURES_DIR, "open_events"),
+                            os.path.join(data_dir, "open_events"))
+        return workdir
+
+    def run(self, stages: List[str]) -> Dict:
+        server = FakeKalshiServer(self.generator, self.latency, self.error_rate, self.capacity)
+        server.start()
+        results = []
+        try:
+            for stage in stages:
+                print(f"Preparing {stage}...")
+                workdir = self.prepare_stage(stage)
+                requests_before = server.request_count
+                print(f"Running {stage}...")
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    measured = pool.submit(run_stage, stage, workdir, server.url, self.key_file,
+                                           self.date_str, num_shards=self.num_shards).result()
+                request_count = server.request_count - requests_before
+                wall = measured['wall_time_s']
+                result = {
+                    'stage': stage,
+                    'wall_time_s': round(wall, 4),
+                    'requests': request_count,
+                    'requests_per_s': round(request_count / wall, 2) if wall and stage in self.API_STAGES else None,
+                    'rows': measured['rows'],
+                    'rows_per_s': round(measured['rows'] / wall, 2) if wall else None,
+                    'peak_rss_mb': round(measured['peak_rss_mb'], 2),
+                    'bytes_written': measured['bytes_written']
+                }
+                if measured.get('details'):
+                    result['details'] = measured['details']
+                results.append(result)
+                print(f"  {stage}: {result['wall_time_s']:.2f}s, {result['rows']} rows, "
+                      f"{result['peak_rss_mb']:.1f} MB peak RSS, {result['bytes_written']} bytes written")
+                for name, detail in result.get('details', {}).items():
+                    print(f"    {name}: {detail}")
+        finally:
+            server.stop()
+            if not self.keep_workdir:
+                shutil.rmtree(self.root, ignore_errors=True)
+
+        return {
+            'run': {
+                'timestamp': datetime.now().isoformat(),
+                'git_commit': self._git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'num_events': self.generator.num_events,
+                'num_markets': self.generator.num_markets,
+                'seed': self.generator.seed,
+                'server_latency_s': self.latency,
+                'server_error_rate': self.error_rate,
+                'server_capacity': self.capacity,
+                'num_shards': self.num_shards
+            },
+            'stages': results
+        }
+
+    @staticmethod
+    def _git_commit() -> Optional[str]:
+        try:
+            return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except Exception:
+            return None
+
+
+def compare_results(current: Dict, baseline: Dict) -> List[str]:
+    """Format per-stage percentage changes against a previous results file."""
+    lines = []
+    baseline_stages = {s['stage']: s for s in baseline.get('stages', [])}
+    for stage in current['stages']:
+        previous = baseline_stages.get(stage['stage'])
+        if not previous:
+            continue
+        for metric in ['wall_time_s', 'rows_per_s', 'requests_per_s', 'peak_rss_mb', 'bytes_written']:
+            old, new = previous.get(metric), stage.get(metric)
+            if old and new is not None:
+                change = (new - old) / old * 100
+                lines.append(f"{stage['stage']:<26} {metric:<15} {old:>14} -> {new:<14} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Kalshi collection and processing pipeline")
+    parser.add_argument("--events", type=int, default=10000, help="Synthetic events to generate")
+    parser.add_argument("--markets", type=int, default=200000, help="Synthetic markets to generate")
+    parser.add_argument("--stages", nargs="+", choices=PipelineBenchmark.STAGES,
+                        default=PipelineBenchmark.STAGES, help="Stages to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429/503")
+    parser.add_argument("--shards", type=int, default=4, help="Processes for the market_fetch_sharded stage")
+    parser.add_argument("--capacity", type=int, help="Concurrent requests the fake server serves before answering 429")
+    parser.add_argument("--output", help="Results JSON path (default: benchmark_results/benchmark_<ts>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep scratch directories for inspection")
+    args = parser.parse_args()
+
+    benchmark = PipelineBenchmark(args.events, args.markets, args.seed, args.latency, args.keep_workdir,
+                                  args.error_rate, args.shards, args.capacity)
+    results = benchmark.run(args.stages)
+
+    output = args.output or os.path.join(
+        "benchmark_results", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparison against {args.compare}:")
+        for line in compare_results(results, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from metrics import registry
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
+
+# Market fields whose changes are streamed
+TRACKED_FIELDS = ('yes_bid', 'yes_ask', 'no_bid', 'no_ask', 'last_price', 'volume', 'open_interest', 'status')
+
+
+class MarketChangeStream:
+    """Per-ticker state table of quote/volume/status fields, diffed as markets are collected.
+
+    Each observed market is compared against the values last seen for its ticker
+    (one dict lookup and one tuple comparison, so a cycle is O(markets)); markets
+    that moved are appended to changes/market_changes_<date>.jsonl as
+    {"ts", "ticker", "event_ticker", "changes": {field: [old, new]}}. Tickers seen
+    for the first time have old values of null. The state table is persisted
+    between runs in changes/quote_state.json.
+    """
+
+    def __init__(self, data_dir: str = "historical_data", suffix: str = ""):
+        self.changes_dir = os.path.join(data_dir, "changes")
+        os.makedirs(self.changes_dir, exist_ok=True)
+        self.suffix = suffix
+        self.state_file = os.path.join(self.changes_dir, f"quote_state{suffix}.json")
+        self.state: Dict[str, Tuple] = self._load_state()
+        self._buffer: Dict[str, List[str]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load_state(self) -> Dict[str, Tuple]:
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    saved = json.load(f)
+                if saved.get('fields') == list(TRACKED_FIELDS):
+                    return {ticker: tuple(values) for ticker, values in saved['markets'].items()}
+            except ValueError as e:
+                logger.warning("Ignoring unreadable quote state %s: %s", self.state_file, e)
+        return {}
+
+    def changes_path(self, date_str: str) -> str:
+        return os.path.join(self.changes_dir, f"market_changes_{date_str}{self.suffix}.jsonl")
+
+    def observe(self, markets: List[Dict], timestamp: datetime) -> int:
+        """Diff markets against the state table and buffer a record per changed market."""
+        ts = timestamp.isoformat()
+        records = []
+        changed_fields: Dict[str, int] = {}
+        with self._lock:
+            for market in markets:
+                ticker = market['ticker']
+                values = tuple(market.get(field) for field in TRACKED_FIELDS)
+                previous = self.state.get(ticker)
+                if previous == values:
+                    continue
+                self.state[ticker] = values
+                if previous is None:
+                    changes = {field: [None, new] for field, new in zip(TRACKED_FIELDS, values)}
+                else:
+                    changes = {field: [old, new] for field, old, new in zip(TRACKED_FIELDS, previous, values)
+                               if old != new}
+                for field in changes:
+                    changed_fields[field] = changed_fields.get(field, 0) + 1
+                records.append(json.dumps({'ts': ts, 'ticker': ticker, 'event_ticker': market.get('event_ticker'),
+                                           'changes': changes}, separators=(',', ':')))
+            if records:
+                self._buffer.setdefault(timestamp.strftime('%Y%m%d'), []).extend(records)
+                self._dirty = True
+        for field, count in changed_fields.items():
+            registry.inc("kalshi_market_changes_total", count, field=field)
+        return len(records)
+
+    def flush(self) -> int:
+        """Append buffered records to the day's change file and persist the state table."""
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            dirty, self._dirty = self._dirty, False
+            state = {ticker: list(values) for ticker, values in self.state.items()} if dirty else None
+        written = 0
+        for date_str, records in buffer.items():
+            with open(self.changes_path(date_str), 'a') as f:
+                f.write('\n'.join(records) + '\n')
+            written += len(records)
+        if state is not None:
+            writer.write_json(self.state_file, {'fields': list(TRACKED_FIELDS), 'markets': state}, indent=None)
+        if written:
+            logger.info("Streamed %d market changes", written, extra={'event': 'market_changes', 'count': written})
+        return written
+
+
+def read_changes(date_str: str, data_dir: str = "historical_data", since: Optional[str] = None) -> List[Dict]:
+    """Change records of one day (every shard's file), optionally only those after an ISO timestamp."""
+    changes_dir = os.path.join(data_dir, "changes")
+    records = []
+    for name in sorted(os.listdir(changes_dir)) if os.path.isdir(changes_dir) else []:
+        if name.startswith(f"market_changes_{date_str}") and name.endswith(".jsonl"):
+            with open(os.path.join(changes_dir, name), 'r') as f:
+                records.extend(record for record in map(json.loads, f) if since is None or record['ts'] > since)
+    return sorted(records, key=lambda record: record['ts'])
@@ -0,0 +1,115 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from metrics import registry
+
+OK, ERROR, OVERLOAD = "ok", "error", "overload"
+
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight API requests, driven by observed latency and errors.
+
+    Requests are gated by acquire()/release(latency, outcome). Completions are
+    judged in windows of max(limit, min_window) requests:
+    - a 429 or timeout ("overload") halves the limit at once, at most once per window
+    - a window whose error rate exceeds error_threshold cuts it by 10%, as do
+      latency_windows windows in a row whose p95 latency is above
+      latency_tolerance x the baseline p95
+    - a healthy window raises it: doubling until the first cut (slow start), then +1
+
+    The baseline follows the lowest recent window p95: it drops to any lower
+    window at once and otherwise moves baseline_decay of the way towards each
+    window's p95, so latency noise that doesn't depend on load can't ratchet it down.
+
+    The current limit goes to the kalshi_concurrency_limit gauge and every change
+    to the kalshi_concurrency_limit timeseries of the run metrics.
+    """
+
+    def __init__(self, name: str, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 latency_tolerance: float = 2.0, error_threshold: float = 0.02, backoff: float = 0.5,
+                 min_window: int = 20, latency_windows: int = 3, baseline_decay: float = 0.1):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.backoff = backoff
+        self.min_window = min_window
+        self.latency_windows = latency_windows
+        self.baseline_decay = baseline_decay
+        self.limit = max(min_limit, min(max_limit, initial))
+        self.in_flight = 0
+        self.baseline_p95: Optional[float] = None
+        self.slow_start = True
+        self.history: List[Dict] = []
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._slow_windows = 0  # Consecutive windows with inflated p95
+        self._since_cut = self.limit  # Completions since the last cut; the first overload always counts
+        self._cond = threading.Condition()
+        self._record(self.limit, "initial")
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, outcome: str = OK):
+        with self._cond:
+            self.in_flight -= 1
+            self._since_cut += 1
+            self._latencies.append(latency)
+            if outcome != OK:
+                self._errors += 1
+            if outcome == OVERLOAD and self._since_cut >= self.limit:
+                self._set_limit(int(self.limit * self.backoff), "overload")
+                self._reset_window()
+            elif len(self._latencies) >= max(self.limit, self.min_window):
+                self._evaluate_window()
+            self._cond.notify_all()
+
+    def _evaluate_window(self):
+        latencies = sorted(self._latencies)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        error_rate = self._errors / len(latencies)
+        baseline = p95 if self.baseline_p95 is None else self.baseline_p95
+        self._slow_windows = self._slow_windows + 1 if p95 > self.latency_tolerance * baseline else 0
+        self.baseline_p95 = min(p95, baseline + self.baseline_decay * (p95 - baseline))
+        registry.observe("kalshi_concurrency_window_p95_seconds", p95, component=self.name)
+        if error_rate > self.error_threshold:
+            self._set_limit(int(self.limit * 0.9), "errors")
+        elif self._slow_windows >= self.latency_windows:
+            self._slow_windows = 0
+            self._set_limit(int(self.limit * 0.9), "latency")
+        elif self._slow_windows:
+            pass  # Hold the limit until the latency rise is confirmed or gone
+        elif self.slow_start:
+            self._set_limit(self.limit * 2, "healthy")
+        else:
+            self._set_limit(self.limit + 1, "healthy")
+        self._reset_window()
+
+    def _reset_window(self):
+        self._latencies = []
+        self._errors = 0
+
+    def _set_limit(self, limit: int, reason: str):
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        if reason in ("overload", "errors", "latency"):
+            self.slow_start = False
+            self._since_cut = 0
+            # Always move down on a cut, even when int() rounding would keep the limit
+            limit = min(limit, max(self.min_limit, self.limit - 1))
+        if limit == self.limit:
+            return
+        direction = "up" if limit > self.limit else "down"
+        self.limit = limit
+        registry.inc("kalshi_concurrency_adjustments_total", component=self.name, direction=direction, reason=reason)
+        self._record(limit, reason)
+
+    def _record(self, limit: int, reason: str):
+        registry.set_gauge("kalshi_concurrency_limit", limit, component=self.name)
+        registry.record_point("kalshi_concurrency_limit", limit, component=self.name, reason=reason)
+        self.history.append({'time': time.time(), 'limit': limit, 'reason': reason})
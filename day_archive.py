@@ -0,0 +1,241 @@
+"""
+Compressed per-day archive bundles for raw collector output.
+
+archive_days() packs every raw JSON file of a past day (open_events, open_markets,
+open_markets_individual, events, markets) into
+
+    historical_data/archive/bundle_<YYYYMMDD>.<codec>        members compressed one by one
+    historical_data/archive/bundle_<YYYYMMDD>.index.json     name -> offset, length, size, sha1
+
+and removes the loose files once every member has been read back and verified.
+Readers keep using the original paths: open_json()/load_json() fall back to the
+bundle when a file is no longer on disk and decompress the one member in memory.
+
+Usage: python day_archive.py [--keep-days 7] [--codec gzip|zstd] [--level 6]
+"""
+
+import argparse
+import fnmatch
+import glob
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, IO, List, Optional
+
+from log_config import setup_logging
+from metrics import registry
+from output_writer import writer
+from profiling import timed
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = "archive"
+RAW_DIRS = ['open_events', 'open_markets', 'open_markets_individual', 'events', 'markets']
+DATE_RE = re.compile(r"_(\d{8})\.json$")
+INDEX_VERSION = 1
+
+_indexes: Dict[str, tuple] = {}  # index path -> (mtime_ns, index)
+
+
+def _compressor(codec: str, level: int):
+    if codec == 'gzip':
+        return lambda payload: gzip.compress(payload, compresslevel=level, mtime=0)
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstandard is required for zstd bundles (pip install zstandard)") from e
+        return zstandard.ZstdCompressor(level=level).compress
+    raise ValueError(f"Unknown codec {codec!r}")
+
+
+def _reader(codec: str, compressed: bytes) -> IO[bytes]:
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=io.BytesIO(compressed), mode='rb')
+    import zstandard
+    return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(compressed))
+
+
+def split_path(path: str):
+    """(data_dir, member name, date) of a raw file path such as historical_data/open_events/events_<date>.json."""
+    match = DATE_RE.search(path)
+    if not match:
+        return None
+    subdir = os.path.dirname(path)
+    return os.path.dirname(subdir), f"{os.path.basename(subdir)}/{os.path.basename(path)}", match.group(1)
+
+
+def index_path(data_dir: str, date_str: str) -> str:
+    return os.path.join(data_dir, ARCHIVE_DIR, f"bundle_{date_str}.index.json")
+
+
+def load_index(data_dir: str, date_str: str) -> Optional[Dict]:
+    """Index of one day's bundle (cached until the index file changes), or None."""
+    path = index_path(data_dir, date_str)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _indexes.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, 'r') as f:
+        index = json.load(f)
+    _indexes[path] = (mtime_ns, index)
+    return index
+
+
+def member_info(path: str) -> Optional[Dict]:
+    """Index entry of an archived file, or None if it isn't in a bundle."""
+    parts = split_path(path)
+    if parts is None:
+        return None
+    data_dir, name, date_str = parts
+    index = load_index(data_dir, date_str)
+    return index['members'].get(name) if index else None
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(path) or member_info(path) is not None
+
+
+def open_member(path: str) -> IO[bytes]:
+    """Binary stream of an archived file, decompressed as it is read."""
+    data_dir, name, date_str = split_path(path)
+    index = load_index(data_dir, date_str)
+    info = index['members'][name]
+    with open(os.path.join(data_dir, ARCHIVE_DIR, index['bundle']), 'rb') as f:
+        f.seek(info['offset'])
+        compressed = f.read(info['length'])
+    return _reader(index['codec'], compressed)
+
+
+def open_json(path: str) -> IO:
+    """Open a raw file for reading, from disk if it is still there, otherwise from its day bundle."""
+    if os.path.exists(path) or member_info(path) is None:
+        return open(path, 'r')
+    return io.TextIOWrapper(open_member(path), encoding='utf-8')
+
+
+def load_json(path: str):
+    with timed('disk'):
+        with open_json(path) as f:
+            text = f.read()
+    with timed('json'):
+        return json.loads(text)
+
+
+def list_files(data_dir: str, subdir: str, pattern: str) -> List[str]:
+    """Paths matching a glob pattern in data_dir/subdir, loose or archived, sorted."""
+    paths = set(glob.glob(os.path.join(data_dir, subdir, pattern)))
+    for index_file in glob.glob(os.path.join(data_dir, ARCHIVE_DIR, "bundle_*.index.json")):
+        date_str = os.path.basename(index_file)[len("bundle_"):-len(".index.json")]
+        for name in load_index(data_dir, date_str)['members']:
+            member_dir, filename = name.split('/', 1)
+            if member_dir == subdir and fnmatch.fnmatch(filename, pattern):
+                paths.add(os.path.join(data_dir, subdir, filename))
+    return sorted(paths)
+
+
+def day_files(data_dir: str, date_str: str) -> List[str]:
+    """Loose raw files of one day."""
+    files = []
+    for subdir in RAW_DIRS:
+        files.extend(glob.glob(os.path.join(data_dir, subdir, f"*_{date_str}.json")))
+    return sorted(files)
+
+
+def archive_day(data_dir: str, date_str: str, codec: str = 'gzip', level: int = 6) -> Optional[str]:
+    """Pack one day's raw files into a bundle (adding to an existing one) and remove the originals."""
+    files = day_files(data_dir, date_str)
+    if not files:
+        return None
+    compress = _compressor(codec, level)
+    os.makedirs(os.path.join(data_dir, ARCHIVE_DIR), exist_ok=True)
+    existing = load_index(data_dir, date_str)
+    if existing and existing['codec'] != codec:
+        raise ValueError(f"Bundle for {date_str} uses {existing['codec']}, not {codec}")
+    bundle_name = f"bundle_{date_str}.{codec}" if not existing else existing['bundle']
+    bundle_path = os.path.join(data_dir, ARCHIVE_DIR, bundle_name)
+    members = dict(existing['members']) if existing else {}
+
+    raw_bytes = compressed_bytes = 0
+    # Append so members already in the bundle keep their offsets; the index is only
+    # replaced after the new members are written and verified
+    with open(bundle_path, 'ab') as bundle:
+        for path in files:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            compressed = compress(payload)
+            offset = bundle.tell()
+            bundle.write(compressed)
+            members[split_path(path)[1]] = {
+                'offset': offset,
+                'length': len(compressed),
+                'size': len(payload),
+                'sha1': hashlib.sha1(payload).hexdigest()
+            }
+            raw_bytes += len(payload)
+            compressed_bytes += len(compressed)
+        bundle.flush()
+        os.fsync(bundle.fileno())
+
+    index = {'version': INDEX_VERSION, 'date': date_str, 'codec': codec, 'bundle': bundle_name,
+             'members': members}
+    for path in files:
+        info = members[split_path(path)[1]]
+        with open(bundle_path, 'rb') as f:
+            f.seek(info['offset'])
+            restored = _reader(codec, f.read(info['length'])).read()
+        if hashlib.sha1(restored).hexdigest() != info['sha1']:
+            raise IOError(f"Verification failed for {path} in {bundle_path}; loose files kept")
+    writer.write_json(index_path(data_dir, date_str), index, indent=None)
+    writer.flush()
+    for path in files:
+        os.remove(path)
+
+    registry.inc("kalshi_archive_bytes_total", raw_bytes, kind="raw")
+    registry.inc("kalshi_archive_bytes_total", compressed_bytes, kind="compressed")
+    logger.info("Archived %d files for %s: %.1f MB -> %.1f MB (%s)", len(files), date_str,
+                raw_bytes / 1e6, compressed_bytes / 1e6, codec,
+                extra={'event': 'day_archived', 'date': date_str, 'files': len(files),
+                       'raw_bytes': raw_bytes, 'compressed_bytes': compressed_bytes})
+    return bundle_path
+
+
+def archive_days(data_dir: str = "historical_data", keep_days: int = 7, codec: str = 'gzip',
+                 level: int = 6) -> List[str]:
+    """Archive every day older than keep_days that still has loose raw files."""
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y%m%d')
+    dates = set()
+    for subdir in RAW_DIRS:
+        for path in glob.glob(os.path.join(data_dir, subdir, "*.json")):
+            match = DATE_RE.search(path)
+            if match and match.group(1) < cutoff:
+                dates.add(match.group(1))
+    return [bundle for bundle in (archive_day(data_dir, date_str, codec, level) for date_str in sorted(dates))
+            if bundle]
+
+
+def main():
+    setup_logging("day_archive")
+    parser = argparse.ArgumentParser(description="Pack past days of raw JSON into compressed bundles")
+    parser.add_argument("--data-dir", default="historical_data")
+    parser.add_argument("--keep-days", type=int, default=7, help="Leave this many recent days unpacked")
+    parser.add_argument("--codec", choices=['gzip', 'zstd'], default='gzip')
+    parser.add_argument("--level", type=int, default=6, help="Compression level")
+    args = parser.parse_args()
+    try:
+        bundles = archive_days(args.data_dir, args.keep_days, args.codec, args.level)
+        logger.info("Wrote %d bundles", len(bundles))
+    finally:
+        registry.export("day_archive")
+
+
+if __name__ == "__main__":
+    main()
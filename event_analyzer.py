@@ -1,54 +1,180 @@
-from collections import defaultdict
-from typing import Dict, List
-import json
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import argparse
+import os
 
-class EventAnalyzer:
-    def analyze_existing_data(self, json_path: str) -> Dict:
-        """Analyze events from existing JSON file."""
-        # Load data
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-            events = data.get('events', [])
-            
-        # Initialize counters
-        summary = {
-            'total_events': len(events),
-            'categories': defaultdict(int),
-            'time_types': defaultdict(int)
-        }
-        
-        # Analyze events
+import day_archive
+from file_cache import FingerprintCache
+from sketches import HyperLogLog
+
+# Bump when the partial aggregate layout changes so stale cache entries are ignored
+CACHE_VERSION = 1
+
+
+class EventSummary:
+    """Mergeable partial aggregate of one or more events snapshots."""
+
+    def __init__(self):
+        self.total_events = 0
+        self.categories: Counter = Counter()
+        self.time_types: Counter = Counter()
+        self.event_tickers = HyperLogLog()
+        self.series_tickers = HyperLogLog()
+        self.snapshots: List[str] = []
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict], snapshot: Optional[str] = None) -> "EventSummary":
+        summary = cls()
         for event in events:
-            # Count categories
-            category = event.get('category', 'unknown')
-            summary['categories'][category] += 1
-            
+            summary.total_events += 1
+            summary.categories[event.get('category', 'unknown')] += 1
+
             # Analyze time specifications
             if event.get('strike_date'):
-                summary['time_types']['specific_date'] += 1
+                summary.time_types['specific_date'] += 1
             elif event.get('strike_period'):
-                summary['time_types']['date_range'] += 1
+                summary.time_types['date_range'] += 1
             else:
-                summary['time_types']['no_date or date info in title?'] += 1
-        
+                summary.time_types['no_date or date info in title?'] += 1
+
+            if event.get('event_ticker'):
+                summary.event_tickers.add(event['event_ticker'])
+            if event.get('series_ticker'):
+                summary.series_tickers.add(event['series_ticker'])
+        if snapshot:
+            summary.snapshots.append(snapshot)
+        return summary
+
+    def merge(self, other: "EventSummary") -> "EventSummary":
+        """Fold another partial into this one in place."""
+        self.total_events += other.total_events
+        self.categories.update(other.categories)
+        self.time_types.update(other.time_types)
+        self.event_tickers.merge(other.event_tickers)
+        self.series_tickers.merge(other.series_tickers)
+        self.snapshots.extend(other.snapshots)
+        return self
+
+    def to_state(self) -> Dict:
+        """Plain-data form for caching, independent of where this class is imported from."""
+        return {
+            'total_events': self.total_events,
+            'categories': dict(self.categories),
+            'time_types': dict(self.time_types),
+            'event_tickers': bytes(self.event_tickers.registers),
+            'series_tickers': bytes(self.series_tickers.registers),
+            'snapshots': list(self.snapshots)
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "EventSummary":
+        summary = cls()
+        summary.total_events = state['total_events']
+        summary.categories = Counter(state['categories'])
+        summary.time_types = Counter(state['time_types'])
+        summary.event_tickers.registers = bytearray(state['event_tickers'])
+        summary.series_tickers.registers = bytearray(state['series_tickers'])
+        summary.snapshots = list(state['snapshots'])
+        return summary
+
+    def to_dict(self) -> Dict:
+        return {
+            'total_events': self.total_events,
+            'categories': dict(self.categories),
+            'time_types': dict(self.time_types),
+            'distinct_event_tickers': self.event_tickers.count(),
+            'distinct_series_tickers': self.series_tickers.count(),
+            'snapshots': len(self.snapshots)
+        }
+
+
+class EventAnalyzer:
+    def __init__(self, data_dir: str = "historical_data", cache: Optional[FingerprintCache] = None):
+        self.data_dir = data_dir
+        self._cache = cache
+
+    @property
+    def cache(self) -> FingerprintCache:
+        """Per-snapshot partials, created on first use so analyzers that never load files leave no cache dir."""
+        if self._cache is None:
+            self._cache = FingerprintCache(os.path.join(self.data_dir, "cache"), f"event_analyzer_v{CACHE_VERSION}")
+        return self._cache
+
+    def summarize_file(self, json_path: str) -> EventSummary:
+        """Partial aggregate for one snapshot, computed once per file content."""
+        state = self.cache.get(json_path)
+        if state is not None:
+            summary = EventSummary.from_state(state)
+            summary.snapshots = [json_path]
+            return summary
+
+        events = day_archive.load_json(json_path).get('events', [])
+        summary = EventSummary.from_events(events, json_path)
+        self.cache.put(json_path, summary.to_state())
         return summary
-    
+
+    def summarize_files(self, paths: Iterable[str]) -> EventSummary:
+        """Merge the cached partials of several snapshots; only new files are parsed."""
+        total = EventSummary()
+        for path in paths:
+            total.merge(self.summarize_file(path))
+        self.cache.flush()
+        return total
+
+    def snapshot_files(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
+        """open_events snapshots (loose or archived), optionally limited to an inclusive YYYYMMDD range."""
+        files = day_archive.list_files(self.data_dir, "open_events", "events_*.json")
+        selected = []
+        for path in files:
+            date_str = os.path.basename(path)[len("events_"):-len(".json")]
+            if (start_date and date_str < start_date) or (end_date and date_str > end_date):
+                continue
+            selected.append(path)
+        return selected
+
+    def analyze_archive(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict:
+        """Summary across every snapshot in the archive (or a date range of it)."""
+        return self.summarize_files(self.snapshot_files(start_date, end_date)).to_dict()
+
+    def analyze_existing_data(self, json_path: str) -> Dict:
+        """Analyze events from existing JSON file."""
+        summary = self.summarize_file(json_path)
+        self.cache.flush()
+        return summary.to_dict()
+
     def print_summary(self, summary: Dict):
         """Print formatted analysis summary."""
+        total = summary['total_events'] or 1
         print("\n=== Events Analysis ===")
+        if summary.get('snapshots', 1) > 1:
+            print(f"Snapshots: {summary['snapshots']}")
         print(f"Total Events: {summary['total_events']}")
-        
+        if 'distinct_event_tickers' in summary:
+            print(f"Distinct Event Tickers (approx.): {summary['distinct_event_tickers']}")
+            print(f"Distinct Series Tickers (approx.): {summary['distinct_series_tickers']}")
+
         print("\nCategory Distribution:")
         for category, count in sorted(summary['categories'].items(), key=lambda x: x[1], reverse=True):
-            percentage = (count / summary['total_events']) * 100
+            percentage = (count / total) * 100
             print(f"{category}: {count} ({percentage:.1f}%)")
-            
+
         print("\nTime Specification Distribution:")
         for time_type, count in sorted(summary['time_types'].items()):
-            percentage = (count / summary['total_events']) * 100
+            percentage = (count / total) * 100
             print(f"{time_type}: {count} ({percentage:.1f}%)")
 
+
 if __name__ == "__main__":
-    analyzer = EventAnalyzer()
-    summary = analyzer.analyze_existing_data("events_20250211.json")
+    parser = argparse.ArgumentParser(description="Summarize events snapshots")
+    parser.add_argument("files", nargs="*", help="Snapshot files (default: every open_events snapshot)")
+    parser.add_argument("--data-dir", default="historical_data")
+    parser.add_argument("--start", help="First snapshot date, YYYYMMDD")
+    parser.add_argument("--end", help="Last snapshot date, YYYYMMDD")
+    args = parser.parse_args()
+
+    analyzer = EventAnalyzer(args.data_dir)
+    if args.files:
+        summary = analyzer.summarize_files(args.files).to_dict()
+    else:
+        summary = analyzer.analyze_archive(args.start, args.end)
     analyzer.print_summary(summary)
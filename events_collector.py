@@ -1,23 +1,31 @@
 import json
+import logging
 import os
+import time
 from datetime import datetime
 from typing import Dict, List
 from auth_manager import AuthManager
 from market_data import MarketDataManager
+from failure_queue import FailureQueue
+from metrics import registry
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
 
 class EventsCollector:
     def __init__(self, auth_manager: AuthManager):
         self.market_data = MarketDataManager(auth_manager)
         self.data_dir = "historical_data"
+        self.redrive_wait = 60.0  # Seconds to wait at end of run for a failed page to become eligible
         self.ensure_directories()
+        self.failure_queue = FailureQueue(os.path.join(self.data_dir, "failure_queue_events.json"))
 
     def ensure_directories(self):
         """Create necessary directory structure."""
         dirs = [
             self.data_dir,
             os.path.join(self.data_dir, "events"),
-            os.path.join(self.data_dir, "markets"),
-            os.path.join(self.data_dir, "failures")
+            os.path.join(self.data_dir, "markets")
         ]
         for dir_path in dirs:
             if not os.path.exists(dir_path):
@@ -25,6 +33,7 @@ class EventsCollector:
 
     def collect_events(self) -> str:
         """Collect all events and save to file. Returns filename."""
+        stage_start = time.perf_counter()
         all_events = []
         cursor = None
         page = 1
@@ -38,54 +47,75 @@ class EventsCollector:
                 checkpoint = json.load(f)
                 last_collection = datetime.fromisoformat(checkpoint['last_events_collection'])
                 if last_collection.date() == timestamp.date():
-                    print("Events already collected for today.")
+                    logger.info("Events already collected for today.")
                     return checkpoint['events_file']
 
-        print("Collecting events...")
-        while True:
-            try:
-                print(f"Fetching page {page}...")
-                response = self.market_data.get_events(cursor=cursor)
+        logger.info("Collecting events...")
+        # Pagination position, so a retry resumes from the page that failed instead of page 1
+        position = {'cursor': cursor, 'page': page, 'done': False}
+
+        def fetch_pages():
+            while not position['done']:
+                logger.debug("Fetching page %d...", position['page'])
+                response = self.market_data.get_events(cursor=position['cursor'])
                 events = response.get('events', [])
                 
                 if not events:
-                    break
+                    position['done'] = True
+                    return
                     
                 all_events.extend(events)
-                cursor = response.get('cursor')
-                page += 1
+                position['cursor'] = response.get('cursor')
+                position['page'] += 1
                 
-                if not cursor:
-                    break
-                    
-            except Exception as e:
-                print(f"Error on page {page}: {e}")
-                # Log failure
-                failure_file = os.path.join(self.data_dir, "failures", f"events_failures_{date_str}.txt")
-                with open(failure_file, 'a') as f:
-                    f.write(f"{timestamp.isoformat()}: Failed to fetch page {page} - {str(e)}\n")
-                break
+                if not position['cursor']:
+                    position['done'] = True
+                    return
+
+        # A pending entry here means an earlier run saved a partial day; this run re-collects
+        # the whole day, so it is resolved below once pagination completes
+        try:
+            fetch_pages()
+        except Exception as e:
+            logger.error("Error on page %d: %s", position['page'], e,
+                         extra={'event': 'page_failed', 'page': position['page']})
+            self.failure_queue.record(date_str, "events", e, {'page': position['page'], 'cursor': position['cursor']})
+            self.failure_queue.redrive("events", lambda entry: fetch_pages(), wait_up_to=self.redrive_wait)
+        complete = position['done']
+        if complete:
+            for entry in self.failure_queue.pending("events"):
+                self.failure_queue.resolve(entry['ticker'], "events")
+        self.failure_queue.save()
 
         # Save events to file
         filename = os.path.join(self.data_dir, "events", f"events_{date_str}.json")
-        with open(filename, 'w') as f:
-            json.dump({
-                'timestamp': timestamp.isoformat(),
-                'total_events': len(all_events),
-                'events': all_events
-            }, f, indent=2)
+        writer.write_json(filename, {
+            'timestamp': timestamp.isoformat(),
+            'total_events': len(all_events),
+            'complete': complete,
+            'events': all_events
+        })
             
-        print(f"\nCollected {len(all_events)} events")
-        print(f"Saved to: {filename}")
+        if not complete:
+            # No checkpoint, so the next run collects the day again instead of trusting a partial file
+            logger.error("Collected only %d events before page %d failed; saved partial file to %s",
+                         len(all_events), position['page'], filename,
+                         extra={'event': 'events_partial', 'count': len(all_events), 'output_file': filename})
+            registry.record_stage("collect_events", time.perf_counter() - stage_start, len(all_events),
+                                  status="partial")
+            return filename
+
+        logger.info("Collected %d events, saved to %s", len(all_events), filename,
+                    extra={'event': 'events_collected', 'count': len(all_events), 'output_file': filename})
         
         # Create checkpoint - fixed filename for events checkpoint
         checkpoint_file = os.path.join(self.data_dir, "checkpoint_events.json")
-        with open(checkpoint_file, 'w') as f:
-            json.dump({
-                'last_events_collection': timestamp.isoformat(),
-                'events_file': filename,
-                'total_events': len(all_events)
-            }, f, indent=2)
+        writer.write_json(checkpoint_file, {
+            'last_events_collection': timestamp.isoformat(),
+            'events_file': filename,
+            'total_events': len(all_events)
+        })
+        registry.record_stage("collect_events", time.perf_counter() - stage_start, len(all_events))
         
         return filename
 
@@ -0,0 +1,111 @@
+import glob
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+INDEXED_FIELDS = ['close_time', 'expiration_time']
+
+# Horizon buckets relative to the collection time the index was built at
+HORIZONS = [
+    ('1h', timedelta(hours=1)),
+    ('6h', timedelta(hours=6)),
+    ('24h', timedelta(days=1)),
+    ('7d', timedelta(days=7)),
+    ('30d', timedelta(days=30)),
+]
+
+
+def _epoch_seconds(values: pd.Series) -> np.ndarray:
+    """UTC epoch seconds (float, NaN where missing) from timestamp strings or datetimes."""
+    times = pd.to_datetime(values.astype(object), utc=True, errors='coerce', format='ISO8601')
+    seconds = (times - pd.Timestamp(0, tz='UTC')).dt.total_seconds()
+    return seconds.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _to_epoch(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class ExpiryIndex:
+    """Market tickers sorted by close and expiration time, for range lookups by binary search.
+
+    Persisted as expiry_index_<date>.npz next to processed_markets_<date>.csv.
+    """
+
+    def __init__(self, times: Dict[str, np.ndarray], tickers: Dict[str, np.ndarray], as_of: float):
+        self.times = times
+        self.tickers = tickers
+        self.as_of = as_of
+
+    @classmethod
+    def build(cls, markets_df: pd.DataFrame, as_of: Optional[float] = None) -> "ExpiryIndex":
+        tickers = markets_df['ticker'].to_numpy(dtype=str)
+        sorted_times, sorted_tickers = {}, {}
+        for field in INDEXED_FIELDS:
+            if field not in markets_df.columns:
+                continue
+            seconds = _epoch_seconds(markets_df[field])
+            valid = ~np.isnan(seconds)
+            order = np.argsort(seconds[valid], kind='stable')
+            sorted_times[field] = seconds[valid][order]
+            sorted_tickers[field] = tickers[valid][order]
+        if as_of is None:
+            collected = markets_df.get('collection_timestamp')
+            as_of = (np.nanmin(_epoch_seconds(collected)) if collected is not None and len(collected)
+                     else datetime.now(timezone.utc).timestamp())
+        return cls(sorted_times, sorted_tickers, float(as_of))
+
+    def between(self, start, end, field: str = 'close_time') -> List[str]:
+        """Tickers whose field falls in [start, end); bounds are datetimes (naive = UTC) or epoch seconds."""
+        times = self.times[field]
+        lo = np.searchsorted(times, _to_epoch(start), side='left')
+        hi = np.searchsorted(times, _to_epoch(end), side='left')
+        return self.tickers[field][lo:hi].tolist()
+
+    def within(self, horizon: timedelta, field: str = 'close_time', now=None) -> List[str]:
+        """Tickers whose field falls between now and now + horizon."""
+        start = _to_epoch(now) if now is not None else datetime.now(timezone.utc).timestamp()
+        return self.between(start, start + horizon.total_seconds(), field)
+
+    def buckets(self, field: str = 'close_time') -> Dict[str, List[str]]:
+        """Partition by horizon from the index's collection time: '1h', '6h', ..., 'later' (and 'past')."""
+        times = self.times[field]
+        edges = [self.as_of] + [self.as_of + delta.total_seconds() for _, delta in HORIZONS]
+        positions = np.searchsorted(times, edges, side='left')
+        tickers = self.tickers[field]
+        partitions = {'past': tickers[:positions[0]].tolist()}
+        for (name, _), lo, hi in zip(HORIZONS, positions[:-1], positions[1:]):
+            partitions[name] = tickers[lo:hi].tolist()
+        partitions['later'] = tickers[positions[-1]:].tolist()
+        return partitions
+
+    def save(self, path: str):
+        arrays = {'as_of': np.array(self.as_of)}
+        for field in self.times:
+            arrays[f'{field}__times'] = self.times[field]
+            arrays[f'{field}__tickers'] = self.tickers[field]
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ExpiryIndex":
+        with np.load(path, allow_pickle=False) as data:
+            times = {key[:-len('__times')]: data[key] for key in data.files if key.endswith('__times')}
+            tickers = {field: data[f'{field}__tickers'] for field in times}
+            return cls(times, tickers, float(data['as_of']))
+
+    @classmethod
+    def latest(cls, data_dir: str = "historical_data") -> "ExpiryIndex":
+        """Index of the most recent processed markets snapshot."""
+        paths = sorted(glob.glob(os.path.join(data_dir, "processed_markets", "expiry_index_*.npz")))
+        if not paths:
+            raise FileNotFoundError(f"No expiry index under {data_dir}/processed_markets")
+        return cls.load(paths[-1])
@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
+
+
+class FailureQueue:
+    """Structured, persisted queue of items a collector failed to fetch.
+
+    Each entry records ticker, endpoint, error class, attempt count and the
+    next time it is eligible for a re-drive. Collectors re-drive due entries
+    at the end of a run and at the start of the next one; entries that keep
+    failing past max_attempts are kept as dead letters instead of retried.
+    """
+
+    def __init__(self, path: str, base_delay: float = 30.0, max_delay: float = 3600.0,
+                 max_attempts: int = 8):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.entries: Dict[str, Dict] = self._load()
+
+    @staticmethod
+    def _key(endpoint: str, ticker: str) -> str:
+        return f"{endpoint}:{ticker}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return {self._key(e['endpoint'], e['ticker']): e for e in data.get('entries', [])}
+        except (ValueError, KeyError) as e:
+            backup = f"{self.path}.bak"
+            os.replace(self.path, backup)
+            logger.error("Unreadable failure queue %s (%s); moved to %s", self.path, e, backup)
+            return {}
+
+    def save(self):
+        # last_update is volatile so saving an unchanged queue doesn't rewrite the file
+        writer.write_json(self.path, {
+            'last_update': datetime.now().isoformat(),
+            'pending': len(self.pending()),
+            'dead': len(self.dead()),
+            'entries': list(self.entries.values())
+        }, volatile_keys=('last_update',))
+
+    def __len__(self) -> int:
+        return len(self.pending())
+
+    def record(self, ticker: str, endpoint: str, error: Exception, context: Optional[Dict] = None) -> Dict:
+        """Record a failed attempt and schedule the next eligible time with jittered backoff."""
+        now = time.time()
+        key = self._key(endpoint, ticker)
+        entry = self.entries.get(key) or {
+            'ticker': ticker,
+            'endpoint': endpoint,
+            'attempts': 0,
+            'first_failed': datetime.fromtimestamp(now).isoformat(),
+            'dead': False
+        }
+        entry['attempts'] += 1
+        entry['error_class'] = type(error).__name__
+        entry['error'] = str(error)[:500]
+        entry['last_failed'] = datetime.fromtimestamp(now).isoformat()
+        delay = min(self.max_delay, self.base_delay * 2 ** (entry['attempts'] - 1))
+        entry['next_eligible'] = now + random.uniform(delay / 2, delay)
+        if context:
+            entry['context'] = context
+        if entry['attempts'] >= self.max_attempts and not entry['dead']:
+            entry['dead'] = True
+            logger.error("Giving up on %s %s after %d attempts: %s", endpoint, ticker, entry['attempts'],
+                         entry['error'], extra={'event': 'dead_letter', 'ticker': ticker, 'endpoint': endpoint})
+        self.entries[key] = entry
+        return entry
+
+    def resolve(self, ticker: str, endpoint: str):
+        self.entries.pop(self._key(endpoint, ticker), None)
+
+    def retain(self, endpoint: str, tickers: Set[str]) -> int:
+        """Drop an endpoint's entries (dead ones too) whose ticker isn't in tickers. Returns how many went."""
+        stale = [key for key, e in self.entries.items() if e['endpoint'] == endpoint and e['ticker'] not in tickers]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def pending(self, endpoint: Optional[str] = None) -> List[Dict]:
+        return [e for e in self.entries.values()
+                if not e['dead'] and (endpoint is None or e['endpoint'] == endpoint)]
+
+    def dead(self) -> List[Dict]:
+        return [e for e in self.entries.values() if e['dead']]
+
+    def due(self, endpoint: Optional[str] = None, now: Optional[float] = None) -> List[Dict]:
+        now = time.time() if now is None else now
+        return [e for e in self.pending(endpoint) if e['next_eligible'] <= now]
+
+    def redrive(self, endpoint: str, handler: Callable[[Dict], object], wait_up_to: float = 0.0) -> Tuple[int, int]:
+        """Call handler(entry) for each due entry of an endpoint; resolve on success.
+
+        With wait_up_to > 0, sleeps for entries that become eligible within that
+        many seconds instead of leaving them for the next run. Returns
+        (succeeded, failed) counts and persists the queue.
+        """
+        deadline = time.time() + wait_up_to
+        succeeded = failed = 0
+        attempted = set()
+        while True:
+            due = [e for e in self.due(endpoint) if self._key(e['endpoint'], e['ticker']) not in attempted]
+            if not due:
+                upcoming = [e['next_eligible'] for e in self.pending(endpoint)
+                            if self._key(e['endpoint'], e['ticker']) not in attempted
+                            and e['next_eligible'] <= deadline]
+                if not upcoming:
+                    break
+                time.sleep(max(0.0, min(upcoming) - time.time()))
+                continue
+            logger.info("Re-driving %d failed %s items", len(due), endpoint)
+            for entry in due:
+                attempted.add(self._key(entry['endpoint'], entry['ticker']))
+                try:
+                    handler(entry)
+                    self.resolve(entry['ticker'], entry['endpoint'])
+                    succeeded += 1
+                except Exception as e:
+                    self.record(entry['ticker'], entry['endpoint'], e, entry.get('context'))
+                    failed += 1
+        self.save()
+        return succeeded, failed
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Dict, Optional
+
+import day_archive
+
+
+def fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file; identical inputs give identical fingerprints wherever they live."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FingerprintCache:
+    """Pickled results keyed by the content fingerprint of the input file they came from.
+
+    A stat index (size, mtime) per path avoids re-hashing files that have not
+    been touched since they were last fingerprinted.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str):
+        self.cache_dir = os.path.join(cache_dir, namespace)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index_file = os.path.join(self.cache_dir, "stat_index.json")
+        self.stat_index: Dict[str, Dict] = self._load_index()
+        self._dirty = False
+
+    def _load_index(self) -> Dict[str, Dict]:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+        return {}
+
+    def fingerprint(self, path: str) -> str:
+        if not os.path.exists(path):
+            # Packed into a day bundle; the index holds the same content hash
+            info = day_archive.member_info(path)
+            if info is not None:
+                return info['sha1']
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        known = self.stat_index.get(key)
+        if known and known['size'] == st.st_size and known['mtime_ns'] == st.st_mtime_ns:
+            return known['fingerprint']
+        value = fingerprint(path)
+        self.stat_index[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'fingerprint': value}
+        self._dirty = True
+        return value
+
+    def _entry_path(self, fp: str) -> str:
+        return os.path.join(self.cache_dir, f"{fp}.pkl")
+
+    def get(self, path: str) -> Optional[Any]:
+        entry = self._entry_path(self.fingerprint(path))
+        if not os.path.exists(entry):
+            return None
+        try:
+            with open(entry, 'rb') as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, path: str, value: Any):
+        entry = self._entry_path(self.fingerprint(path))
+        tmp_path = f"{entry}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, entry)
+
+    def flush(self):
+        """Persist the stat index."""
+        if not self._dirty:
+            return
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.stat_index, f)
+        os.replace(tmp_path, self.index_file)
+        self._dirty = False
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the Kalshi pipeline scripts.
+
+Usage:
+    python kalshi_cli.py collect-events
+    python kalshi_cli.py collect-markets
+    python kalshi_cli.py process [YYYYMMDD]
+    python kalshi_cli.py explore
+    python kalshi_cli.py orderbooks [orderbook_collector options]
+    python kalshi_cli.py analytics [archive_analytics options]
+    python kalshi_cli.py schedule [scheduler options]
+    python kalshi_cli.py archive [day_archive options]
+    python kalshi_cli.py backfill --start YYYYMMDD --end YYYYMMDD [backfill options]
+    python kalshi_cli.py reprocess --start YYYYMMDD --end YYYYMMDD [reprocess options]
+    python kalshi_cli.py index [--refresh YYYYMMDD] [--keep-days N]
+
+Each subcommand imports only the modules it runs, so collection commands start
+without loading pandas, numpy or tabulate.
+"""
+
+import argparse
+import importlib
+import sys
+from typing import List, Optional
+
+# Subcommand -> (module, help); modules are imported only when their command runs
+COMMANDS = {
+    'collect-events': ('open_events_collector', "Collect open events"),
+    'collect-markets': ('open_market_collector', "Collect markets for today's open events"),
+    'process': ('process_open_events', "Process events and market details for a date"),
+    'explore': ('market_explorer', "Interactive market explorer"),
+    'orderbooks': ('orderbook_collector', "Snapshot orderbooks on a schedule"),
+    'analytics': ('archive_analytics', "Multi-day archive analytics"),
+    'schedule': ('scheduler', "Long-running scheduler for event sweeps and market refreshes"),
+    'archive': ('day_archive', "Pack past days of raw JSON into compressed bundles"),
+    'backfill': ('backfill', "Backfill settled/closed events and their markets over a date range"),
+    'reprocess': ('reprocess', "Reprocess a range of days in parallel, skipping unchanged days"),
+    'index': ('search_index', "Update the event/market search index"),
+}
+
+
+def load_command(name: str):
+    """Import the module behind a subcommand."""
+    return importlib.import_module(COMMANDS[name][0])
+
+
+def run_process(args: List[str]):
+    process_open_events = load_command('process')
+    process_market_details = importlib.import_module('process_market_details')
+    process_open_events.main(args)
+    process_market_details.main(args)
+
+
+def run_explore(args: List[str]):
+    market_explorer = load_command('explore')
+    market_explorer.setup_logging("market_explorer", level="WARNING")
+    market_explorer.MarketExplorer().run()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Kalshi data pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command == 'process':
+        run_process(rest)
+    elif args.command == 'explore':
+        run_explore(rest)
+    else:
+        # The remaining scripts parse their own options from sys.argv
+        sys.argv = [COMMANDS[args.command][0]] + rest
+        load_command(args.command).main()
+
+
+if __name__ == "__main__":
+    main()
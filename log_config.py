@@ -0,0 +1,113 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Dict, Optional
+
+# Pass as extra= on per-request / per-event messages so only 1 in N is emitted
+SAMPLED = {'sampled': True}
+
+# Attributes every LogRecord has; anything else on a record came in through extra=
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with extra= fields promoted to top-level keys."""
+
+    def __init__(self, job: Optional[str] = None):
+        super().__init__()
+        self.job = job
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if self.job:
+            payload['job'] = self.job
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != 'sampled':
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through every Nth record flagged with extra=SAMPLED, per message template."""
+
+    def __init__(self, every: int = 100):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False) or self.every == 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sample_rate = self.every
+        return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(job: Optional[str] = None, level: Optional[str] = None, fmt: Optional[str] = None,
+                  sample_every: Optional[int] = None, stream=None) -> logging.Logger:
+    """Route all records through a queue to a background writer thread.
+
+    Defaults come from KALSHI_LOG_LEVEL (INFO), KALSHI_LOG_FORMAT (text|json)
+    and KALSHI_LOG_SAMPLE_EVERY (100). pipeline_all_kalshi.py sets json so it
+    can read events from the child's stdout instead of scraping text.
+    """
+    global _listener
+    level = (level or os.environ.get("KALSHI_LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.environ.get("KALSHI_LOG_FORMAT", "text")
+    sample_every = sample_every or int(os.environ.get("KALSHI_LOG_SAMPLE_EVERY", "100"))
+
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter(job))
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s',
+                                              datefmt='%H:%M:%S'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_every))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # Keep third-party chatter (connection pool debug lines) out of our stream
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,25 +1,33 @@
 import json
+import logging
 import os
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
 from auth_manager import AuthManager
+from log_config import SAMPLED
 from market_data import MarketDataManager
+from failure_queue import FailureQueue
+from metrics import registry
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
 
 class MarketCollector:
     def __init__(self, auth_manager: AuthManager):
         self.market_data = MarketDataManager(auth_manager)
         self.data_dir = "historical_data"
         self.date = datetime.now().strftime('%Y%m%d')
+        self.redrive_wait = 60.0  # Seconds to wait at end of run for failed events to become eligible
         self.ensure_directories()
+        self.failure_queue = FailureQueue(os.path.join(self.data_dir, "failure_queue_markets.json"))
         
     def ensure_directories(self):
         """Create necessary directory structure."""
         dirs = [
             self.data_dir,
             os.path.join(self.data_dir, "events"),
-            os.path.join(self.data_dir, "markets"),
-            os.path.join(self.data_dir, "failures")
+            os.path.join(self.data_dir, "markets")
         ]
         for dir_path in dirs:
             if not os.path.exists(dir_path):
@@ -36,36 +44,41 @@ class MarketCollector:
     def save_checkpoint(self, processed_events: List[str], timestamp: str):
         """Save checkpoint of processed events."""
         checkpoint_file = os.path.join(self.data_dir, "checkpoint_markets.json")
-        with open(checkpoint_file, 'w') as f:
-            json.dump({
-                'processed_events': processed_events,
-                'last_timestamp': timestamp,
-                'total_processed': len(processed_events)
-            }, f, indent=2)
-
-    def collect_markets_by_event(self, event_ticker: str, retries: int = 3) -> Optional[List[Dict]]:
-        """Collect all markets for a specific event with retries."""
-        for attempt in range(retries):
-            try:
-                response = self.market_data.get_markets(event_ticker=event_ticker)
-                markets = response.get('markets', [])
-                if markets:
-                    return markets
-                time.sleep(1)  # Rate limiting protection
-            except Exception as e:
-                print(f"Attempt {attempt + 1}/{retries} failed for {event_ticker}: {e}")
-                if attempt < retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-        
-        # Log failed event
-        self.log_failure(event_ticker)
-        return None
-
-    def log_failure(self, event_ticker: str):
-        """Log failed event collections."""
-        failure_file = os.path.join(self.data_dir, "failures", f"failures_{datetime.now().strftime('%Y%m%d')}.txt")
-        with open(failure_file, 'a') as f:
-            f.write(f"{datetime.now().isoformat()}: Failed to collect markets for {event_ticker}\n")
+        writer.write_json(checkpoint_file, {
+            'processed_events': processed_events,
+            'last_timestamp': timestamp,
+            'total_processed': len(processed_events)
+        })
+
+    def collect_markets_by_event(self, event_ticker: str) -> Optional[List[Dict]]:
+        """Collect all markets for a specific event.
+
+        Retries happen in MarketDataManager; an empty list is a valid answer.
+        Returns None and records the event in the failure queue if the request failed.
+        """
+        try:
+            response = self.market_data.get_markets(event_ticker=event_ticker)
+            self.failure_queue.resolve(event_ticker, "markets")
+            return response.get('markets', [])
+        except Exception as e:
+            logger.warning("Failed to collect markets for %s: %s", event_ticker, e)
+            self.failure_queue.record(event_ticker, "markets", e)
+            self.failure_queue.save()
+            return None
+
+    def save_event_markets(self, event_ticker: str, markets: List[Dict], timestamp: str):
+        """Save markets for one event to its own file."""
+        event_file = os.path.join(
+            self.data_dir, 
+            "markets", 
+            f"markets_{event_ticker}_{datetime.now().strftime('%Y%m%d')}.json"
+        )
+        writer.write_json(event_file, {
+            'timestamp': timestamp,
+            'event_ticker': event_ticker,
+            'total_markets': len(markets),
+            'markets': markets
+        }, volatile_keys=('timestamp',))
 
     def get_event_ticker(self, event: Dict) -> Optional[str]:
         """Extract or construct event ticker from event data."""
@@ -93,6 +106,7 @@ class MarketCollector:
 
     def collect_all_markets(self, events_file, max_events) -> str:
         """Collect markets from events file with limit."""
+        stage_start = time.perf_counter()
         # Load checkpoint
         checkpoint = self.load_checkpoint()
         processed_events = set(checkpoint['processed_events'])
@@ -107,17 +121,29 @@ class MarketCollector:
         total_events = len(events)
         timestamp = datetime.now().isoformat()
 
-        print(f"Processing up to {max_events} events from {events_file}")
-        print(f"Already processed: {len(processed_events)} events")
+        logger.info("Processing up to %d events from %s (already processed: %d)",
+                    max_events, events_file, len(processed_events))
 
         events_processed = 0
 
+        def redrive_event(entry: Dict):
+            nonlocal events_processed
+            response = self.market_data.get_markets(event_ticker=entry['ticker'])
+            markets = response.get('markets', [])
+            self.save_event_markets(entry['ticker'], markets, timestamp)
+            all_markets.extend(markets)
+            processed_events.add(entry['ticker'])
+            events_processed += 1
+
         try:
+            # Events left over from the previous run go first
+            self.failure_queue.redrive("markets", redrive_event)
+
             # Collect markets for each event
             
             for i, event in enumerate(events, 1):
                 if events_processed >= max_events:
-                    print(f"\nReached maximum event limit of {max_events}")
+                    logger.info("Reached maximum event limit of %d", max_events)
                     break
 
                 event_ticker = self.get_event_ticker(event)
@@ -126,26 +152,16 @@ class MarketCollector:
                 if not event_ticker:
                     continue
                 if event_ticker in processed_events:
-                    print(f"[{i}/{total_events}] Skipping already processed event: {event_ticker}")
+                    logger.debug("[%d/%d] Skipping already processed event: %s", i, total_events, event_ticker,
+                                 extra=SAMPLED)
                     continue
 
-                print(f"[{i}/{total_events}] Fetching markets for event: {event_ticker}")
+                logger.info("[%d/%d] Fetching markets for event: %s", i, total_events, event_ticker, extra=SAMPLED)
                 markets = self.collect_markets_by_event(event_ticker)
                 
-                if markets:
+                if markets is not None:
                     # Save individual event markets
-                    event_file = os.path.join(
-                        self.data_dir, 
-                        "markets", 
-                        f"markets_{event_ticker}_{datetime.now().strftime('%Y%m%d')}.json"
-                    )
-                    with open(event_file, 'w') as f:
-                        json.dump({
-                            'timestamp': timestamp,
-                            'event_ticker': event_ticker,
-                            'total_markets': len(markets),
-                            'markets': markets
-                        }, f, indent=2)
+                    self.save_event_markets(event_ticker, markets, timestamp)
                     
                     all_markets.extend(markets)
                     processed_events.add(event_ticker)
@@ -154,14 +170,18 @@ class MarketCollector:
                     # Update checkpoint periodically
                     if i % 10 == 0:
                         self.save_checkpoint(list(processed_events), timestamp)
-                        print(f"Checkpoint saved: {len(processed_events)} events processed")
+                        logger.debug("Checkpoint saved: %d events processed", len(processed_events))
 
                 # Rate limiting
                 
                 time.sleep(0.5)
+                registry.inc("kalshi_throttle_wait_seconds_total", 0.5, component="markets")
+
+            # Give events that failed during the sweep another chance before the run ends
+            self.failure_queue.redrive("markets", redrive_event, wait_up_to=self.redrive_wait)
 
         except KeyboardInterrupt:
-            print("\nCollection interrupted. Saving progress...")
+            logger.warning("Collection interrupted. Saving progress...")
         finally:
             # Save final results
             output_file = os.path.join(
@@ -170,19 +190,20 @@ class MarketCollector:
                 f"all_markets_{datetime.now().strftime('%Y%m%d')}.json"
             )
             
-            with open(output_file, 'w') as f:
-                json.dump({
-                    'timestamp': timestamp,
-                    'total_markets': len(all_markets),
-                    'markets': all_markets,
-                    'events_processed': events_processed
-                }, f, indent=2)
+            writer.write_json(output_file, {
+                'timestamp': timestamp,
+                'total_markets': len(all_markets),
+                'markets': all_markets,
+                'events_processed': events_processed
+            })
 
             # Save final checkpoint
             self.save_checkpoint(list(processed_events), timestamp)
+            registry.record_stage("collect_markets", time.perf_counter() - stage_start, len(all_markets))
             
-            print(f"\nSaved {len(all_markets)} total markets to {output_file}")
-            print(f"Processed {events_processed} events")
+            logger.info("Saved %d total markets from %d events to %s", len(all_markets), events_processed,
+                        output_file, extra={'event': 'markets_collected', 'count': len(all_markets),
+                                            'events_processed': events_processed, 'output_file': output_file})
             return output_file
 
 # if __name__ == "__main__":
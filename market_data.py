@@ -1,19 +1,124 @@
+import logging
+import time
 import requests
 from typing import Dict, List, Optional
 from auth_manager import AuthManager
+from concurrency import ERROR, OK, OVERLOAD, AdaptiveLimiter
+from log_config import SAMPLED
+from metrics import registry
+from profiling import timed
+from retry_policy import RETRYABLE_STATUS, CircuitBreaker, RetryPolicy
+
+logger = logging.getLogger(__name__)
 
 class MarketDataManager:
     # def __init__(self, auth_manager: AuthManager, base_url: str = "https://trading-api.kalshi.com"):
     # def __init__(self, auth_manager: AuthManager, base_url: str = "https://api.kalshi.com"):
     # def __init__(self, auth_manager: AuthManager, base_url: str = "https://demo-api.kalshi.co"):
-    def __init__(self, auth_manager: AuthManager, base_url: str = "https://api.elections.kalshi.com"):
+    def __init__(self, auth_manager: AuthManager, base_url: str = "https://api.elections.kalshi.com",
+                 retry_policy: Optional[RetryPolicy] = None, circuit_breaker: Optional[CircuitBreaker] = None):
         self.auth = auth_manager
         self.base_url = base_url
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # Optional in-flight request limit shared by every thread using this client
+        self.limiter: Optional[AdaptiveLimiter] = None
+        # One pooled session keeps TLS connections warm across calls (and across threads)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get(self, endpoint: str, path: str, params: Dict) -> requests.Response:
+        """Signed GET with retries for throttling and transient errors.
+
+        Non-retryable responses (e.g. 404) are returned as-is for the caller's
+        raise_for_status. Retries stop at max_attempts or when the next backoff
+        would overrun the per-call deadline; the last response is then returned
+        or the last exception re-raised.
+        """
+        policy = self.retry_policy
+        started = time.monotonic()
+        delay = policy.base_delay
+        attempt = 1
+        while True:
+            self.circuit_breaker.before_call()
+            remaining = policy.deadline - (time.monotonic() - started)
+            response, error = None, None
+            try:
+                response = self._send(endpoint, path, params, timeout=max(0.1, min(policy.request_timeout, remaining)))
+            except requests.RequestException as e:
+                error = e
+
+            retryable = (policy.is_retryable_exception(error) if error is not None
+                         else policy.is_retryable_status(response.status_code))
+            if retryable:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+                if error is not None:
+                    raise error
+                return response
+
+            delay = policy.next_delay(delay)
+            server_delay = policy.retry_after(response)
+            if server_delay is not None:
+                delay = max(delay, server_delay)
+            elapsed = time.monotonic() - started
+            if attempt >= policy.max_attempts or elapsed + delay >= policy.deadline:
+                registry.inc("kalshi_request_retries_exhausted_total", endpoint=endpoint)
+                if error is not None:
+                    raise error
+                return response
+
+            reason = type(error).__name__ if error is not None else response.status_code
+            logger.warning("Retrying %s in %.2fs (attempt %d/%d, reason: %s)", path, delay, attempt + 1,
+                           policy.max_attempts, reason, extra=dict(SAMPLED, event='request_retry', endpoint=endpoint))
+            registry.inc("kalshi_request_retries_total", endpoint=endpoint, reason=reason)
+            registry.inc("kalshi_throttle_wait_seconds_total", delay, component="retry_backoff")
+            with timed('wait'):
+                time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _decode(response: requests.Response) -> Dict:
+        with timed('json'):
+            return response.json()
+
+    def _send(self, endpoint: str, path: str, params: Dict, timeout: float) -> requests.Response:
+        """Single signed GET that records latency and status code under the given endpoint label."""
+        headers = self.auth.generate_headers("GET", path)
+        logger.debug("GET %s%s params=%s", self.base_url, path, params, extra=SAMPLED)
+        limiter = self.limiter
+        if limiter is not None:
+            limiter.acquire()
+        outcome = OK
+        start = time.perf_counter()
+        try:
+            with timed('network'):
+                response = self.session.get(f"{self.base_url}{path}", headers=headers, params=params, timeout=timeout)
+            if response.status_code == 429:
+                outcome = OVERLOAD
+            elif response.status_code in RETRYABLE_STATUS:
+                outcome = ERROR
+        except requests.RequestException as e:
+            outcome = OVERLOAD if isinstance(e, requests.Timeout) else ERROR
+            registry.inc("kalshi_requests_total", endpoint=endpoint, status=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.observe("kalshi_request_duration_seconds", elapsed, endpoint=endpoint)
+            if limiter is not None:
+                limiter.release(elapsed, outcome)
+        registry.inc("kalshi_requests_total", endpoint=endpoint, status=response.status_code)
+        if response.status_code == 404:
+            logger.warning("404 from %s: %s", path, response.text,
+                           extra={'event': 'http_404', 'endpoint': endpoint})
+        return response
 
     def get_events(self, cursor: Optional[str] = None, limit: int = 100, status: Optional[str] = None) -> Dict:
         """Get available events with pagination support."""
         path = "/trade-api/v2/events"
-        headers = self.auth.generate_headers("GET", path)
         
         # Simple params - just limit, cursor, and status
         params = {"limit": limit}
@@ -22,14 +127,18 @@ class MarketDataManager:
         if status:
             params["status"] = status
         
-        print(f"Making request to: {self.base_url}{path}")
-        response = requests.get(f"{self.base_url}{path}", headers=headers, params=params)
-        
-        if response.status_code == 404:
-            print(f"404 Error Details: {response.text}")
+        response = self._get("events", path, params)
         response.raise_for_status()
         
-        return response.json()  # Return raw response which includes events and cursor
+        return self._decode(response)  # Raw response, which includes events and cursor
+
+    def get_event(self, event_ticker: str, with_nested_markets: bool = False) -> Dict:
+        """Get one event (any status) together with its markets."""
+        path = f"/trade-api/v2/events/{event_ticker}"
+        params = {"with_nested_markets": "true"} if with_nested_markets else {}
+        response = self._get("event", path, params)
+        response.raise_for_status()
+        return self._decode(response)
 
     def get_markets(self, event_ticker: Optional[str] = None) -> Dict:
         """Get markets for an event."""
@@ -38,32 +147,16 @@ class MarketDataManager:
         if event_ticker:
             params['event_ticker'] = event_ticker
             
-        headers = self.auth.generate_headers("GET", path)
-        print(f"Making request to: {self.base_url}{path} with params: {params}")
-        
-        response = requests.get(f"{self.base_url}{path}", headers=headers, params=params)
-        if response.status_code == 404:
-            print(f"404 Error Details: {response.text}")
+        response = self._get("markets", path, params)
         response.raise_for_status()
-        return response.json()
+        return self._decode(response)
 
     def get_market_orderbook(self, ticker: str, depth: int = 5) -> Dict:
         """Get orderbook for a specific market with specified depth."""
         path = f"/trade-api/v2/markets/{ticker}/orderbook"
-        headers = self.auth.generate_headers("GET", path)
         
         params = {"depth": depth}  # Add depth parameter to show top N levels
         
-        print(f"Requesting orderbook from: {self.base_url}{path}")
-        response = requests.get(f"{self.base_url}{path}", 
-                              headers=headers,
-                              params=params)
-        
-        if response.status_code == 404:
-            print(f"404 Error Details: {response.text}")
-        else:
-            print(f"Response status: {response.status_code}")
-            print(f"Response body: {response.text}")
-            
+        response = self._get("orderbook", path, params)
         response.raise_for_status()
-        return response.json()
+        return self._decode(response)
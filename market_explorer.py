@@ -1,14 +1,18 @@
 from auth_manager import AuthManager
 from market_data import MarketDataManager
+from log_config import setup_logging
+from search_index import SearchIndex
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
-import pandas as pd
-from tabulate import tabulate
+from typing import Dict, Any, List, Optional
 import time
 
+logger = logging.getLogger(__name__)
+
 class MarketExplorer:
-    def __init__(self):
+    def __init__(self, orderbook_workers: int = 32):
         self.auth = AuthManager(
             key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd",
             key_file_path="private_key.pem"
@@ -18,6 +22,10 @@ class MarketExplorer:
         self.current_market = None
         self.all_events = []
         self.all_markets = []
+        self.search_index = None
+        self.snapshot = None  # Latest processed markets snapshot, memory-mapped on first use
+        # Most concurrent orderbook requests in depth analysis; matches the session's connection pool
+        self.orderbook_workers = orderbook_workers
 
     def fetch_all_events(self):
         """Fetch all events using pagination."""
@@ -42,17 +50,17 @@ class MarketExplorer:
                 # Add events to our list
                 all_events.extend(events)
                 total_pages += 1
-                print(f"Fetched page {total_pages}, total events: {len(all_events)}")
+                logger.debug("Fetched page %d, total events: %d", total_pages, len(all_events))
                 
                 # If no cursor or no events, we're done
                 if not cursor or not events:
                     break
                 
         except Exception as e:
-            print(f"Error fetching events: {e}")
+            logger.error("Error fetching events: %s", e)
         
         self.all_events = all_events
-        print(f"\nCompleted fetching {len(all_events)} events from {total_pages} pages")
+        logger.info("Completed fetching %d events from %d pages", len(all_events), total_pages)
         return all_events
 
     def show_events(self):
@@ -101,6 +109,62 @@ class MarketExplorer:
                     except Exception as e:
                         print(f"Error: {e}")
 
+    def search(self):
+        """Search indexed events and markets; filters as category:<name> status:<status> kind:<event|market>."""
+        if self.search_index is None:
+            self.search_index = SearchIndex()
+            self.search_index.update()
+        if not self.search_index.docs:
+            print("Search index is empty - collect open events first.")
+            return None
+
+        raw = input("Search (e.g. 'fed rate category:Economics status:open'): ").strip()
+        filters = {}
+        terms = []
+        for part in raw.split():
+            key, sep, value = part.partition(':')
+            if sep and key in ('category', 'status', 'kind'):
+                filters[key] = value.replace('_', ' ')
+            else:
+                terms.append(part)
+        start = time.perf_counter()
+        results = self.search_index.search(' '.join(terms), **filters)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        print(f"\n{len(results)} results in {elapsed_ms:.1f} ms:")
+        for i, doc in enumerate(results, start=1):
+            ticker = doc['event_ticker'] if doc['kind'] == 'event' else doc['ticker']
+            print(f"{i}. [{doc['kind']}] {doc['title']} ({ticker}) - {doc.get('category')}, {doc.get('status')}")
+        if not results:
+            return None
+
+        choice = input("\nSelect result number to analyze its event (Enter to skip): ").strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(results):
+            self.analyze_event_markets(results[int(choice) - 1]['event_ticker'])
+        return results
+
+    def show_snapshot_markets(self, event_ticker: str):
+        """Markets of an event from the latest processed snapshot, without calling the API."""
+        if self.snapshot is None:
+            from market_snapshot import MarketSnapshot
+            try:
+                self.snapshot = MarketSnapshot.latest()
+            except FileNotFoundError as e:
+                print(e)
+                return None
+        rows = self.snapshot.equals('event_ticker', event_ticker).nonzero()[0]
+        if not len(rows):
+            print(f"No markets for {event_ticker} in {self.snapshot.path}")
+            return None
+
+        from tabulate import tabulate
+        columns = [c for c in ('ticker', 'title', 'yes_bid', 'yes_ask', 'no_bid', 'no_ask', 'volume',
+                               'open_interest', 'status', 'days_to_expiration') if c in self.snapshot.schema]
+        df = self.snapshot.to_dataframe(columns, rows=rows)
+        print(f"\n{len(df)} markets for {event_ticker} from {self.snapshot.path}:")
+        print(tabulate(df, headers='keys', tablefmt='grid', showindex=False))
+        return df
+
     def show_markets_for_event(self):
         """Display markets for current event."""
         if not self.current_event:
@@ -190,8 +254,73 @@ class MarketExplorer:
             for ask in orderbook['asks'][:5]:  # Show top 5 asks
                 print(f"Price: {ask['price']}, Size: {ask['size']}")
 
-    def analyze_event_markets(self, event_ticker: str):
-        """Analyze markets for a specific event ticker."""
+    def fetch_orderbooks(self, tickers: List[str], depth: int = 10) -> Dict[str, Any]:
+        """Fetch orderbooks concurrently, one request per ticker in flight up to orderbook_workers.
+
+        Maps ticker to the orderbook response, or to the exception if that fetch failed.
+        """
+        def fetch(ticker):
+            try:
+                return self.market_data.get_market_orderbook(ticker, depth=depth)
+            except Exception as e:
+                return e
+
+        if not tickers:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.orderbook_workers, len(tickers))) as pool:
+            return dict(zip(tickers, pool.map(fetch, tickers)))
+
+    @staticmethod
+    def summarize_orderbook(ticker: str, orderbook: Any) -> Dict:
+        """Best prices, spread and resting size from a yes/no bid orderbook."""
+        if isinstance(orderbook, Exception):
+            return {'Ticker': ticker, 'Error': str(orderbook)}
+        book = orderbook.get('orderbook') or {}
+        yes_levels = book.get('yes') or []
+        no_levels = book.get('no') or []
+        best_yes_bid = max((price for price, _ in yes_levels), default=None)
+        best_no_bid = max((price for price, _ in no_levels), default=None)
+        # Buying yes means selling into the best no bid
+        best_yes_ask = 100 - best_no_bid if best_no_bid is not None else None
+        spread = best_yes_ask - best_yes_bid if best_yes_bid is not None and best_yes_ask is not None else None
+        return {
+            'Ticker': ticker,
+            'Best Yes Bid': best_yes_bid,
+            'Best Yes Ask': best_yes_ask,
+            'Spread': spread,
+            'Yes Levels': len(yes_levels),
+            'No Levels': len(no_levels),
+            'Yes Depth': sum(quantity for _, quantity in yes_levels),
+            'No Depth': sum(quantity for _, quantity in no_levels),
+            'Error': None
+        }
+
+    def analyze_orderbook_depth(self, markets: List[Dict], top_n: Optional[int] = None, depth: int = 10):
+        """Fetch orderbooks for the top_n highest-volume markets (all if None) and print one depth table."""
+        selected = sorted(markets, key=lambda m: m.get('volume', 0), reverse=True)
+        if top_n is not None:
+            selected = selected[:top_n]
+        tickers = [m['ticker'] for m in selected]
+        import pandas as pd
+        from tabulate import tabulate
+
+        start = time.perf_counter()
+        orderbooks = self.fetch_orderbooks(tickers, depth)
+        elapsed = time.perf_counter() - start
+
+        df = pd.DataFrame([self.summarize_orderbook(ticker, orderbooks[ticker]) for ticker in tickers])
+        if df['Error'].isna().all():
+            df = df.drop(columns='Error')
+        print(f"\nOrderbook depth for {len(tickers)} markets "
+              f"(fetched in {elapsed:.2f}s, {min(self.orderbook_workers, len(tickers))} concurrent requests):")
+        print(tabulate(df, headers='keys', tablefmt='grid', showindex=False))
+
+    def analyze_event_markets(self, event_ticker: str, orderbook_markets: Optional[int] = 0):
+        """Analyze markets for a specific event ticker.
+
+        orderbook_markets selects the orderbook view: 0 shows only the highest-volume
+        market's book, N summarizes depth for the top N markets, None for all markets.
+        """
         try:
             # Fetch current market data
             response = self.market_data.get_markets(event_ticker)
@@ -201,6 +330,10 @@ class MarketExplorer:
                 print(f"No markets found for event {event_ticker}")
                 return
 
+            # pandas and tabulate are only needed for the analysis tables
+            import pandas as pd
+            from tabulate import tabulate
+
             # Create DataFrame with market analysis
             market_data = []
             for market in markets:
@@ -241,9 +374,12 @@ class MarketExplorer:
             print("\nDetailed Market Data:")
             print(tabulate(df, headers='keys', tablefmt='grid', showindex=False))
             
-            # Show orderbook for highest volume market
-            highest_volume_market = max(markets, key=lambda x: x.get('volume', 0))
-            self.display_market_details(highest_volume_market['ticker'])
+            if orderbook_markets == 0:
+                # Show orderbook for highest volume market
+                highest_volume_market = max(markets, key=lambda x: x.get('volume', 0))
+                self.display_market_details(highest_volume_market['ticker'])
+            else:
+                self.analyze_orderbook_depth(markets, orderbook_markets)
 
         except Exception as e:
             print(f"Error analyzing markets: {e}")
@@ -300,20 +436,34 @@ class MarketExplorer:
             print("\nKalshi Market Explorer")
             print("1. Enter Event Ticker")
             print("2. Browse Events") 
-            print("3. Exit")
+            print("3. Search Events and Markets")
+            print("4. Event Markets from Latest Snapshot (offline)")
+            print("5. Exit")
             
-            choice = input("Select option (1-3): ")
+            choice = input("Select option (1-5): ")
             
             if choice == "1":
                 event_ticker = input("Enter event ticker: ").strip().upper()
-                self.analyze_event_markets(event_ticker)
+                books = input("Orderbook depth for how many markets? (number, 'all', Enter for top market only): ")
+                books = books.strip().lower()
+                if books == 'all':
+                    self.analyze_event_markets(event_ticker, orderbook_markets=None)
+                elif books.isdigit():
+                    self.analyze_event_markets(event_ticker, orderbook_markets=int(books))
+                else:
+                    self.analyze_event_markets(event_ticker)
             elif choice == "2":
                 self.interactive_menu()
             elif choice == "3":
+                self.search()
+            elif choice == "4":
+                self.show_snapshot_markets(input("Enter event ticker: ").strip().upper())
+            elif choice == "5":
                 break
             else:
                 print("Invalid choice!")
 
 if __name__ == "__main__":
+    setup_logging("market_explorer", level="WARNING")
     explorer = MarketExplorer()
     explorer.run()
@@ -0,0 +1,200 @@
+import glob
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path(date_str: str, data_dir: str = "historical_data") -> str:
+    return os.path.join(data_dir, "processed_markets", f"markets_{date_str}.cols")
+
+
+class MarketSnapshot:
+    """Columnar, memory-mapped snapshot of one day's processed markets.
+
+    A snapshot is a directory holding one .npy file per column plus meta.json:
+    - numeric, bool and datetime columns are stored as-is
+    - nullable integers as values plus a <column>.mask.npy of missing rows
+    - categoricals as integer codes plus a string table of categories
+    - strings as UTF-8 bytes plus <column>.offsets.npy (Arrow-style)
+
+    Files are opened with np.load(mmap_mode='r'), so columns are sliced straight
+    from the page cache: read-only queries copy only the rows they touch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), 'r') as f:
+            meta = json.load(f)
+        if meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}: {meta.get('version')}")
+        self.rows: int = meta['rows']
+        self.schema: Dict[str, Dict] = meta['columns']
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def for_date(cls, date_str: str, data_dir: str = "historical_data") -> "MarketSnapshot":
+        return cls(snapshot_path(date_str, data_dir))
+
+    @classmethod
+    def latest(cls, data_dir: str = "historical_data") -> "MarketSnapshot":
+        paths = sorted(glob.glob(os.path.join(data_dir, "processed_markets", "markets_*.cols")))
+        if not paths:
+            raise FileNotFoundError("No market snapshots; run process_market_details.py first")
+        return cls(paths[-1])
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.schema)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _load(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            array = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+            self._arrays[name] = array
+        return array
+
+    def array(self, column: str) -> np.ndarray:
+        """Zero-copy array of a column: values for numeric/datetime columns, codes for categoricals."""
+        kind = self.schema[column]['kind']
+        if kind == 'string':
+            raise TypeError(f"{column} is a string column; use strings()")
+        return self._load(column)
+
+    def mask(self, column: str) -> Optional[np.ndarray]:
+        """Rows where the column is missing, or None if it has no missing values."""
+        if not self.schema[column].get('masked'):
+            return None
+        return self._load(f"{column}.mask")
+
+    def categories(self, column: str) -> np.ndarray:
+        if column not in self._categories:
+            self._categories[column] = self._decode(f"{column}.categories",
+                                                    self.schema[column]['categories'])
+        return self._categories[column]
+
+    def equals(self, column: str, value) -> np.ndarray:
+        """Boolean row mask of column == value, comparing codes for categoricals."""
+        if self.schema[column]['kind'] == 'category':
+            matches = np.flatnonzero(self.categories(column) == value)
+            code = matches[0] if len(matches) else -2
+            return self._load(column) == code
+        if self.schema[column]['kind'] == 'string':
+            return self.strings(column) == value
+        return self._load(column) == value
+
+    def strings(self, column: str, rows=None) -> np.ndarray:
+        """Decode a string column (or just the selected rows) to an object array."""
+        values = self._decode(column, self.rows, rows)
+        missing = self.mask(column)
+        if missing is not None:
+            values[missing if rows is None else missing[rows]] = None
+        return values
+
+    def _decode(self, name: str, count: int, rows=None) -> np.ndarray:
+        data = self._load(name)
+        offsets = self._load(f"{name}.offsets")
+        if rows is None:
+            starts, ends = offsets[:-1].tolist(), offsets[1:].tolist()
+            raw = data.tobytes()
+        else:
+            indices = np.arange(count)[rows]
+            starts, ends = offsets[indices].tolist(), offsets[indices + 1].tolist()
+            raw = data.tobytes() if len(indices) > count // 4 else data
+        out = np.empty(len(starts), dtype=object)
+        out[:] = [bytes(raw[start:end]).decode('utf-8') for start, end in zip(starts, ends)]
+        return out
+
+    def to_dataframe(self, columns: Optional[Iterable[str]] = None, rows=None):
+        """Materialize selected columns (default all) and rows as a DataFrame with the processed schema."""
+        import pandas as pd
+        frame = {}
+        for column in columns or self.columns:
+            spec = self.schema[column]
+            if spec['kind'] == 'string':
+                frame[column] = pd.Series(self.strings(column, rows), dtype=spec['dtype'])
+                continue
+            values = self._load(column)
+            values = np.asarray(values if rows is None else values[rows])
+            if spec['kind'] == 'category':
+                frame[column] = pd.Categorical.from_codes(values, categories=self.categories(column))
+            elif spec.get('nullable'):
+                array = pd.array(values, dtype=spec['dtype'])
+                missing = self.mask(column)
+                if missing is not None:
+                    array[np.asarray(missing if rows is None else missing[rows])] = pd.NA
+                frame[column] = array
+            else:
+                frame[column] = values
+        return pd.DataFrame(frame)
+
+    def to_arrow(self, columns: Optional[Iterable[str]] = None):
+        """pyarrow Table of the snapshot; pyarrow is optional and only needed here."""
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("pyarrow is required for Arrow output (pip install pyarrow)") from e
+        return pa.Table.from_pandas(self.to_dataframe(columns), preserve_index=False)
+
+    @staticmethod
+    def write(markets_df, path: str) -> str:
+        """Write a processed markets DataFrame as a snapshot directory (replacing any existing one)."""
+        import pandas as pd
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        schema: Dict[str, Dict] = {}
+
+        def save(name: str, array: np.ndarray):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+        def save_strings(name: str, values) -> np.ndarray:
+            encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            save(name, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+            save(f"{name}.offsets", offsets)
+
+        for column in markets_df.columns:
+            series = markets_df[column]
+            dtype = series.dtype
+            missing = series.isna().to_numpy()
+            if isinstance(dtype, pd.CategoricalDtype):
+                save(column, series.cat.codes.to_numpy())
+                save_strings(f"{column}.categories", list(dtype.categories))
+                schema[column] = {'kind': 'category', 'categories': len(dtype.categories)}
+            elif pd.api.types.is_extension_array_dtype(dtype) and dtype.kind in 'iufb':
+                save(column, series.to_numpy(dtype=dtype.numpy_dtype, na_value=0))
+                schema[column] = {'kind': 'numeric', 'dtype': str(dtype), 'nullable': True}
+                if missing.any():
+                    save(f"{column}.mask", missing)
+                    schema[column]['masked'] = True
+            elif dtype.kind in 'iufbM' and not pd.api.types.is_extension_array_dtype(dtype):
+                save(column, series.to_numpy())
+                schema[column] = {'kind': 'numeric', 'dtype': str(dtype)}
+            else:
+                # Strings and anything else without a fixed-width layout
+                save_strings(column, [None if gap else value for value, gap in zip(series.tolist(), missing)])
+                schema[column] = {'kind': 'string', 'dtype': 'str' if dtype == object else str(dtype)}
+                if missing.any():
+                    save(f"{column}.mask", missing)
+                    schema[column]['masked'] = True
+
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'rows': len(markets_df), 'columns': schema}, f, indent=2)
+        # Swap directories so readers see either the old snapshot or the complete new one
+        old_path = f"{path}.old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
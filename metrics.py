@@ -0,0 +1,256 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Request latencies against the Kalshi API sit between a few ms and a few seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIGNING_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict] = None) -> str:
+    items = list(key) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if seen + self.counts[i] >= target:
+                fraction = (target - seen) / self.counts[i] if self.counts[i] else 0
+                return lower + (bound - lower) * fraction
+            seen += self.counts[i]
+            lower = bound
+        return self.buckets[-1] if self.buckets else None
+
+    def to_dict(self) -> Dict:
+        p50, p95, p99 = (self.quantile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': round(p50, 6) if p50 is not None else None,
+            'p95': round(p95, 6) if p95 is not None else None,
+            'p99': round(p99, 6) if p99 is not None else None,
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges, histograms and stage timings.
+
+    Exported either as Prometheus text (file or HTTP endpoint) or as a JSON
+    run summary, which pipeline_all_kalshi.py merges across its steps.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters: Dict[str, Dict[LabelKey, float]] = {}
+            self.gauges: Dict[str, Dict[LabelKey, float]] = {}
+            self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+            self.stages: List[Dict] = []
+            self.timeseries: Dict[str, List[Dict]] = {}
+            self.started_at = datetime.now().isoformat()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def counter_values(self, name: str) -> Dict[LabelKey, float]:
+        """Copy of one counter's series, taken under the lock."""
+        with self._lock:
+            return dict(self.counters.get(name, {}))
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def record_point(self, name: str, value: float, **labels):
+        """Append a timestamped value to a series kept in the JSON summary (e.g. a limit's history)."""
+        with self._lock:
+            self.timeseries.setdefault(name, []).append(
+                {'time': datetime.now().isoformat(), 'value': value, 'labels': {k: str(v) for k, v in labels.items()}})
+
+    @contextmanager
+    def timer(self, name: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, buckets, **labels)
+
+    def record_stage(self, stage: str, duration: float, rows: Optional[int] = None, status: str = "ok"):
+        """Record one pipeline stage execution (duration in seconds, rows produced)."""
+        self.inc("kalshi_stage_duration_seconds_total", duration, stage=stage)
+        self.inc("kalshi_stage_runs_total", 1, stage=stage, status=status)
+        if rows is not None:
+            self.inc("kalshi_stage_rows_total", rows, stage=stage)
+        with self._lock:
+            self.stages.append({
+                'stage': stage,
+                'finished_at': datetime.now().isoformat(),
+                'duration_s': round(duration, 4),
+                'rows': rows,
+                'rows_per_s': round(rows / duration, 2) if rows and duration else None,
+                'status': status
+            })
+
+    def to_prometheus(self, const_labels: Optional[Dict] = None) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key, const_labels)} {value}")
+            for name in sorted(self.gauges):
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in sorted(self.gauges[name].items()):
+                    lines.append(f"{name}{_format_labels(key, const_labels)} {value}")
+            for name in sorted(self.histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(list(hist.buckets) + ['+Inf'], hist.counts):
+                        cumulative += count
+                        labels = dict(const_labels or {}, le=str(bound))
+                        lines.append(f"{name}_bucket{_format_labels(key, labels)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key, const_labels)} {hist.sum}")
+                    lines.append(f"{name}_count{_format_labels(key, const_labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict:
+        def labelled(series: Dict[LabelKey, object], convert) -> List[Dict]:
+            return [{'labels': dict(key), 'value': convert(value)} for key, value in sorted(series.items())]
+
+        with self._lock:
+            return {
+                'started_at': self.started_at,
+                'finished_at': datetime.now().isoformat(),
+                'stages': list(self.stages),
+                'counters': {n: labelled(s, lambda v: v) for n, s in self.counters.items()},
+                'gauges': {n: labelled(s, lambda v: v) for n, s in self.gauges.items()},
+                'histograms': {n: labelled(s, Histogram.to_dict) for n, s in self.histograms.items()},
+                'timeseries': {n: list(points) for n, points in self.timeseries.items()}
+            }
+
+    def export(self, job: str, metrics_dir: Optional[str] = None) -> Dict[str, str]:
+        """Write <job>.prom and <job>.json into the metrics directory. Returns the paths."""
+        metrics_dir = metrics_dir or os.environ.get("KALSHI_METRICS_DIR",
+                                                    os.path.join("historical_data", "metrics"))
+        os.makedirs(metrics_dir, exist_ok=True)
+        paths = {
+            'prometheus': os.path.join(metrics_dir, f"{job}.prom"),
+            'summary': os.path.join(metrics_dir, f"{job}.json")
+        }
+        # Write to a temp file and rename so textfile collectors never read a partial file
+        for path, content in ((paths['prometheus'], self.to_prometheus({'job': job})),
+                              (paths['summary'], json.dumps(dict(self.summary(), job=job), indent=2))):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return paths
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve /metrics in Prometheus text format from a background thread."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                payload = registry.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def merge_prometheus_files(paths: List[str]) -> str:
+    """Concatenate per-job textfiles, keeping a single TYPE line per metric family."""
+    families: Dict[str, List[str]] = {}
+    types: Dict[str, str] = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        family = None
+        with open(path) as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("# TYPE "):
+                    _, _, family, kind = line.split()
+                    types.setdefault(family, kind)
+                    families.setdefault(family, [])
+                elif line and family:
+                    families[family].append(line)
+    lines = []
+    for family, samples in families.items():
+        lines.append(f"# TYPE {family} {types[family]}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
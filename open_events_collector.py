@@ -1,9 +1,19 @@
+import argparse
 import json
+import logging
 import os
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+import day_archive
 from auth_manager import AuthManager
+from log_config import SAMPLED, setup_logging
 from market_data import MarketDataManager
+from metrics import registry
+from output_writer import writer
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
 
 
 class EventsCollector:
@@ -12,6 +22,7 @@ class EventsCollector:
         self.data_dir = "historical_data"
         self.ensure_directories()
         self.checkpoint_file = os.path.join(self.data_dir, "events_collection_history.json")
+        self.last_events: Optional[List[Dict]] = None  # Kept between sweeps by long-running callers
 
     def ensure_directories(self):
         """Create necessary directory structure."""
@@ -31,19 +42,18 @@ class EventsCollector:
                     with open(self.checkpoint_file, 'r') as f:
                         return json.load(f)
                 else:
-                    print("Checkpoint file exists but is empty, creating new checkpoint")
+                    logger.info("Checkpoint file exists but is empty, creating new checkpoint")
             else:
-                print("No existing checkpoint file found, creating new one")
+                logger.info("No existing checkpoint file found, creating new one")
         except json.JSONDecodeError as e:
-            print(f"Error reading checkpoint file: {e}")
-            print("Creating new checkpoint file")
+            logger.error("Error reading checkpoint file: %s; creating new checkpoint file", e)
             # Optionally backup the corrupted file
             if os.path.exists(self.checkpoint_file):
                 backup = f"{self.checkpoint_file}.bak"
                 os.rename(self.checkpoint_file, backup)
-                print(f"Backed up corrupted checkpoint to: {backup}")
+                logger.warning("Backed up corrupted checkpoint to: %s", backup)
         except Exception as e:
-            print(f"Unexpected error with checkpoint file: {e}")
+            logger.error("Unexpected error with checkpoint file: %s", e)
         
         return {'collections': []}
 
@@ -52,8 +62,8 @@ class EventsCollector:
         current_event_dict = {e['event_ticker']: e for e in current_events}
         previous_event_dict = {e['event_ticker']: e for e in previous_events}
         
-        added_tickers = set(current_event_dict.keys()) - set(previous_event_dict.keys())
-        removed_tickers = set(previous_event_dict.keys()) - set(current_event_dict.keys())
+        added_tickers = current_event_dict.keys() - previous_event_dict.keys()
+        removed_tickers = previous_event_dict.keys() - current_event_dict.keys()
         
         def extract_event_info(event: Dict) -> Dict:
             return {
@@ -76,17 +86,17 @@ class EventsCollector:
 
     def get_previous_events(self, date_str: str) -> List[Dict]:
         """Get events from previous collection."""
+        if self.last_events is not None:
+            return self.last_events
         checkpoint_data = self.load_checkpoint()
         if not checkpoint_data['collections']:
             return []
             
         previous_collection = checkpoint_data['collections'][-1]
         try:
-            with open(previous_collection['output_file'], 'r') as f:
-                data = json.load(f)
-                return data.get('events', [])
+            return day_archive.load_json(previous_collection['output_file']).get('events', [])
         except Exception as e:
-            print(f"Warning: Could not load previous events: {e}")
+            logger.warning("Could not load previous events: %s", e)
             return []
 
     def update_checkpoint(self, date_str: str, total_events: int, filename: str, current_events: List[Dict]):
@@ -123,54 +133,55 @@ class EventsCollector:
         checkpoint_data['collections'].append(collection_info)
         
         # Save updated checkpoint
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint_data, f, indent=2)
+        writer.write_json(self.checkpoint_file, checkpoint_data)
         
-        # Print detailed change information
-        print("\nChange Summary:")
-        if event_changes['added']:
-            print("\nNew Events Added:")
+        # Per-event change lines are debug-level; the full lists live in the checkpoint file
+        if logger.isEnabledFor(logging.DEBUG):
             for event in event_changes['added']:
-                print(f"+ {event['event_ticker']}: {event['title']} ({event['category']}) - Strike: {event['strike_date']}")
-        
-        if event_changes['removed']:
-            print("\nEvents Removed:")
+                logger.debug("+ %s: %s (%s) - Strike: %s", event['event_ticker'], event['title'],
+                             event['category'], event['strike_date'])
             for event in event_changes['removed']:
-                print(f"- {event['event_ticker']}: {event['title']} ({event['category']}) - Strike: {event['strike_date']}")
+                logger.debug("- %s: %s (%s) - Strike: %s", event['event_ticker'], event['title'],
+                             event['category'], event['strike_date'])
         
+        logger.info("Change summary: %d added, %d removed, %d total events",
+                    event_changes['total_added'], event_changes['total_removed'], total_events,
+                    extra={'event': 'event_changes', 'added': event_changes['total_added'],
+                           'removed': event_changes['total_removed'], 'total_events': total_events,
+                           'intraday_change': collection_info.get('intraday_change')})
         if 'intraday_change' in collection_info:
-            print(f"\nIntraday change since {collection_info['previous_time']}: {collection_info['intraday_change']:+d} events")
-        print(f"Current total events: {total_events}")
+            logger.info("Intraday change since %s: %+d events",
+                        collection_info['previous_time'], collection_info['intraday_change'])
 
     def collect_events(self) -> str:
         """Collect only open events and save to file. Returns filename."""
+        stage_start = time.perf_counter()
         all_events = []
         cursor = None
         page = 1
         timestamp = datetime.now()
         date_str = timestamp.strftime('%Y%m%d')
 
-        print("Collecting open events...")
+        logger.info("Collecting open events...")
         while True:
-            print(f"Fetching page {page}...")
             response = self.market_data.get_events(cursor=cursor, status="open")
             
             if not response or not isinstance(response, dict):
-                print(f"Invalid response received: {response}")
+                logger.error("Invalid response received on page %d: %r", page, response)
                 break
             
             events = response.get('events', [])
             if not events:
-                print("No more events to fetch")
+                logger.debug("No more events to fetch")
                 break
             
             all_events.extend(events)
-            print(f"Fetched {len(events)} events")
+            logger.debug("Fetched page %d with %d events", page, len(events), extra=SAMPLED)
             
             # Check if we have a new cursor
             new_cursor = response.get('cursor')
             if not new_cursor or new_cursor == cursor:
-                print("No more pages available")
+                logger.debug("No more pages available")
                 break
                 
             cursor = new_cursor
@@ -187,20 +198,33 @@ class EventsCollector:
             'events': all_events
         }
         
-        with open(filename,
-                    'w') as f:
-            json.dump(output_data, f, indent=2)
-                        
+        writer.write_json(filename, output_data)
         self.update_checkpoint(date_str, len(all_events), filename, all_events)  # Pass current events
-        print(f"\nSuccessfully collected {len(all_events)} open events")
-        print(f"Saved to: {filename}")
+        writer.flush()
+        self.last_events = all_events
+        registry.record_stage("collect_open_events", time.perf_counter() - stage_start, len(all_events))
+        logger.info("Successfully collected %d open events, saved to %s", len(all_events), filename,
+                    extra={'event': 'events_collected', 'count': len(all_events), 'pages': page,
+                           'output_file': filename})
         return filename
 
-if __name__ == "__main__":
+def main():
+    setup_logging("open_events_collector")
+    parser = argparse.ArgumentParser(description="Collect open events")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write a cProfile dump, collapsed stacks and a time breakdown to historical_data/profiles/")
+    args = parser.parse_args()
     auth = AuthManager(
         key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd",
         key_file_path="private_key.pem"
     )
     
     collector = EventsCollector(auth)
-    events_file = collector.collect_events()
+    try:
+        with profiled("open_events_collector", args.profile):
+            return collector.collect_events()
+    finally:
+        registry.export("open_events_collector")
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,72 @@
+import argparse
+import hashlib
 import json
+import logging
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
+from multiprocessing import get_context
 from typing import Dict, List, Optional
 from auth_manager import AuthManager
+from change_stream import MarketChangeStream
+from concurrency import AdaptiveLimiter
+from log_config import SAMPLED, setup_logging
 from market_data import MarketDataManager
+from failure_queue import FailureQueue
+from metrics import registry
+from output_writer import writer
+from profiling import profiled, timed
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(ticker: str, num_shards: int) -> int:
+    """Jump consistent hash: changing num_shards only moves about 1/num_shards of the tickers."""
+    key = int.from_bytes(hashlib.blake2b(ticker.encode('utf-8'), digest_size=8).digest(), 'big')
+    bucket, j = -1, 0
+    while j < num_shards:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
 
 class OpenMarketCollector:
-    def __init__(self, auth_manager: AuthManager):
+    def __init__(self, auth_manager: AuthManager, shard: Optional[int] = None, num_shards: int = 1,
+                 adaptive: bool = True):
+        if shard is not None and not 0 <= shard < num_shards:
+            raise ValueError(f"shard must be in [0, {num_shards}), got {shard}")
         self.market_data = MarketDataManager(auth_manager)
         self.data_dir = "historical_data"
+        self.request_delay = 0.5  # Seconds to wait between event requests (sequential mode only)
+        self.redrive_wait = 60.0  # Seconds to wait at end of run for failed events to become eligible
+        self.shard = shard
+        self.num_shards = num_shards
+        # Each shard keeps its own checkpoint, failure queue and combined output
+        self.shard_suffix = f"_shard{shard}of{num_shards}" if shard is not None else ""
         self.ensure_directories()
+        self.failure_queue = FailureQueue(
+            os.path.join(self.data_dir, f"failure_queue_open_markets{self.shard_suffix}.json"))
+        # Quote/volume/status changes since the previous collection go to changes/market_changes_<date>.jsonl
+        self.change_stream = MarketChangeStream(self.data_dir, self.shard_suffix)
+        # Adaptive: fetch events concurrently under a limit tuned from latency and 429s, instead of sleeping
+        self.limiter = AdaptiveLimiter(f"open_markets{self.shard_suffix}") if adaptive else None
+        self.market_data.limiter = self.limiter
 
     def ensure_directories(self):
         dirs = [
             self.data_dir,
             os.path.join(self.data_dir, "open_markets"),
+            os.path.join(self.data_dir, "open_markets", "shards"),
             os.path.join(self.data_dir, "open_markets_individual")
         ]
         for dir_path in dirs:
-            if not os.path.exists(dir_path):
-                os.makedirs(dir_path)
+            # exist_ok: shard processes started together create the same directories
+            os.makedirs(dir_path, exist_ok=True)
 
     def load_checkpoint(self) -> set:
-        checkpoint_file = os.path.join(self.data_dir, "checkpoint_open_markets.json")
+        checkpoint_file = os.path.join(self.data_dir, f"checkpoint_open_markets{self.shard_suffix}.json")
         if os.path.exists(checkpoint_file):
             with open(checkpoint_file, 'r') as f:
                 data = json.load(f)
@@ -31,15 +74,41 @@ class OpenMarketCollector:
         return set()
 
     def save_checkpoint(self, processed_events: set):
-        checkpoint_file = os.path.join(self.data_dir, "checkpoint_open_markets.json")
-        with open(checkpoint_file, 'w') as f:
-            json.dump({
-                'processed_events': list(processed_events),
-                'last_update': datetime.now().isoformat(),
-                'total_processed': len(processed_events)
-            }, f, indent=2)
+        checkpoint_file = os.path.join(self.data_dir, f"checkpoint_open_markets{self.shard_suffix}.json")
+        writer.write_json(checkpoint_file, {
+            'processed_events': list(processed_events),
+            'last_update': datetime.now().isoformat(),
+            'total_processed': len(processed_events)
+        })
+
+    def collect_event_markets(self, event_ticker: str, timestamp: datetime, date_str: str) -> List[Dict]:
+        """Fetch markets for one event, save its individual file and return the active markets."""
+        response = self.market_data.get_markets(event_ticker=event_ticker)
+        markets = response.get('markets', [])
+        open_markets = [m for m in markets if m['status'] == 'active']
+        self.change_stream.observe(markets, timestamp)
+        
+        # Always save individual event markets, even if empty. A file whose markets are unchanged
+        # since an earlier run today is kept as is, with the timestamp of the run that first saw them.
+        individual_file = os.path.join(
+            self.data_dir,
+            "open_markets_individual",
+            f"open_markets_{event_ticker}_{date_str}.json"
+        )
+        writer.write_json(individual_file, {
+            'timestamp': timestamp.isoformat(),
+            'event_ticker': event_ticker,
+            'total_markets': len(markets),
+            'total_open_markets': len(open_markets),
+            'all_markets': markets,
+            'open_markets': open_markets
+        }, volatile_keys=('timestamp',))
+        
+        logger.debug("Found %d open markets for %s", len(open_markets), event_ticker, extra=SAMPLED)
+        return open_markets
 
     def collect_open_markets(self) -> str:
+        stage_start = time.perf_counter()
         timestamp = datetime.now()
         date_str = timestamp.strftime('%Y%m%d')
         
@@ -51,75 +120,196 @@ class OpenMarketCollector:
         with open(open_events_file, 'r') as f:
             events_data = json.load(f)
             event_tickers = [event['event_ticker'] for event in events_data.get('events', [])]
+        if self.shard is not None:
+            event_tickers = [t for t in event_tickers if shard_for(t, self.num_shards) == self.shard]
+            logger.info("Shard %d/%d owns %d events", self.shard, self.num_shards, len(event_tickers))
         
         all_open_markets = []
+
+        def redrive_event(entry: Dict):
+            all_open_markets.extend(self.collect_event_markets(entry['ticker'], timestamp, date_str))
+            processed_events.add(entry['ticker'])
         
         try:
+            # Events left over from the previous run go first
+            self.failure_queue.redrive("markets", redrive_event)
+
             # Get markets for each open event
-            for event_ticker in event_tickers:
-                if event_ticker in processed_events:
-                    print(f"Skipping already processed event: {event_ticker}")
-                    continue
+            pending = [event_ticker for event_ticker in event_tickers if event_ticker not in processed_events]
+            if len(pending) < len(event_tickers):
+                logger.info("Skipping %d already processed events", len(event_tickers) - len(pending))
 
+            def finish(event_ticker: str, fetch):
                 try:
-                    print(f"Fetching markets for event: {event_ticker}")
-                    response = self.market_data.get_markets(event_ticker=event_ticker)
-                    markets = response.get('markets', [])
-                    open_markets = [m for m in markets if m['status'] == 'active']
-                    
-                    # Always save individual event markets, even if empty
-                    individual_file = os.path.join(
-                        self.data_dir,
-                        "open_markets_individual",
-                        f"open_markets_{event_ticker}_{date_str}.json"
-                    )
-                    with open(individual_file, 'w') as f:
-                        json.dump({
-                            'timestamp': timestamp.isoformat(),
-                            'event_ticker': event_ticker,
-                            'total_markets': len(markets),
-                            'total_open_markets': len(open_markets),
-                            'all_markets': markets,
-                            'open_markets': open_markets
-                        }, f, indent=2)
-                    
-                    if open_markets:
-                        all_open_markets.extend(open_markets)
-                        print(f"Found {len(open_markets)} open markets for {event_ticker}")
-                    else:
-                        print(f"No open markets found for {event_ticker}")
-                    
+                    all_open_markets.extend(fetch())
                     processed_events.add(event_ticker)
+                    self.failure_queue.resolve(event_ticker, "markets")
                     self.save_checkpoint(processed_events)
-                    time.sleep(0.5)  # Rate limiting
-                    
+
                 except Exception as e:
-                    print(f"Error fetching markets for {event_ticker}: {e}")
-                    continue
+                    logger.warning("Error fetching markets for %s, queued for retry: %s", event_ticker, e)
+                    self.failure_queue.record(event_ticker, "markets", e)
+                    self.failure_queue.save()
+
+            if self.limiter is None:
+                for event_ticker in pending:
+                    logger.info("Fetching markets for event: %s", event_ticker, extra=SAMPLED)
+                    finish(event_ticker, lambda: self.collect_event_markets(event_ticker, timestamp, date_str))
+                    with timed('wait'):
+                        time.sleep(self.request_delay)  # Rate limiting
+                    registry.inc("kalshi_throttle_wait_seconds_total", self.request_delay, component="open_markets")
+            else:
+                # The limiter decides how many of these are in flight; bookkeeping stays on this thread
+                pool = ThreadPoolExecutor(max_workers=self.limiter.max_limit)
+                try:
+                    futures = {pool.submit(self.collect_event_markets, event_ticker, timestamp, date_str): event_ticker
+                               for event_ticker in pending}
+                    for future in as_completed(futures):
+                        finish(futures[future], future.result)
+                finally:
+                    pool.shutdown(cancel_futures=True)
+                logger.info("Fetched %d events with concurrency limit %d (history: %s)", len(pending),
+                            self.limiter.limit, [point['limit'] for point in self.limiter.history],
+                            extra={'event': 'concurrency_limit', 'limit': self.limiter.limit})
+
+            # Retry events that failed during the sweep instead of dropping them
+            self.failure_queue.redrive("markets", redrive_event, wait_up_to=self.redrive_wait)
+            for entry in self.failure_queue.pending("markets"):
+                logger.error("Markets for %s still failing after %d attempts (%s); left in failure queue",
+                             entry['ticker'], entry['attempts'], entry['error_class'],
+                             extra={'event': 'event_failed', 'event_ticker': entry['ticker']})
+                registry.inc("kalshi_collection_failures_total", stage="collect_open_markets")
 
         except KeyboardInterrupt:
-            print("\nCollection interrupted. Saving progress...")
+            logger.warning("Collection interrupted. Saving progress...")
             
         finally:
             # Save combined results
-            filename = os.path.join(self.data_dir, "open_markets", f"open_markets_{date_str}.json")
-            with open(filename, 'w') as f:
-                json.dump({
-                    'timestamp': timestamp.isoformat(),
-                    'total_events_processed': len(processed_events),
-                    'total_open_markets': len(all_open_markets),
-                    'markets': all_open_markets
-                }, f, indent=2)
+            if self.shard is None:
+                filename = os.path.join(self.data_dir, "open_markets", f"open_markets_{date_str}.json")
+            else:
+                filename = os.path.join(self.data_dir, "open_markets", "shards",
+                                        f"open_markets_{date_str}{self.shard_suffix}.json")
+            writer.write_json(filename, {
+                'timestamp': timestamp.isoformat(),
+                'shard': self.shard,
+                'num_shards': self.num_shards,
+                'total_events_processed': len(processed_events),
+                'total_open_markets': len(all_open_markets),
+                'markets': all_open_markets
+            })
             
             self.save_checkpoint(processed_events)
+            self.failure_queue.save()
+            self.change_stream.flush()
+            writer.flush()
+            registry.record_stage("collect_open_markets" if self.shard is None else "collect_open_markets_shard",
+                                  time.perf_counter() - stage_start, len(all_open_markets))
             
-            print(f"\nCollected {len(all_open_markets)} open markets")
-            print(f"Processed {len(processed_events)} events")
-            print(f"Individual market data saved to: {os.path.join(self.data_dir, 'open_markets_individual')}")
+            logger.info("Collected %d open markets from %d events, saved to %s",
+                        len(all_open_markets), len(processed_events), filename,
+                        extra={'event': 'open_markets_collected', 'count': len(all_open_markets),
+                               'events_processed': len(processed_events), 'output_file': filename})
             return filename
 
+def merge_shards(date_str: str, num_shards: int, data_dir: str = "historical_data") -> str:
+    """Coordinator step: combine every shard's output for a day into open_markets_{date}.json.
+
+    Per-event files need no merging since each event belongs to exactly one shard.
+    """
+    shard_files = [os.path.join(data_dir, "open_markets", "shards",
+                                f"open_markets_{date_str}_shard{i}of{num_shards}.json") for i in range(num_shards)]
+    missing = [path for path in shard_files if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing shard outputs: {missing}")
+
+    markets, events_processed, timestamps = [], 0, []
+    for path in shard_files:
+        with open(path, 'r') as f:
+            shard = json.load(f)
+        markets.extend(shard['markets'])
+        events_processed += shard['total_events_processed']
+        timestamps.append(shard['timestamp'])
+
+    filename = os.path.join(data_dir, "open_markets", f"open_markets_{date_str}.json")
+    writer.write_json(filename, {
+        'timestamp': min(timestamps),
+        'num_shards': num_shards,
+        'total_events_processed': events_processed,
+        'total_open_markets': len(markets),
+        'markets': markets
+    })
+    writer.flush()
+    logger.info("Merged %d shards: %d open markets from %d events", num_shards, len(markets), events_processed,
+                extra={'event': 'open_markets_collected', 'count': len(markets),
+                       'events_processed': events_processed, 'output_file': filename})
+    return filename
+
+
+def _run_shard(key_id: str, key_file_path: str, shard: int, num_shards: int,
+               base_url: Optional[str] = None, request_delay: Optional[float] = None, adaptive: bool = True) -> str:
+    """Entry point of one shard worker process."""
+    setup_logging("open_market_collector")
+    collector = OpenMarketCollector(AuthManager(key_id=key_id, key_file_path=key_file_path), shard, num_shards,
+                                    adaptive)
+    if base_url:
+        collector.market_data.base_url = base_url
+    if request_delay is not None:
+        collector.request_delay = request_delay
+    try:
+        return collector.collect_open_markets()
+    finally:
+        registry.export(f"open_market_collector{collector.shard_suffix}")
+
+
+def run_sharded(key_id: str, key_file_path: str, num_shards: int, base_url: Optional[str] = None,
+                request_delay: Optional[float] = None, adaptive: bool = True) -> str:
+    """Run num_shards local worker processes, then merge their outputs."""
+    date_str = datetime.now().strftime('%Y%m%d')
+    with ProcessPoolExecutor(max_workers=num_shards, mp_context=get_context("spawn")) as pool:
+        futures = [pool.submit(_run_shard, key_id, key_file_path, shard, num_shards, base_url, request_delay,
+                               adaptive) for shard in range(num_shards)]
+        for future in futures:
+            future.result()
+    return merge_shards(date_str, num_shards)
+
+
+def main():
+    setup_logging("open_market_collector")
+    parser = argparse.ArgumentParser(description="Collect markets for today's open events")
+    parser.add_argument("--shards", type=int, help="Run this many local shard processes and merge their outputs")
+    parser.add_argument("--shard", type=int, help="Run only this shard (e.g. one per host sharing historical_data)")
+    parser.add_argument("--num-shards", type=int, help="Total shards when using --shard or --merge")
+    parser.add_argument("--merge", action="store_true", help="Only merge existing shard outputs for today")
+    parser.add_argument("--fixed-rate", action="store_true",
+                        help="Fetch events one at a time with a fixed delay instead of adaptive concurrency")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write a cProfile dump, collapsed stacks and a time breakdown to historical_data/profiles/")
+    args = parser.parse_args()
+    if (args.merge or args.shard is not None) and args.num_shards is None:
+        parser.error("--merge and --shard require --num-shards")
+    if args.num_shards is not None and args.num_shards < 1:
+        parser.error("--num-shards must be at least 1")
+    if args.shard is not None and not 0 <= args.shard < args.num_shards:
+        parser.error(f"--shard must be between 0 and {args.num_shards - 1}")
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards must be at least 1")
+
+    key_id, key_file_path = "05b95ed4-a236-41a1-9e3b-81124f6871dd", "private_key.pem"
+    if args.merge:
+        return merge_shards(datetime.now().strftime('%Y%m%d'), args.num_shards)
+    if args.shards:
+        return run_sharded(key_id, key_file_path, args.shards, adaptive=not args.fixed_rate)
+
+    auth = AuthManager(key_id=key_id, key_file_path=key_file_path)
+    collector = OpenMarketCollector(auth, args.shard, args.num_shards or 1, adaptive=not args.fixed_rate)
+    try:
+        with profiled(f"open_market_collector{collector.shard_suffix}", args.profile):
+            open_markets_file = collector.collect_open_markets()
+    finally:
+        registry.export(f"open_market_collector{collector.shard_suffix}")
+    logger.info("Open markets saved to: %s", open_markets_file)
+    return open_markets_file
+
 if __name__ == "__main__":
-    auth = AuthManager(key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd", key_file_path="private_key.pem")
-    collector = OpenMarketCollector(auth)
-    open_markets_file = collector.collect_open_markets()
-    print(f"\nOpen markets saved to: {open_markets_file}")
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,197 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from auth_manager import AuthManager
+from concurrency import AdaptiveLimiter
+from log_config import SAMPLED, setup_logging
+from market_data import MarketDataManager
+from metrics import registry
+from profiling import profiled, timed
+
+logger = logging.getLogger(__name__)
+
+SIDES = ['yes', 'no']
+
+
+class OrderbookCollector:
+    """Periodic orderbook snapshots of active markets, stored as compact columnar partitions.
+
+    Each cycle writes historical_data/orderbooks/<YYYYMMDD>/orderbooks_<HHMMSS>.npz with
+    one row per resting level: ticker (index into a per-file ticker table), ts (epoch ms),
+    side (0 = yes, 1 = no), price (cents, int16) and qty (int32), zlib-compressed.
+    """
+
+    def __init__(self, auth_manager: AuthManager, workers: int = 8, depth: int = 10, adaptive: bool = True,
+                 max_workers: int = 32):
+        self.market_data = MarketDataManager(auth_manager)
+        self.data_dir = "historical_data"
+        self.workers = workers
+        self.depth = depth
+        # Adaptive: workers is only the starting in-flight limit, tuned from latency and 429s across cycles
+        self.limiter = AdaptiveLimiter("orderbooks", initial=workers, max_limit=max_workers) if adaptive else None
+        self.market_data.limiter = self.limiter
+        self.ensure_directories()
+
+    def ensure_directories(self):
+        dirs = [
+            self.data_dir,
+            os.path.join(self.data_dir, "orderbooks")
+        ]
+        for dir_path in dirs:
+            os.makedirs(dir_path, exist_ok=True)
+
+    def active_markets(self, event_tickers: Optional[List[str]] = None, min_volume: int = 0,
+                       limit: Optional[int] = None) -> List[str]:
+        """Tickers of active markets from the latest open_markets file, highest volume first."""
+        files = sorted(glob.glob(os.path.join(self.data_dir, "open_markets", "open_markets_*.json")))
+        if not files:
+            raise FileNotFoundError("No open_markets file; run open_market_collector.py first")
+        with open(files[-1], 'r') as f:
+            markets = json.load(f).get('markets', [])
+        selected = [m for m in markets
+                    if m.get('status') == 'active'
+                    and (not event_tickers or m.get('event_ticker') in event_tickers)
+                    and (m.get('volume') or 0) >= min_volume]
+        selected.sort(key=lambda m: m.get('volume') or 0, reverse=True)
+        tickers = [m['ticker'] for m in selected]
+        return tickers[:limit] if limit else tickers
+
+    def fetch_orderbook(self, ticker: str) -> Optional[Dict]:
+        try:
+            return self.market_data.get_market_orderbook(ticker, depth=self.depth)
+        except Exception as e:
+            logger.warning("Orderbook fetch failed for %s: %s", ticker, e, extra=SAMPLED)
+            return None
+
+    @staticmethod
+    def to_columns(books: Dict[str, Dict], ts_ms: int) -> Dict[str, np.ndarray]:
+        """Flatten {ticker: orderbook response} into the columnar level layout."""
+        tickers = sorted(books)
+        ticker_ids, sides, prices, quantities = [], [], [], []
+        for ticker_id, ticker in enumerate(tickers):
+            book = (books[ticker] or {}).get('orderbook') or {}
+            for side_id, side in enumerate(SIDES):
+                for price, quantity in book.get(side) or []:
+                    ticker_ids.append(ticker_id)
+                    sides.append(side_id)
+                    prices.append(price)
+                    quantities.append(quantity)
+        return {
+            'tickers': np.array(tickers, dtype=str),
+            'ticker': np.array(ticker_ids, dtype=np.int32),
+            'ts': np.full(len(ticker_ids), ts_ms, dtype=np.int64),
+            'side': np.array(sides, dtype=np.int8),
+            'price': np.array(prices, dtype=np.int16),
+            'qty': np.array(quantities, dtype=np.int32)
+        }
+
+    def snapshot(self, tickers: List[str]) -> Optional[str]:
+        """Fetch every orderbook with bounded concurrency and write one partition file."""
+        stage_start = time.perf_counter()
+        timestamp = datetime.now()
+        if not tickers:
+            logger.warning("No markets to snapshot")
+            return None
+        pool_size = self.limiter.max_limit if self.limiter else self.workers
+        with ThreadPoolExecutor(max_workers=min(pool_size, len(tickers))) as pool:
+            results = dict(zip(tickers, pool.map(self.fetch_orderbook, tickers)))
+        books = {ticker: book for ticker, book in results.items() if book is not None}
+        failed = len(tickers) - len(books)
+
+        columns = self.to_columns(books, int(timestamp.timestamp() * 1000))
+        day_dir = os.path.join(self.data_dir, "orderbooks", timestamp.strftime('%Y%m%d'))
+        os.makedirs(day_dir, exist_ok=True)
+        filename = os.path.join(day_dir, f"orderbooks_{timestamp.strftime('%H%M%S')}.npz")
+        tmp_path = f"{filename}.tmp.npz"
+        np.savez_compressed(tmp_path, **columns)
+        os.replace(tmp_path, filename)
+
+        levels = len(columns['ticker'])
+        if failed:
+            registry.inc("kalshi_collection_failures_total", failed, stage="collect_orderbooks")
+        registry.record_stage("collect_orderbooks", time.perf_counter() - stage_start, levels,
+                              status="ok" if not failed else "partial")
+        concurrency = self.limiter.limit if self.limiter else self.workers
+        logger.info("Snapshot of %d orderbooks (%d levels, %d failed, concurrency %d) saved to %s",
+                    len(books), levels, failed, concurrency, filename,
+                    extra={'event': 'orderbooks_collected', 'markets': len(books), 'levels': levels,
+                           'failed': failed, 'concurrency': concurrency, 'output_file': filename})
+        return filename
+
+    def run(self, interval: float, cycles: Optional[int] = None, **market_filter):
+        """Snapshot on a fixed schedule; the market list is re-read each cycle."""
+        completed = 0
+        while cycles is None or completed < cycles:
+            cycle_start = time.monotonic()
+            try:
+                self.snapshot(self.active_markets(**market_filter))
+            except Exception as e:
+                logger.error("Orderbook snapshot failed: %s", e)
+            completed += 1
+            if cycles is not None and completed >= cycles:
+                break
+            with timed('wait'):
+                time.sleep(max(0.0, interval - (time.monotonic() - cycle_start)))
+
+
+def load_orderbooks(date_str: str, data_dir: str = "historical_data"):
+    """All snapshots of one day as a (ticker, ts, side, price, qty) DataFrame."""
+    import pandas as pd
+    frames = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "orderbooks", date_str, "orderbooks_*.npz"))):
+        with np.load(path, allow_pickle=False) as data:
+            frames.append(pd.DataFrame({
+                'ticker': pd.Categorical.from_codes(data['ticker'], categories=data['tickers']),
+                'ts': pd.to_datetime(data['ts'], unit='ms'),
+                'side': pd.Categorical.from_codes(data['side'], categories=SIDES),
+                'price': data['price'],
+                'qty': data['qty']
+            }))
+    if not frames:
+        return pd.DataFrame(columns=['ticker', 'ts', 'side', 'price', 'qty'])
+    combined = pd.concat(frames, ignore_index=True)
+    combined['ticker'] = combined['ticker'].astype('category')
+    return combined
+
+
+def main():
+    setup_logging("orderbook_collector")
+    parser = argparse.ArgumentParser(description="Snapshot orderbooks of active markets on a schedule")
+    parser.add_argument("--interval", type=float, default=300, help="Seconds between snapshots")
+    parser.add_argument("--cycles", type=int, help="Stop after this many snapshots (default: run forever)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Concurrent orderbook requests (the starting limit unless --fixed-workers)")
+    parser.add_argument("--max-workers", type=int, default=32, help="Ceiling for the adaptive limit")
+    parser.add_argument("--fixed-workers", action="store_true", help="Keep --workers fixed instead of adapting")
+    parser.add_argument("--depth", type=int, default=10, help="Price levels per side")
+    parser.add_argument("--event", action="append", dest="event_tickers", help="Only markets of this event")
+    parser.add_argument("--min-volume", type=int, default=0)
+    parser.add_argument("--limit", type=int, help="Only the N highest-volume markets")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write a cProfile dump, collapsed stacks and a time breakdown to historical_data/profiles/")
+    args = parser.parse_args()
+
+    auth = AuthManager(key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd", key_file_path="private_key.pem")
+    collector = OrderbookCollector(auth, workers=args.workers, depth=args.depth, adaptive=not args.fixed_workers,
+                                   max_workers=args.max_workers)
+    try:
+        with profiled("orderbook_collector", args.profile):
+            collector.run(args.interval, args.cycles, event_tickers=args.event_tickers,
+                          min_volume=args.min_volume, limit=args.limit)
+    except KeyboardInterrupt:
+        logger.info("Stopped")
+    finally:
+        registry.export("orderbook_collector")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import registry
+from profiling import timed
+
+logger = logging.getLogger(__name__)
+
+FSYNC_MODES = ('none', 'each', 'batch')
+
+
+class OutputWriter:
+    """Crash-safe, deduplicating writer for collector outputs.
+
+    - Atomic: content goes to a temp file in the target directory and is renamed
+      over the target, so readers never see a truncated file.
+    - Unchanged: if the target already holds the same content (ignoring
+      volatile_keys such as a collection timestamp) it is left alone.
+    - Linked: content byte-identical to a file written earlier in this process
+      is hardlinked from that file instead of being written again.
+    - fsync: 'none' (rename only), 'each' (fsync file and directory per write) or
+      'batch' (fsync pending files and their directories every batch_size writes
+      and on flush()). Set the default with KALSHI_FSYNC.
+    """
+
+    def __init__(self, fsync: Optional[str] = None, batch_size: int = 64):
+        self.fsync = (fsync or os.environ.get("KALSHI_FSYNC", "none")).lower()
+        if self.fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {FSYNC_MODES}, got {self.fsync!r}")
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._digests: Dict[str, Tuple[str, int]] = {}  # path -> (digest without volatile keys, inode)
+        self._written: Dict[str, Tuple[str, int]] = {}  # digest of exact bytes -> (path, inode) holding them
+        self._pending: List[str] = []
+
+    @staticmethod
+    def _digest(payload: bytes) -> str:
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _stable(data, volatile_keys: Iterable[str]):
+        if volatile_keys and isinstance(data, dict):
+            return {key: value for key, value in data.items() if key not in volatile_keys}
+        return data
+
+    def _existing_digest(self, path: str, volatile_keys: Iterable[str], indent: Optional[int]) -> Optional[str]:
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached is not None and cached[1] == inode:
+            return cached[0]
+        try:
+            with open(path, 'r') as f:
+                existing = json.load(f)
+        except ValueError:
+            return None  # Truncated or corrupt: rewrite it
+        return self._digest(json.dumps(self._stable(existing, volatile_keys), indent=indent).encode('utf-8'))
+
+    def write_json(self, path: str, data, indent: Optional[int] = 2, volatile_keys: Iterable[str] = ()) -> str:
+        """Write data as JSON unless path already holds it. Returns 'written', 'linked' or 'unchanged'."""
+        volatile_keys = tuple(volatile_keys)
+        with timed('json'):
+            if volatile_keys:
+                digest = self._digest(json.dumps(self._stable(data, volatile_keys), indent=indent).encode('utf-8'))
+                if digest == self._existing_digest(path, volatile_keys, indent):
+                    return self._unchanged(path)
+                payload = json.dumps(data, indent=indent).encode('utf-8')
+            else:
+                payload = json.dumps(data, indent=indent).encode('utf-8')
+                digest = self._digest(payload)
+                if digest == self._existing_digest(path, (), indent):
+                    return self._unchanged(path)
+        return self.write_bytes(path, payload, digest)
+
+    def write_bytes(self, path: str, payload: bytes, digest: Optional[str] = None) -> str:
+        """Atomically replace path with payload, hardlinking an identical earlier output if there is one."""
+        exact = self._digest(payload)
+        with self._lock:
+            source = self._written.get(exact)
+        with timed('disk'):
+            if source is not None and source[0] != path and self._link(source, path):
+                outcome = 'linked'
+                registry.inc("kalshi_output_bytes_saved_total", len(payload))
+            else:
+                self._replace(path, payload)
+                outcome = 'written'
+                registry.inc("kalshi_output_bytes_written_total", len(payload))
+            inode = os.stat(path).st_ino
+        with self._lock:
+            self._digests[path] = (digest or exact, inode)
+            self._written[exact] = (path, inode)
+        registry.inc("kalshi_output_files_total", outcome=outcome)
+        return outcome
+
+    def _unchanged(self, path: str) -> str:
+        registry.inc("kalshi_output_files_total", outcome='unchanged')
+        return 'unchanged'
+
+    def _replace(self, path: str, payload: bytes):
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                if self.fsync == 'each':
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._synced(path)
+
+    def _link(self, source: Tuple[str, int], path: str) -> bool:
+        source_path, inode = source
+        tmp_path = os.path.join(os.path.dirname(path) or '.', f".{os.path.basename(path)}.{os.getpid()}.link")
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if os.stat(source_path).st_ino != inode:
+                return False  # Replaced since it was written, so it no longer holds these bytes
+            os.link(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Source replaced or removed since, or no hardlink support on this filesystem
+            logger.debug("Hardlink %s -> %s failed (%s); writing instead", source_path, path, e)
+            return False
+        self._synced(path)
+        return True
+
+    def _synced(self, path: str):
+        if self.fsync == 'each':
+            self._fsync_dirs([path])
+        elif self.fsync == 'batch':
+            with self._lock:
+                self._pending.append(path)
+                due = len(self._pending) >= self.batch_size
+            if due:
+                self.flush()
+
+    def flush(self):
+        """fsync every file written since the last flush, then their directories."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with timed('disk'):
+            for path in pending:
+                try:
+                    fd = os.open(path, os.O_RDONLY)
+                except FileNotFoundError:
+                    continue
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._fsync_dirs(pending)
+        registry.inc("kalshi_output_fsync_batches_total")
+
+    @staticmethod
+    def _fsync_dirs(paths: Iterable[str]):
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue  # Directories can't be opened for fsync on every platform
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+writer = OutputWriter()
+atexit.register(writer.flush)
@@ -12,16 +12,22 @@ The pipeline:
 2. Processes events data to collect markets
 3. Processes events data to create a CSV
 4. Processes market details to create detailed statistics
+
+With --profile each step writes a cProfile dump, collapsed stacks and a time
+breakdown (network/signing/json/pandas/disk/wait) to historical_data/profiles/,
+and the breakdowns are added to the run summary.
 """
 
 
 import os
 import sys
+import json
 import time
 import logging
 import subprocess
-from datetime import date
+from datetime import date, datetime
 import importlib.util
+from metrics import merge_prometheus_files
 
 # Set up logging with a more restrictive level for third-party modules
 logging.getLogger().setLevel(logging.WARNING)  # Set default level to WARNING
@@ -42,7 +48,8 @@ def create_directories():
         "historical_data/open_markets",
         "historical_data/open_markets_individual",
         "historical_data/processed_events",
-        "historical_data/processed_markets"
+        "historical_data/processed_markets",
+        "historical_data/metrics"
     ]
     
     for directory in dirs:
@@ -60,25 +67,29 @@ def run_subprocess(command, env=None):
             text=True,
             env=env
         )
-        # More focused filtering of output lines
-        important_keywords = [
-            'total markets processed:',
-            'successfully collected',
-            'processed markets from'
-        ]
-        
+        # Child scripts log one JSON object per line (KALSHI_LOG_FORMAT=json)
         for line in result.stdout.split('\n'):
-            line = line.lower().strip()
-            if any(keyword in line for keyword in important_keywords):
-                # Clean up the output format
-                if 'successfully collected' in line:
-                    logger.info(f"Collected {line.split()[2]} events")
-                elif 'processed markets from' in line:
-                    nums = [int(s) for s in line.split() if s.isdigit()]
-                    logger.info(f"Processed {nums[0]} markets from {nums[1]} events")
-                elif 'total markets processed:' in line:
-                    num = int(line.split(':')[1].strip())
-                    logger.info(f"Total markets: {num}")
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            event = record.get('event')
+            if event == 'events_collected':
+                logger.info(f"Collected {record['count']} events")
+            elif event == 'open_markets_collected':
+                logger.info(f"Collected {record['count']} open markets from {record['events_processed']} events")
+            elif event == 'events_processed':
+                logger.info(f"Processed {record['count']} events")
+            elif event == 'markets_processed':
+                logger.info(f"Processed {record['count']} markets from {record['events']} events")
+            elif event == 'markets_summary':
+                logger.info(f"Total markets: {record['total_markets']}")
+            elif event == 'profile_written':
+                logger.info(f"Profile written to {record['output_file']}")
+            elif record.get('level') in ('ERROR', 'CRITICAL'):
+                logger.warning(f"{record.get('job', command[-1])}: {record.get('msg')}")
         return True
     except subprocess.CalledProcessError as e:
         logger.error(f"Command failed: {' '.join(command)}")
@@ -86,7 +97,7 @@ def run_subprocess(command, env=None):
         return False
 
 # Update the main execution to show less output
-def run_pipeline():
+def run_pipeline(profile=False):
     """Run the full Kalshi data collection and processing pipeline."""
     today = date.today().strftime("%Y%m%d")
 
@@ -96,6 +107,11 @@ def run_pipeline():
     # Step 2: Collect open events
     env = os.environ.copy()
     env['PROCESSING_DATE'] = today
+    metrics_dir = os.path.join("historical_data", "metrics")
+    env['KALSHI_METRICS_DIR'] = metrics_dir
+    env['KALSHI_LOG_FORMAT'] = 'json'
+    if profile:
+        env['KALSHI_PROFILE'] = '1'
     
     pipeline_steps = [
         ("Collecting open events", ["python", "open_events_collector.py"]),
@@ -104,21 +120,76 @@ def run_pipeline():
         ("Processing market details", ["python", "process_market_details.py"])
     ]
     
+    step_results = []
+    success = True
     for step_num, (step_desc, command) in enumerate(pipeline_steps, 1):
         logger.info(f"Running step {step_num}/{len(pipeline_steps)}...")
         
-        if not run_subprocess(command, env):
+        step_start = time.perf_counter()
+        ok = run_subprocess(command, env)
+        step_results.append({
+            'step': step_desc,
+            'job': os.path.splitext(command[-1])[0],
+            'wall_time_s': round(time.perf_counter() - step_start, 4),
+            'ok': ok
+        })
+        if not ok:
             logger.error(f"Pipeline failed at step {step_num}")
-            return False
+            success = False
+            break
+
+    if profile:
+        attach_profiles(env.get('KALSHI_PROFILE_DIR', os.path.join("historical_data", "profiles")), step_results)
+    write_run_summary(metrics_dir, today, step_results)
+    if success:
+        logger.info(f"Pipeline completed successfully - {today}")
+    return success
+
+def attach_profiles(profile_dir, step_results):
+    """Add each step's time breakdown to its result and log where the time went."""
+    for step in step_results:
+        profile_file = os.path.join(profile_dir, f"{step['job']}_profile.json")
+        if not os.path.exists(profile_file):
+            continue
+        with open(profile_file, 'r') as f:
+            step['profile'] = json.load(f)
+        breakdown = ", ".join(f"{c['category']} {c['seconds']:.2f}s" for c in step['profile']['categories']
+                              if c['seconds'] >= 0.005)
+        logger.info(f"{step['job']} profile: {breakdown}")
+
+def write_run_summary(metrics_dir, today, step_results):
+    """Merge per-step metrics exported by each script into one run summary and textfile."""
+    for step in step_results:
+        summary_file = os.path.join(metrics_dir, f"{step['job']}.json")
+        if os.path.exists(summary_file):
+            with open(summary_file, 'r') as f:
+                step['metrics'] = json.load(f)
+            for stage in step['metrics'].get('stages', []):
+                logger.info(f"{stage['stage']}: {stage['duration_s']:.2f}s, {stage['rows']} rows")
+
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    summary_path = os.path.join(metrics_dir, f"run_summary_{run_id}.json")
+    with open(summary_path, 'w') as f:
+        json.dump({
+            'date': today,
+            'run_id': run_id,
+            'total_wall_time_s': round(sum(s['wall_time_s'] for s in step_results), 4),
+            'steps': step_results
+        }, f, indent=2)
 
-    logger.info(f"Pipeline completed successfully - {today}")
+    prom_path = os.path.join(metrics_dir, "pipeline.prom")
+    with open(f"{prom_path}.tmp", 'w') as f:
+        f.write(merge_prometheus_files(
+            [os.path.join(metrics_dir, f"{s['job']}.prom") for s in step_results]))
+    os.replace(f"{prom_path}.tmp", prom_path)
+    logger.info(f"Run metrics saved to: {summary_path}")
 
 if __name__ == "__main__":
     start_time = time.time()
     logger.info("Starting Kalshi data collection and processing pipeline...")
     
     try:
-        run_pipeline()
+        run_pipeline(profile='--profile' in sys.argv[1:])
     except Exception as e:
         logger.error(f"Pipeline failed with error: {str(e)}")
     
@@ -1,12 +1,52 @@
+import numpy as np
 import pandas as pd
-import json
+import logging
 import os
+import time
 from datetime import datetime
 import sys
+from typing import Dict, List, Optional, Tuple
+import day_archive
+from expiry_index import ExpiryIndex
+from log_config import SAMPLED, setup_logging
+from market_snapshot import MarketSnapshot, snapshot_path
+from metrics import registry
+from profiling import profiled, timed
+from records import Market, to_columns
+
+logger = logging.getLogger(__name__)
+
+FILE_COLUMNS = ['collection_timestamp', 'total_markets', 'total_open_markets']
+EVENT_COLUMNS = ['event_timestamp', 'event_total_open_events', 'event_series_ticker', 'event_title',
+                 'event_sub_title', 'event_category', 'event_collateral_return_type',
+                 'event_mutually_exclusive', 'event_strike_date']
+
+# Output schema: cent prices fit int16, counts int32; repeated strings become categoricals
+INT16_COLUMNS = ['yes_bid', 'yes_ask', 'no_bid', 'no_ask', 'last_price', 'previous_yes_bid',
+                 'previous_yes_ask', 'previous_price', 'bid_ask_spread', 'notional_value', 'tick_size']
+INT32_COLUMNS = ['volume', 'volume_24h', 'open_interest', 'markets_in_event', 'settlement_timer_seconds']
+FLOAT32_COLUMNS = ['mid_price', 'market_implied_probability', 'days_to_expiration']
+CATEGORY_COLUMNS = ['event_ticker', 'market_type', 'status', 'response_price_units', 'result', 'category',
+                    'open_time', 'close_time', 'expected_expiration_time', 'latest_expiration_time',
+                    'open_time_formatted', 'close_time_formatted', 'expiration_time_formatted']
+# Long text repeated across markets is stored once in a text table and referenced by id
+TEXT_COLUMNS = ['rules_primary', 'rules_secondary']
+
+
+def downcast_int(series: pd.Series, dtype: str) -> pd.Series:
+    """Cast to dtype (nullable variant if there are gaps); unchanged if values don't fit."""
+    numeric = pd.to_numeric(series, errors='coerce')
+    values = numeric.dropna()
+    info = np.iinfo(dtype)
+    if len(values) and ((values % 1 != 0).any() or values.min() < info.min or values.max() > info.max):
+        return series
+    return numeric.astype(dtype if len(values) == len(numeric) else dtype.capitalize())
+
 
 class MarketDetailsProcessor:
     def __init__(self):
         self.data_dir = "historical_data"
+        self.columnar_snapshot = True  # Also write the memory-mapped markets_<date>.cols snapshot
         self.ensure_directories()
 
     def ensure_directories(self):
@@ -18,8 +58,7 @@ class MarketDetailsProcessor:
             os.path.join(self.data_dir, "open_markets_individual")
         ]
         for dir_path in dirs:
-            if not os.path.exists(dir_path):
-                os.makedirs(dir_path)
+            os.makedirs(dir_path, exist_ok=True)
 
     def load_processed_events(self, date_str: str) -> pd.DataFrame:
         """Load processed events CSV file."""
@@ -30,135 +69,87 @@ class MarketDetailsProcessor:
         )
         return pd.read_csv(events_file)
 
-    def get_market_details(self, event_ticker: str, date_str: str) -> list:
-        """Extract all market details from individual market JSON file."""
+    def get_market_details(self, event_ticker: str, date_str: str) -> Tuple[Dict, List[Market]]:
+        """Extract file-level info and all market records from the individual market JSON file."""
         try:
-            # List all files in the directory
-            market_dir = os.path.join(self.data_dir, "open_markets_individual")
-            market_files = [f for f in os.listdir(market_dir) if f.startswith(f"open_markets_{event_ticker}_")]
-            
-            if not market_files:
-                print(f"No market files found for {event_ticker}")
-                return []
-                
-            # Use the most recent file
-            market_file = os.path.join(market_dir, market_files[-1])
-            
-            with open(market_file, 'r') as f:
-                market_data = json.load(f)
+            # The day's own file, loose or packed into its bundle by day_archive.py
+            market_file = os.path.join(self.data_dir, "open_markets_individual",
+                                       f"open_markets_{event_ticker}_{date_str}.json")
+            if not day_archive.exists(market_file):
+                logger.debug("No market file for %s on %s", event_ticker, date_str, extra=SAMPLED)
+                return {}, []
 
-            market_details = []
+            market_data = day_archive.load_json(market_file)
+
+            file_info = {
+                'collection_timestamp': market_data.get('timestamp'),
+                'total_markets': market_data.get('total_markets'),
+                'total_open_markets': market_data.get('total_open_markets')
+            }
             # Use all_markets instead of open_markets to get all market data
-            for market in market_data.get('all_markets', []):
-                detail = {
-                    # File level information
-                    'collection_timestamp': market_data.get('timestamp'),
-                    'total_markets': market_data.get('total_markets'),
-                    'total_open_markets': market_data.get('total_open_markets'),
-                    
-                    # Market specific information
-                    'ticker': market.get('ticker'),
-                    'event_ticker': market.get('event_ticker'),
-                    'market_type': market.get('market_type'),
-                    'title': market.get('title'),
-                    'subtitle': market.get('subtitle'),
-                    'yes_sub_title': market.get('yes_sub_title'),
-                    'no_sub_title': market.get('no_sub_title'),
-                    
-                    # Timing information
-                    'open_time': market.get('open_time'),
-                    'close_time': market.get('close_time'),
-                    'expected_expiration_time': market.get('expected_expiration_time'),
-                    'expiration_time': market.get('expiration_time'),
-                    'latest_expiration_time': market.get('latest_expiration_time'),
-                    'settlement_timer_seconds': market.get('settlement_timer_seconds'),
-                    
-                    # Status and configuration
-                    'status': market.get('status'),
-                    'response_price_units': market.get('response_price_units'),
-                    'notional_value': market.get('notional_value'),
-                    'tick_size': market.get('tick_size'),
-                    
-                    # Current pricing
-                    'yes_bid': market.get('yes_bid'),
-                    'yes_ask': market.get('yes_ask'),
-                    'no_bid': market.get('no_bid'),
-                    'no_ask': market.get('no_ask'),
-                    'last_price': market.get('last_price'),
-                    
-                    # Historical pricing
-                    'previous_yes_bid': market.get('previous_yes_bid'),
-                    'previous_yes_ask': market.get('previous_yes_ask'),
-                    'previous_price': market.get('previous_price'),
-                    
-                    # Trading metrics
-                    'volume': market.get('volume'),
-                    'volume_24h': market.get('volume_24h'),
-                    'liquidity': market.get('liquidity'),
-                    'open_interest': market.get('open_interest'),
-                    
-                    # Additional attributes
-                    'result': market.get('result'),
-                    'can_close_early': market.get('can_close_early'),
-                    'expiration_value': market.get('expiration_value'),
-                    'category': market.get('category'),
-                    'risk_limit_cents': market.get('risk_limit_cents'),
-                    'rules_primary': market.get('rules_primary'),
-                    'rules_secondary': market.get('rules_secondary')
-                }
-                market_details.append(detail)
-            
-            return market_details
+            return file_info, Market.from_api_list(market_data.get('all_markets', []))
         except Exception as e:
-            print(f"Error processing market file for {event_ticker}: {e}")
-            return []
+            logger.error("Error processing market file for %s: %s", event_ticker, e)
+            return {}, []
 
+    @timed('pandas')
     def process_markets(self, date_str: str) -> pd.DataFrame:
         """Process all markets and create expanded DataFrame."""
+        stage_start = time.perf_counter()
         events_df = self.load_processed_events(date_str)
-        print(f"\nLoaded {len(events_df)} events to process")
+        logger.info("Loaded %d events to process", len(events_df))
         
-        all_markets = []
+        all_markets: List[Market] = []
+        # Per-event values are repeated into column lists rather than copied into a dict per market
+        context_columns: Dict[str, list] = {column: [] for column in FILE_COLUMNS + EVENT_COLUMNS}
         total_events = len(events_df)
         
         for idx, event in events_df.iterrows():
             try:
                 event_ticker = event['event_ticker']
                 if not event_ticker:
-                    print(f"Warning: Missing event_ticker for row {idx}")
+                    logger.warning("Missing event_ticker for row %s", idx)
                     continue
                     
-                print(f"Processing event {idx + 1}/{total_events}: {event_ticker}")
-                markets = self.get_market_details(event_ticker, date_str)
+                logger.debug("Processing event %d/%d: %s", idx + 1, total_events, event_ticker, extra=SAMPLED)
+                file_info, markets = self.get_market_details(event_ticker, date_str)
                 
                 if markets:
-                    for market in markets:
-                        market.update({
-                            'event_timestamp': event['timestamp'],
-                            'event_total_open_events': event['total_open_events'],
-                            'event_series_ticker': event['series_ticker'],
-                            'event_ticker': event['event_ticker'],
-                            'event_title': event['title'],
-                            'event_sub_title': event['sub_title'],
-                            'event_category': event['category'],
-                            'event_collateral_return_type': event.get('collateral_return_type', ''),
-                            'event_mutually_exclusive': event['mutually_exclusive'],
-                            'event_strike_date': event['strike_date'],
-                            'category': event['category']
-                        })
+                    context = dict(file_info)
+                    context.update({
+                        'event_timestamp': event['timestamp'],
+                        'event_total_open_events': event['total_open_events'],
+                        'event_series_ticker': event['series_ticker'],
+                        'event_title': event['title'],
+                        'event_sub_title': event['sub_title'],
+                        'event_category': event['category'],
+                        'event_collateral_return_type': event.get('collateral_return_type', ''),
+                        'event_mutually_exclusive': event['mutually_exclusive'],
+                        'event_strike_date': event['strike_date']
+                    })
+                    for column, values in context_columns.items():
+                        values.extend([context[column]] * len(markets))
                     
                     all_markets.extend(markets)
-                    print(f"Added {len(markets)} markets for {event_ticker}")
+                    logger.debug("Added %d markets for %s", len(markets), event_ticker, extra=SAMPLED)
                 
             except Exception as e:
-                print(f"Error processing event {idx}: {str(e)}")
+                logger.error("Error processing event %s: %s", idx, e)
                 continue
 
         if not all_markets:
-            print("Warning: No markets processed")
+            logger.warning("No markets processed")
+            registry.record_stage("process_markets", time.perf_counter() - stage_start, 0)
             return pd.DataFrame()
             
-        markets_df = pd.DataFrame(all_markets)
+        market_columns = to_columns(all_markets, Market)
+        # Markets take the category of their event
+        market_columns['category'] = context_columns['event_category']
+        columns = {column: context_columns[column] for column in FILE_COLUMNS}
+        columns.update(market_columns)
+        columns.update({column: context_columns[column] for column in EVENT_COLUMNS})
+        del all_markets, market_columns, context_columns
+        markets_df = pd.DataFrame(columns)
         
         try:
             if not markets_df.empty:
@@ -196,45 +187,181 @@ class MarketDetailsProcessor:
                 markets_df['category'] = markets_df['category'].fillna('')
                 
         except Exception as e:
-            print(f"Error adding derived columns: {str(e)}")
+            logger.error("Error adding derived columns: %s", e)
+
+        event_aggregates = self.compute_event_aggregates(markets_df)
+        # Built before normalizing, which moves collection_timestamp (the index's as_of) to the events table
+        expiry_index = ExpiryIndex.build(markets_df)
+        markets_df, events_dim, text_dim = self.normalize_markets(markets_df)
 
-        # Save processed markets
-        output_file = os.path.join(self.data_dir, "processed_markets", f"processed_markets_{date_str}.csv")
-        markets_df.to_csv(output_file, index=False)
+        # Save processed markets with their dimension tables
+        output_dir = os.path.join(self.data_dir, "processed_markets")
+        output_file = os.path.join(output_dir, f"processed_markets_{date_str}.csv")
+        with timed('disk'):
+            markets_df.to_csv(output_file, index=False)
+            events_dim.to_csv(os.path.join(output_dir, f"market_events_{date_str}.csv"), index=False)
+            text_dim.to_csv(os.path.join(output_dir, f"market_text_{date_str}.csv"), index=False)
+            event_aggregates.to_csv(os.path.join(output_dir, f"event_aggregates_{date_str}.csv"), index=False)
+            expiry_index.save(os.path.join(output_dir, f"expiry_index_{date_str}.npz"))
+            if self.columnar_snapshot:
+                MarketSnapshot.write(markets_df, snapshot_path(date_str, self.data_dir))
+        registry.record_stage("process_markets", time.perf_counter() - stage_start, len(markets_df))
         
-        print(f"\nProcessed {len(markets_df)} markets from {len(events_df)} events")
-        print(f"Saved to: {output_file}")
+        logger.info("Processed %d markets from %d events, saved to %s", len(markets_df), len(events_df),
+                    output_file, extra={'event': 'markets_processed', 'count': len(markets_df),
+                                        'events': len(events_df), 'output_file': output_file})
         
         return markets_df
 
-def main():
+    def compute_event_aggregates(self, markets_df: pd.DataFrame) -> pd.DataFrame:
+        """Per-event book totals for mutually exclusive events, computed for all events in one pass.
+
+        overround is how far the yes asks sum above 100c (the cost of buying every
+        outcome), bid_underround how far the yes bids sum below it. The
+        liquidity-weighted probability weights each market's mid-implied
+        probability by its liquidity.
+        """
+        stage_start = time.perf_counter()
+        if markets_df.empty or 'event_mutually_exclusive' not in markets_df.columns:
+            return pd.DataFrame()
+        exclusive = markets_df[markets_df['event_mutually_exclusive'].isin([True, 'True', 'true', 1])]
+        liquidity = pd.to_numeric(exclusive['liquidity'], errors='coerce').fillna(0)
+        frame = pd.DataFrame({
+            'event_ticker': exclusive['event_ticker'].astype(str),
+            'yes_bid': pd.to_numeric(exclusive['yes_bid'], errors='coerce'),
+            'yes_ask': pd.to_numeric(exclusive['yes_ask'], errors='coerce'),
+            'mid_price': pd.to_numeric(exclusive['mid_price'], errors='coerce'),
+            'volume': pd.to_numeric(exclusive['volume'], errors='coerce'),
+            'open_interest': pd.to_numeric(exclusive['open_interest'], errors='coerce'),
+            'liquidity': liquidity,
+            'weighted_probability': exclusive['market_implied_probability'] * liquidity
+        })
+        aggregates = frame.groupby('event_ticker', sort=False).agg(
+            markets=('yes_ask', 'size'),
+            sum_yes_bid=('yes_bid', 'sum'),
+            sum_yes_ask=('yes_ask', 'sum'),
+            sum_mid_price=('mid_price', 'sum'),
+            total_volume=('volume', 'sum'),
+            total_open_interest=('open_interest', 'sum'),
+            total_liquidity=('liquidity', 'sum'),
+            weighted_probability=('weighted_probability', 'sum')
+        ).reset_index()
+        aggregates['overround'] = aggregates['sum_yes_ask'] / 100 - 1
+        aggregates['bid_underround'] = 1 - aggregates['sum_yes_bid'] / 100
+        aggregates['liquidity_weighted_probability'] = (
+            aggregates['weighted_probability'] / aggregates['total_liquidity'].where(aggregates['total_liquidity'] > 0))
+        aggregates = aggregates.drop(columns='weighted_probability')
+
+        registry.record_stage("event_aggregates", time.perf_counter() - stage_start, len(aggregates))
+        logger.info("Computed aggregates for %d mutually exclusive events (%d markets)",
+                    len(aggregates), len(frame))
+        return aggregates
+
+    def normalize_markets(self, markets_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """Apply the compact output schema.
+
+        Returns (markets, events, text): event-level and per-file columns move to
+        one row per event, rules text to a deduplicated (text_id, text) table referenced by
+        <column>_id, and the remaining columns are downcast.
+        """
+        memory_before = int(markets_df.memory_usage(deep=True).sum())
+        event_columns = ['event_ticker'] + [c for c in FILE_COLUMNS + EVENT_COLUMNS if c in markets_df.columns]
+        events_dim = markets_df[event_columns].drop_duplicates('event_ticker').reset_index(drop=True)
+        markets_df = markets_df.drop(columns=event_columns[1:])
+
+        text_columns = [c for c in TEXT_COLUMNS if c in markets_df.columns]
+        texts = pd.unique(markets_df[text_columns].stack()) if text_columns else []
+        text_dim = pd.DataFrame({'text_id': np.arange(len(texts), dtype='int32'), 'text': texts})
+        for column in text_columns:
+            ids = pd.Index(texts).get_indexer(markets_df[column])
+            markets_df[f'{column}_id'] = pd.Series(ids, index=markets_df.index).where(
+                markets_df[column].notna()).astype('Int32')
+        markets_df = markets_df.drop(columns=text_columns)
+
+        for column in INT16_COLUMNS:
+            if column in markets_df.columns:
+                markets_df[column] = downcast_int(markets_df[column], 'int16')
+        for column in INT32_COLUMNS:
+            if column in markets_df.columns:
+                markets_df[column] = downcast_int(markets_df[column], 'int32')
+        for column in FLOAT32_COLUMNS:
+            if column in markets_df.columns:
+                markets_df[column] = markets_df[column].astype('float32')
+        for column in CATEGORY_COLUMNS:
+            if column in markets_df.columns:
+                markets_df[column] = markets_df[column].astype('category')
+
+        memory_after = int(markets_df.memory_usage(deep=True).sum())
+        logger.info("Processed markets frame: %.1f MB -> %.1f MB", memory_before / 1e6, memory_after / 1e6,
+                    extra={'event': 'markets_schema', 'bytes_before': memory_before, 'bytes_after': memory_after})
+        return markets_df, events_dim, text_dim
+
+    @timed('pandas')
+    def load_processed_markets(self, date_str: str, with_dimensions: bool = False) -> pd.DataFrame:
+        """Read processed markets back with the compact schema, optionally re-joining event and text columns.
+
+        Uses the columnar snapshot when there is one, otherwise the CSV.
+        """
+        output_dir = os.path.join(self.data_dir, "processed_markets")
+        if os.path.exists(snapshot_path(date_str, self.data_dir)):
+            markets_df = MarketSnapshot.for_date(date_str, self.data_dir).to_dataframe()
+        else:
+            dtypes = {c: 'Int16' for c in INT16_COLUMNS}
+            dtypes.update({c: 'Int32' for c in INT32_COLUMNS + [f'{c}_id' for c in TEXT_COLUMNS]})
+            dtypes.update({c: 'float32' for c in FLOAT32_COLUMNS})
+            dtypes.update({c: 'category' for c in CATEGORY_COLUMNS})
+            markets_df = pd.read_csv(os.path.join(output_dir, f"processed_markets_{date_str}.csv"),
+                                     dtype=dtypes, low_memory=False)
+        if not with_dimensions:
+            return markets_df
+
+        events_dim = pd.read_csv(os.path.join(output_dir, f"market_events_{date_str}.csv"))
+        text = pd.read_csv(os.path.join(output_dir, f"market_text_{date_str}.csv"),
+                           dtype={'text_id': 'Int32'}).set_index('text_id')['text']
+        for column in TEXT_COLUMNS:
+            if f'{column}_id' in markets_df.columns:
+                markets_df[column] = markets_df[f'{column}_id'].map(text)
+        markets_df['event_ticker'] = markets_df['event_ticker'].astype(str)
+        return markets_df.merge(events_dim, on='event_ticker', how='left')
+
+
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    profile = '--profile' in argv or None
+    argv = [arg for arg in argv if arg != '--profile']
+    setup_logging("process_market_details")
     # Get date from command line argument or use current date
-    if len(sys.argv) > 1:
+    if argv:
         try:
-            input_date = sys.argv[1]
+            input_date = argv[0]
             datetime.strptime(input_date, "%Y%m%d")
             date_str = input_date
         except ValueError:
-            print("Invalid date format. Please use YYYYMMDD format.")
+            logger.error("Invalid date format. Please use YYYYMMDD format.")
             return
     else:
         date_str = datetime.now().strftime("%Y%m%d")
     
-    print(f"Processing market details for date: {date_str}")
+    logger.info("Processing market details for date: %s", date_str)
     
     processor = MarketDetailsProcessor()
-    df = processor.process_markets(date_str)
+    try:
+        with profiled("process_market_details", profile):
+            df = processor.process_markets(date_str)
+    finally:
+        registry.export("process_market_details")
     
-    # Print summary statistics
-    print("\nSummary Statistics:")
-    print(f"Total markets processed: {len(df)}")
-    if not df.empty:
-        print("\nMarkets by category (from events):")
-        category_counts = df['category'].value_counts()
-        print(category_counts)
-        print("\nMarkets by status:")
-        print(df['status'].value_counts())
-        print("\nAverage volume per market:", df['volume'].mean())
+    # Log summary statistics
+    if df.empty:
+        logger.info("Total markets processed: 0", extra={'event': 'markets_summary', 'total_markets': 0})
+    else:
+        by_category = df['category'].value_counts().to_dict()
+        by_status = df['status'].value_counts().to_dict()
+        average_volume = float(df['volume'].mean())
+        logger.info("Total markets processed: %d; by category: %s; by status: %s; average volume: %.2f",
+                    len(df), by_category, by_status, average_volume,
+                    extra={'event': 'markets_summary', 'total_markets': len(df), 'by_category': by_category,
+                           'by_status': by_status, 'average_volume': average_volume})
 
 if __name__ == "__main__":
     main()
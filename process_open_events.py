@@ -1,8 +1,16 @@
-import json
+import logging
 import os
+import time
 import pandas as pd
 from datetime import datetime
 import sys
+from typing import List, Optional
+import day_archive
+from log_config import setup_logging
+from metrics import registry
+from profiling import profiled, timed
+
+logger = logging.getLogger(__name__)
 
 class EventProcessor:
     def __init__(self, json_file_path):
@@ -13,19 +21,19 @@ class EventProcessor:
     def ensure_directories(self):
         """Create necessary directory structure."""
         output_dir = os.path.join(self.data_dir, "processed_events")
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
         
     def load_json_data(self):
-        """Load JSON data from file"""
+        """Load JSON data from file (or from its day bundle once archived)"""
         try:
-            with open(self.json_file_path, 'r') as file:
-                return json.load(file)
+            return day_archive.load_json(self.json_file_path)
         except Exception as e:
             raise Exception(f"Error loading JSON file: {str(e)}")
 
+    @timed('pandas')
     def process_events(self):
         """Process events data and convert to DataFrame"""
+        stage_start = time.perf_counter()
         data = self.load_json_data()
         events_data = []
 
@@ -44,29 +52,37 @@ class EventProcessor:
             }
             events_data.append(event_info)
             
-        return pd.DataFrame(events_data)
+        df = pd.DataFrame(events_data)
+        registry.record_stage("process_events", time.perf_counter() - stage_start, len(df))
+        return df
 
     def save_to_csv(self, output_path):
         """Save processed data to CSV"""
         try:
             df = self.process_events()
             full_output_path = os.path.join(self.data_dir, "processed_events", output_path)
-            df.to_csv(full_output_path, index=False)
-            print(f"Successfully saved {len(df)} events to {full_output_path}")
+            with timed('disk'):
+                df.to_csv(full_output_path, index=False)
+            logger.info("Successfully saved %d events to %s", len(df), full_output_path,
+                        extra={'event': 'events_processed', 'count': len(df), 'output_file': full_output_path})
             return df
         except Exception as e:
             raise Exception(f"Error saving to CSV: {str(e)}")
 
-def main():
+def main(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else argv
+    profile = '--profile' in argv or None
+    argv = [arg for arg in argv if arg != '--profile']
+    setup_logging("process_open_events")
     # Get date from command line argument or use current date
-    if len(sys.argv) > 1:
+    if argv:
         try:
             # Validate the date format
-            input_date = sys.argv[1]
+            input_date = argv[0]
             datetime.strptime(input_date, "%Y%m%d")
             date_str = input_date
         except ValueError:
-            print("Invalid date format. Please use YYYYMMDD format.")
+            logger.error("Invalid date format. Please use YYYYMMDD format.")
             return
     else:
         date_str = datetime.now().strftime("%Y%m%d")
@@ -75,24 +91,27 @@ def main():
     input_path = f"events_{date_str}.json"
     output_path = f"processed_events_{date_str}.csv"
     
-    print(f"Processing data for date: {date_str}")
+    logger.info("Processing data for date: %s", date_str)
     
     # Process events
     processor = EventProcessor(input_path)
     
     try:
-        df = processor.save_to_csv(output_path)
+        with profiled("process_open_events", profile):
+            df = processor.save_to_csv(output_path)
         
-        # Print summary statistics
-        print("\nSummary Statistics:")
-        print(f"Total events: {len(df)}")
-        print("\nEvents by category:")
-        print(df['category'].value_counts())
-        print("\nMutually exclusive events:")
-        print(df['mutually_exclusive'].value_counts())
+        # Log summary statistics
+        by_category = df['category'].value_counts().to_dict()
+        by_exclusive = {str(k): v for k, v in df['mutually_exclusive'].value_counts().to_dict().items()}
+        logger.info("Total events: %d; by category: %s; mutually exclusive: %s",
+                    len(df), by_category, by_exclusive,
+                    extra={'event': 'events_summary', 'total_events': len(df),
+                           'by_category': by_category, 'mutually_exclusive': by_exclusive})
         
     except Exception as e:
-        print(f"Error processing events: {str(e)}")
+        logger.error("Error processing events: %s", e, extra={'event': 'stage_failed'})
+    finally:
+        registry.export("process_open_events")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
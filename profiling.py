@@ -0,0 +1,174 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Where wall time goes; anything not covered by a timer is reported as "other"
+CATEGORIES = ('network', 'signing', 'json', 'pandas', 'disk', 'wait')
+
+_local = threading.local()
+_active = 0  # Number of profiled() runs in progress; timers are no-ops while it is 0
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def timed(category: str):
+    """Attribute the enclosed time to a category in kalshi_category_seconds_total.
+
+    Timers nest: time spent in an inner timer is counted only for the inner
+    category, so e.g. JSON parsing inside a processor isn't also counted as pandas.
+    Nothing is measured unless a profiled() run is in progress.
+    """
+    if not _active:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    frame = [0.0]  # time spent in nested timers
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        registry.inc("kalshi_category_seconds_total", elapsed - frame[0], category=category)
+
+
+def category_seconds() -> Dict[str, float]:
+    """Seconds recorded per category so far in this process (summed across threads)."""
+    series = registry.counter_values("kalshi_category_seconds_total")
+    totals = {category: 0.0 for category in CATEGORIES}
+    for key, value in series.items():
+        totals[dict(key)['category']] = totals.get(dict(key)['category'], 0.0) + value
+    return totals
+
+
+class StackSampler:
+    """Samples the stacks of every thread at a fixed interval into collapsed-stack counts.
+
+    cProfile only sees the thread that enabled it; sampling covers worker threads
+    too, and the output (one "frame;frame;frame count" line per stack) is what
+    flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+def profile_enabled() -> bool:
+    return os.environ.get("KALSHI_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profiled(job: str, enabled: Optional[bool] = None, profile_dir: Optional[str] = None):
+    """Profile the enclosed run when enabled (--profile or KALSHI_PROFILE=1).
+
+    Writes to historical_data/profiles/ (override with KALSHI_PROFILE_DIR):
+    - <job>.pstats: cProfile of the calling thread (python -m pstats, snakeviz)
+    - <job>.collapsed: sampled stacks of all threads, for flamegraphs
+    - <job>_profile.json: wall time attributed to network, signing, json, pandas,
+      disk and wait from the instrumented timers, plus the top functions
+    """
+    if not (profile_enabled() if enabled is None else enabled):
+        yield
+        return
+    profile_dir = profile_dir or os.environ.get("KALSHI_PROFILE_DIR", os.path.join("historical_data", "profiles"))
+    os.makedirs(profile_dir, exist_ok=True)
+    global _active
+    before = category_seconds()
+    sampler = StackSampler()
+    profiler = cProfile.Profile()
+    with _active_lock:
+        _active += 1
+    start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        with _active_lock:
+            _active -= 1
+        wall = time.perf_counter() - start
+        paths = {
+            'pstats': os.path.join(profile_dir, f"{job}.pstats"),
+            'collapsed': os.path.join(profile_dir, f"{job}.collapsed"),
+            'summary': os.path.join(profile_dir, f"{job}_profile.json")
+        }
+        profiler.dump_stats(paths['pstats'])
+        sampler.write(paths['collapsed'])
+        summary = attribution(job, wall, before, category_seconds(), profiler)
+        summary['files'] = paths
+        with open(paths['summary'], 'w') as f:
+            json.dump(summary, f, indent=2)
+        logger.info("Profile of %s (%.2fs wall): %s; written to %s", job, wall,
+                    ", ".join(f"{c['category']} {c['seconds']:.2f}s ({c['share_of_wall']:.0%})"
+                              for c in summary['categories']),
+                    paths['summary'], extra={'event': 'profile_written', 'output_file': paths['summary']})
+
+
+def attribution(job: str, wall: float, before: Dict[str, float], after: Dict[str, float],
+                profiler: cProfile.Profile, top: int = 25) -> Dict:
+    """Per-category seconds over a run and the functions with the most own time."""
+    import pstats
+    spent = {category: after.get(category, 0.0) - before.get(category, 0.0) for category in after}
+    # Threads overlap, so timed seconds can exceed wall time; "other" is only what's left of the wall
+    other = max(0.0, wall - sum(spent.values()))
+    categories = [{'category': category, 'seconds': round(seconds, 4),
+                   'share_of_wall': round(seconds / wall, 4) if wall else None}
+                  for category, seconds in sorted(spent.items(), key=lambda item: -item[1])]
+    categories.append({'category': 'other', 'seconds': round(other, 4),
+                       'share_of_wall': round(other / wall, 4) if wall else None})
+
+    stats = pstats.Stats(profiler)
+    functions: List[Dict] = []
+    for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+        functions.append({'function': f"{os.path.basename(filename)}:{line}:{name}", 'calls': calls,
+                          'own_s': round(own, 4), 'cumulative_s': round(cumulative, 4)})
+    functions.sort(key=lambda entry: -entry['own_s'])
+    return {'job': job, 'wall_time_s': round(wall, 4), 'categories': categories, 'top_functions': functions[:top]}
@@ -0,0 +1,73 @@
+import sys
+from typing import Dict, Iterable, List, Sequence, Type
+
+# Low-cardinality strings repeated across thousands of records; interning shares one copy of each
+INTERNED_FIELDS = {'category', 'status', 'series_ticker', 'market_type', 'response_price_units', 'result'}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Record:
+    """Base for compact API records: one slot per field instead of a per-object dict."""
+
+    __slots__ = ()
+    FIELDS: Sequence[str] = ()
+
+    @classmethod
+    def from_api(cls, data: Dict) -> "Record":
+        record = cls.__new__(cls)
+        for field in cls.FIELDS:
+            value = data.get(field)
+            setattr(record, field, _intern(value) if field in INTERNED_FIELDS else value)
+        return record
+
+    @classmethod
+    def from_api_list(cls, items: Iterable[Dict]) -> List["Record"]:
+        return [cls.from_api(item) for item in items]
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({getattr(self, self.FIELDS[0])!r})"
+
+
+class Event(Record):
+    FIELDS = ('event_ticker', 'series_ticker', 'category', 'title', 'sub_title', 'strike_date',
+              'strike_period', 'mutually_exclusive', 'collateral_return_type')
+    __slots__ = FIELDS
+
+
+class Market(Record):
+    FIELDS = ('ticker', 'event_ticker', 'market_type', 'title', 'subtitle', 'yes_sub_title', 'no_sub_title',
+              'open_time', 'close_time', 'expected_expiration_time', 'expiration_time',
+              'latest_expiration_time', 'settlement_timer_seconds',
+              'status', 'response_price_units', 'notional_value', 'tick_size',
+              'yes_bid', 'yes_ask', 'no_bid', 'no_ask', 'last_price',
+              'previous_yes_bid', 'previous_yes_ask', 'previous_price',
+              'volume', 'volume_24h', 'liquidity', 'open_interest',
+              'result', 'can_close_early', 'expiration_value', 'category', 'risk_limit_cents',
+              'rules_primary', 'rules_secondary')
+    __slots__ = FIELDS
+
+
+def to_columns(records: Sequence[Record], record_type: Type[Record]) -> Dict[str, list]:
+    """Column lists straight from the slots, without building a dict per record."""
+    return {field: [getattr(r, field) for r in records] for field in record_type.FIELDS}
+
+
+def to_dataframe(records: Sequence[Record], record_type: Type[Record]):
+    # Imported here so collectors that only decode records don't pay for pandas at startup
+    import pandas as pd
+    return pd.DataFrame(to_columns(records, record_type), columns=list(record_type.FIELDS))
+
+
+def to_arrow(records: Sequence[Record], record_type: Type[Record]):
+    """pyarrow Table of the records; pyarrow is optional and only needed here."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("pyarrow is required for Arrow output (pip install pyarrow)") from e
+    return pa.table(to_columns(records, record_type))
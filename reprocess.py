@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Batch reprocessing of past days.
+
+Runs the event and market processing steps for every collected day in a date
+range, one day per worker process. A day is skipped when neither its raw inputs
+(events snapshot and individual market files, loose or archived) nor the
+processing code have changed since it was last processed, and its outputs are
+still in place; --force reprocesses anyway.
+
+Results are recorded in historical_data/reprocess/manifest.json (input fingerprint
+per day) and each run writes historical_data/reprocess/report_<timestamp>.json.
+
+Usage: python reprocess.py --start 20250101 --end 20250331 [--workers 4] [--force]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import day_archive
+from file_cache import FingerprintCache, fingerprint
+from log_config import setup_logging
+from metrics import registry
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
+
+# Changing any of these changes the outputs, so their source is part of every day's fingerprint
+PROCESSING_MODULES = ['process_open_events.py', 'process_market_details.py', 'records.py',
+                      'market_snapshot.py', 'expiry_index.py']
+
+DAY_OUTPUTS = [os.path.join("processed_events", "processed_events_{date}.csv"),
+               os.path.join("processed_markets", "processed_markets_{date}.csv")]
+
+
+def code_fingerprint() -> str:
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    return hashlib.sha1(''.join(fingerprint(os.path.join(module_dir, name))
+                                for name in PROCESSING_MODULES).encode()).hexdigest()
+
+
+def process_day(date_str: str) -> Dict:
+    """Process one day's events and markets (runs in a worker process)."""
+    from process_market_details import MarketDetailsProcessor
+    from process_open_events import EventProcessor
+
+    result = {'date': date_str}
+    start = time.perf_counter()
+    events_df = EventProcessor(f"events_{date_str}.json").save_to_csv(f"processed_events_{date_str}.csv")
+    result['events'] = len(events_df)
+    result['events_s'] = round(time.perf_counter() - start, 3)
+    start = time.perf_counter()
+    result['markets'] = len(MarketDetailsProcessor().process_markets(date_str))
+    result['markets_s'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _run_day(date_str: str) -> Dict:
+    setup_logging("reprocess", level="WARNING")
+    try:
+        return dict(process_day(date_str), status='processed')
+    except Exception as e:
+        return {'date': date_str, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+
+
+class BatchReprocessor:
+    def __init__(self, start_date: str, end_date: str, workers: Optional[int] = None, force: bool = False):
+        self.data_dir = "historical_data"
+        self.reprocess_dir = os.path.join(self.data_dir, "reprocess")
+        self.start_date = start_date
+        self.end_date = end_date
+        self.workers = workers or os.cpu_count() or 1
+        self.force = force
+        os.makedirs(self.reprocess_dir, exist_ok=True)
+        self.manifest_file = os.path.join(self.reprocess_dir, "manifest.json")
+        self.manifest: Dict[str, Dict] = (day_archive.load_json(self.manifest_file)
+                                          if os.path.exists(self.manifest_file) else {})
+        self.cache = FingerprintCache(os.path.join(self.data_dir, "cache"), "reprocess")
+
+    def days(self) -> List[str]:
+        """Dates in range that have an events snapshot (loose or archived)."""
+        paths = day_archive.list_files(self.data_dir, "open_events", "events_*.json")
+        dates = [os.path.basename(path)[len("events_"):-len(".json")] for path in paths]
+        return [date_str for date_str in dates if self.start_date <= date_str <= self.end_date]
+
+    def input_fingerprint(self, date_str: str, code: str) -> str:
+        """Combined content hash of a day's raw inputs and the processing code."""
+        inputs = [os.path.join(self.data_dir, "open_events", f"events_{date_str}.json")]
+        inputs += day_archive.list_files(self.data_dir, "open_markets_individual", f"open_markets_*_{date_str}.json")
+        digest = hashlib.sha1(code.encode())
+        for path in inputs:
+            digest.update(os.path.basename(path).encode())
+            digest.update(self.cache.fingerprint(path).encode())
+        return digest.hexdigest()
+
+    def outputs_present(self, date_str: str) -> bool:
+        return all(os.path.exists(os.path.join(self.data_dir, output.format(date=date_str)))
+                   for output in DAY_OUTPUTS)
+
+    def run(self) -> Dict:
+        stage_start = time.perf_counter()
+        code = code_fingerprint()
+        days = self.days()
+        results: Dict[str, Dict] = {}
+        todo: Dict[str, str] = {}
+        for date_str in days:
+            input_fp = self.input_fingerprint(date_str, code)
+            previous = self.manifest.get(date_str, {})
+            if not self.force and previous.get('fingerprint') == input_fp and self.outputs_present(date_str):
+                results[date_str] = {'date': date_str, 'status': 'skipped'}
+            else:
+                todo[date_str] = input_fp
+        self.cache.flush()
+        logger.info("Reprocessing %d of %d days in %s-%s (%d unchanged) with %d workers",
+                    len(todo), len(days), self.start_date, self.end_date, len(days) - len(todo),
+                    min(self.workers, len(todo)) if todo else 0)
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(todo)),
+                                     mp_context=get_context("spawn")) as pool:
+                futures = {pool.submit(_run_day, date_str): date_str for date_str in todo}
+                for future in as_completed(futures):
+                    date_str = futures[future]
+                    result = future.result()
+                    results[date_str] = result
+                    if result['status'] == 'processed':
+                        self.manifest[date_str] = {'fingerprint': todo[date_str],
+                                                   'processed_at': datetime.now().isoformat(),
+                                                   'events': result['events'], 'markets': result['markets']}
+                        writer.write_json(self.manifest_file, self.manifest)
+                        logger.info("Processed %s: %d events, %d markets", date_str,
+                                    result['events'], result['markets'])
+                    else:
+                        logger.error("Failed to process %s: %s", date_str, result['error'])
+
+        for result in results.values():
+            registry.inc("kalshi_reprocess_days_total", status=result['status'])
+        duration = time.perf_counter() - stage_start
+        processed = [r for r in results.values() if r['status'] == 'processed']
+        registry.record_stage("reprocess", duration, len(processed))
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'workers': self.workers,
+            'forced': self.force,
+            'code_fingerprint': code,
+            'duration_s': round(duration, 2),
+            'days': len(days),
+            'processed': len(processed),
+            'skipped': sum(r['status'] == 'skipped' for r in results.values()),
+            'failed': sum(r['status'] == 'failed' for r in results.values()),
+            'total_events': sum(r['events'] for r in processed),
+            'total_markets': sum(r['markets'] for r in processed),
+            'results': [results[date_str] for date_str in sorted(results)]
+        }
+        report_file = os.path.join(self.reprocess_dir, f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        writer.write_json(report_file, report)
+        writer.flush()
+        logger.info("Reprocessed %d days (%d skipped, %d failed) in %.1fs; report: %s",
+                    report['processed'], report['skipped'], report['failed'], duration, report_file,
+                    extra={'event': 'reprocess_completed', 'output_file': report_file,
+                           **{key: report[key] for key in ('days', 'processed', 'skipped', 'failed')}})
+        return report
+
+
+def main():
+    setup_logging("reprocess")
+    parser = argparse.ArgumentParser(description="Reprocess a range of days in parallel")
+    parser.add_argument("--start", required=True, help="First date, YYYYMMDD")
+    parser.add_argument("--end", required=True, help="Last date, YYYYMMDD")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Reprocess days even if their inputs are unchanged")
+    args = parser.parse_args()
+    for value in (args.start, args.end):
+        datetime.strptime(value, "%Y%m%d")
+
+    try:
+        return BatchReprocessor(args.start, args.end, args.workers, args.force).run()
+    finally:
+        registry.export("reprocess")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Throttling, timeouts and transient upstream errors; 4xx otherwise means the request itself is wrong
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class RetryPolicy:
+    """Decorrelated-jitter backoff with a per-call deadline.
+
+    delay_n = min(max_delay, uniform(base_delay, 3 * delay_{n-1})), which spreads
+    retries from concurrent callers instead of having them hit the API in lockstep.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 20.0,
+                 deadline: float = 60.0, request_timeout: float = 15.0, rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.request_timeout = request_timeout
+        self.rng = rng or random.Random()
+
+    def next_delay(self, previous_delay: float) -> float:
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, self.rng.uniform(self.base_delay, upper))
+
+    @staticmethod
+    def is_retryable_status(status_code: int) -> bool:
+        return status_code in RETRYABLE_STATUS
+
+    @staticmethod
+    def is_retryable_exception(exc: Exception) -> bool:
+        if isinstance(exc, requests.HTTPError) and exc.response is not None:
+            return exc.response.status_code in RETRYABLE_STATUS
+        return isinstance(exc, (requests.ConnectionError, requests.Timeout,
+                                requests.exceptions.ChunkedEncodingError))
+
+    @staticmethod
+    def retry_after(response: requests.Response) -> Optional[float]:
+        """Seconds requested by a Retry-After header, if the server sent one."""
+        value = response.headers.get("Retry-After") if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+
+class CircuitBreaker:
+    """Stops calling the API after consecutive failures, probing again after reset_timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 8, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(
+                        f"Circuit open after {self.consecutive_failures} consecutive failures")
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError("Circuit half-open; probe request already in flight")
+                self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker closed after successful probe")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %d consecutive failures",
+                                   self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Long-running collection scheduler.
+
+Keeps one authenticated, connection-pooled MarketDataManager and the latest open
+events in memory, and runs on independent jittered cadences:
+- events: full open-events sweep (EventsCollector.collect_events)
+- markets: concurrent refresh of markets for every currently open event
+
+A job that is still running when it comes due again is skipped rather than
+overlapped. Cycle latency, runs, failures and skips are recorded as metrics,
+exported after every cycle and optionally served over HTTP (--metrics-port).
+
+Usage: python scheduler.py [--events-interval 900] [--markets-interval 300] [--jitter 0.1]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from auth_manager import AuthManager
+from concurrency import AdaptiveLimiter
+from log_config import setup_logging
+from market_data import MarketDataManager
+from metrics import registry
+from open_events_collector import EventsCollector
+from open_market_collector import OpenMarketCollector
+from output_writer import writer
+from search_index import SearchIndex
+from profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+CYCLE_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class ScheduledJob:
+    def __init__(self, name: str, func: Callable[[], object], interval: float, jitter: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = time.monotonic()
+        self.future: Optional[Future] = None
+
+    def schedule_next(self, rng: random.Random):
+        spread = self.interval * self.jitter
+        self.next_run = time.monotonic() + self.interval + rng.uniform(-spread, spread)
+
+
+class CollectionScheduler:
+    def __init__(self, auth_manager: AuthManager, events_interval: float = 900.0,
+                 markets_interval: float = 300.0, jitter: float = 0.1, market_workers: int = 8,
+                 adaptive: bool = True):
+        self.data_dir = "historical_data"
+        self.market_data = MarketDataManager(auth_manager)
+        # Adaptive: market_workers is the starting in-flight limit, tuned from latency and 429s across cycles
+        self.market_data.limiter = AdaptiveLimiter("scheduler", initial=market_workers) if adaptive else None
+        self.events_collector = EventsCollector(auth_manager)
+        self.events_collector.market_data = self.market_data
+        self.market_collector = OpenMarketCollector(auth_manager, adaptive=False)
+        self.market_collector.market_data = self.market_data
+        # Kept in memory and refreshed after each events sweep (refreshing it takes seconds on a full day)
+        self.search_index = SearchIndex(self.data_dir)
+        self.market_workers = market_workers
+        self.rng = random.Random()
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.open_events: List[Dict] = self.load_latest_events()
+        self.jobs = [
+            ScheduledJob("events", self.sweep_events, events_interval, jitter),
+            ScheduledJob("markets", self.refresh_markets, markets_interval, jitter),
+        ]
+
+    def load_latest_events(self) -> List[Dict]:
+        """Warm start from the newest open_events snapshot so market refreshes can begin immediately."""
+        files = sorted(glob.glob(os.path.join(self.data_dir, "open_events", "events_*.json")))
+        if not files:
+            return []
+        with open(files[-1], 'r') as f:
+            events = json.load(f).get('events', [])
+        self.events_collector.last_events = events
+        logger.info("Loaded %d open events from %s", len(events), files[-1])
+        return events
+
+    def sweep_events(self):
+        """Full open-events sweep; the result stays in memory for market refreshes."""
+        filename = self.events_collector.collect_events()
+        self.open_events = self.events_collector.last_events or []
+        date_str = os.path.basename(filename)[len("events_"):-len(".json")]
+        try:
+            self.search_index.update(refresh=date_str)
+        except Exception as e:
+            logger.warning("Search index update for %s failed: %s", date_str, e)
+
+    def refresh_markets(self) -> Optional[str]:
+        """Re-fetch markets for every open event concurrently and write the combined open_markets file."""
+        if not self.open_events:
+            logger.info("No open events in memory yet; skipping market refresh")
+            return None
+        timestamp = datetime.now()
+        date_str = timestamp.strftime('%Y%m%d')
+        tickers = [event['event_ticker'] for event in self.open_events]
+        # Open events are all fetched again below, so the queue only needs them; closed ones are dropped
+        dropped = self.market_collector.failure_queue.retain("markets", set(tickers))
+        if dropped:
+            logger.info("Dropped %d failed market fetches for events no longer open", dropped)
+
+        def fetch(ticker: str) -> List[Dict]:
+            try:
+                markets = self.market_collector.collect_event_markets(ticker, timestamp, date_str)
+                with self._lock:
+                    self.market_collector.failure_queue.resolve(ticker, "markets")
+                return markets
+            except Exception as e:
+                logger.warning("Market refresh failed for %s: %s", ticker, e)
+                with self._lock:
+                    self.market_collector.failure_queue.record(ticker, "markets", e)
+                return []
+
+        limiter = self.market_data.limiter
+        with ThreadPoolExecutor(max_workers=limiter.max_limit if limiter else self.market_workers) as pool:
+            results = list(pool.map(fetch, tickers))
+        failure_queue = self.market_collector.failure_queue
+        failure_queue.save()
+        failed = failure_queue.pending("markets")
+        registry.set_gauge("kalshi_failure_queue_pending", len(failed), component="scheduler")
+        if failed:
+            logger.warning("%d events failing market refreshes (retried next cycle): %s", len(failed),
+                           ", ".join(entry['ticker'] for entry in failed[:10]),
+                           extra={'event': 'market_refresh_failures', 'count': len(failed)})
+        self.market_collector.change_stream.flush()
+        open_markets = [market for markets in results for market in markets]
+
+        filename = os.path.join(self.data_dir, "open_markets", f"open_markets_{date_str}.json")
+        writer.write_json(filename, {
+            'timestamp': timestamp.isoformat(),
+            'total_events_processed': len(tickers),
+            'total_open_markets': len(open_markets),
+            'markets': open_markets
+        }, indent=None)
+        writer.flush()
+        logger.info("Refreshed %d open markets from %d events", len(open_markets), len(tickers),
+                    extra={'event': 'open_markets_collected', 'count': len(open_markets),
+                           'events_processed': len(tickers), 'output_file': filename})
+        return filename
+
+    def _run_job(self, job: ScheduledJob):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            job.func()
+        except Exception as e:
+            status = "error"
+            logger.error("Scheduled %s cycle failed: %s", job.name, e, extra={'event': 'cycle_failed', 'job': job.name})
+        finally:
+            duration = time.perf_counter() - start
+            registry.observe("kalshi_scheduler_cycle_seconds", duration, CYCLE_BUCKETS, job=job.name)
+            registry.inc("kalshi_scheduler_cycles_total", job=job.name, status=status)
+            registry.set_gauge("kalshi_scheduler_last_cycle_seconds", duration, job=job.name)
+            if status == "ok":
+                registry.set_gauge("kalshi_scheduler_last_success_timestamp", time.time(), job=job.name)
+            with self._lock:
+                registry.export("scheduler")
+            logger.info("%s cycle finished in %.2fs (%s)", job.name, duration, status,
+                        extra={'event': 'cycle_completed', 'job': job.name, 'duration_s': duration,
+                               'status': status})
+
+    def run(self, max_cycles: Optional[int] = None):
+        """Dispatch due jobs until stopped (or until every job has run max_cycles times)."""
+        runs = {job.name: 0 for job in self.jobs}
+        with ThreadPoolExecutor(max_workers=len(self.jobs)) as pool:
+            while not self.stop_event.is_set():
+                now = time.monotonic()
+                for job in self.jobs:
+                    if now < job.next_run or (max_cycles is not None and runs[job.name] >= max_cycles):
+                        continue
+                    if job.future is not None and not job.future.done():
+                        logger.warning("Skipping %s cycle; previous cycle still running", job.name,
+                                       extra={'event': 'cycle_skipped', 'job': job.name})
+                        registry.inc("kalshi_scheduler_skipped_total", job=job.name)
+                    else:
+                        job.future = pool.submit(self._run_job, job)
+                        runs[job.name] += 1
+                    job.schedule_next(self.rng)
+                if max_cycles is not None and all(count >= max_cycles for count in runs.values()):
+                    break
+                wake = min(job.next_run for job in self.jobs)
+                self.stop_event.wait(max(0.05, min(1.0, wake - time.monotonic())))
+
+    def stop(self, *_):
+        logger.info("Stopping scheduler after running cycles finish")
+        self.stop_event.set()
+
+
+def main():
+    setup_logging("scheduler")
+    parser = argparse.ArgumentParser(description="Run event sweeps and market refreshes on a schedule")
+    parser.add_argument("--events-interval", type=float, default=900, help="Seconds between event sweeps")
+    parser.add_argument("--markets-interval", type=float, default=300, help="Seconds between market refreshes")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- fraction applied to each interval")
+    parser.add_argument("--market-workers", type=int, default=8,
+                        help="Concurrent market requests per refresh (the starting limit unless --fixed-workers)")
+    parser.add_argument("--fixed-workers", action="store_true", help="Keep --market-workers fixed instead of adapting")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--cycles", type=int, help="Stop after each job has run this many times")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write a cProfile dump, collapsed stacks and a time breakdown to historical_data/profiles/")
+    args = parser.parse_args()
+
+    auth = AuthManager(key_id="05b95ed4-a236-41a1-9e3b-81124f6871dd", key_file_path="private_key.pem")
+    scheduler = CollectionScheduler(auth, args.events_interval, args.markets_interval, args.jitter,
+                                    args.market_workers, adaptive=not args.fixed_workers)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    if args.metrics_port:
+        registry.serve(args.metrics_port)
+    try:
+        with profiled("scheduler", args.profile):
+            scheduler.run(args.cycles)
+    except KeyboardInterrupt:
+        scheduler.stop()
+    finally:
+        registry.export("scheduler")
+
+
+if __name__ == "__main__":
+    main()
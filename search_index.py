@@ -0,0 +1,240 @@
+import argparse
+import bisect
+import difflib
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+import day_archive
+from log_config import setup_logging
+from output_writer import writer
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+INDEX_VERSION = 3
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def snapshot_date(path: str) -> str:
+    return os.path.basename(path)[len("events_"):-len(".json")]
+
+
+class SearchIndex:
+    """Inverted index over event and market text, persisted to disk.
+
+    Documents are events (title, sub_title, series and event ticker), with ids
+    "event:<event_ticker>", and markets (title, subtitle, ticker), with ids
+    "market:<ticker>". Each new open_events snapshot, plus the individual market
+    files collected that day, is folded in incrementally by update(), loose or
+    archived. Events absent from the newest snapshot are marked 'closed'.
+
+    Only the keep_days days up to the newest snapshot are indexed: documents
+    not seen in any of them are pruned, so the index (and the cost of
+    refreshing it) doesn't grow with the whole history. None keeps everything.
+    """
+
+    def __init__(self, data_dir: str = "historical_data", keep_days: Optional[int] = 30):
+        self.data_dir = data_dir
+        self.keep_days = keep_days
+        self.index_file = os.path.join(data_dir, "search_index.json")
+        self.docs: Dict[str, Dict] = {}
+        self.snapshots: List[str] = []
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.vocabulary: List[str] = []
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except ValueError as e:
+            logger.warning("Ignoring unreadable search index %s: %s", self.index_file, e)
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.docs = data['docs']
+        self.snapshots = data['snapshots']
+        self.postings = defaultdict(set, {token: set(ids) for token, ids in data['postings'].items()})
+        self.vocabulary = sorted(self.postings)
+
+    def save(self):
+        writer.write_json(self.index_file, {
+            'version': INDEX_VERSION,
+            'snapshots': self.snapshots,
+            'docs': self.docs,
+            'postings': {token: sorted(ids) for token, ids in self.postings.items()}
+        }, indent=None)
+
+    def _add_doc(self, doc_id: str, doc: Dict, *texts: Optional[str]):
+        old = self.docs.get(doc_id)
+        if old is not None:
+            for token in old['tokens']:
+                self.postings[token].discard(doc_id)
+        tokens = sorted({token for text in texts for token in tokenize(text)})
+        doc['tokens'] = tokens
+        self.docs[doc_id] = doc
+        for token in tokens:
+            self.postings[token].add(doc_id)
+
+    def add_event(self, event: Dict, status: str = 'open', seen: Optional[str] = None):
+        ticker = event['event_ticker']
+        self._add_doc(f"event:{ticker}", {
+            'kind': 'event',
+            'event_ticker': ticker,
+            'title': event.get('title'),
+            'sub_title': event.get('sub_title'),
+            'series_ticker': event.get('series_ticker'),
+            'category': event.get('category'),
+            'status': status,
+            'last_seen': seen
+        }, event.get('title'), event.get('sub_title'), event.get('series_ticker'), ticker)
+
+    def add_market(self, market: Dict, category: Optional[str] = None, seen: Optional[str] = None):
+        ticker = market['ticker']
+        self._add_doc(f"market:{ticker}", {
+            'kind': 'market',
+            'ticker': ticker,
+            'event_ticker': market.get('event_ticker'),
+            'title': market.get('title'),
+            'subtitle': market.get('subtitle'),
+            'category': category or market.get('category'),
+            'status': market.get('status'),
+            'last_seen': seen
+        }, market.get('title'), market.get('subtitle'), market.get('yes_sub_title'), ticker)
+
+    def update(self, refresh: Optional[str] = None) -> int:
+        """Fold in open_events snapshots not indexed yet. Returns how many were added.
+
+        refresh (YYYYMMDD) re-reads that day's snapshot and market files even if
+        already indexed, for a day that is still being collected.
+        """
+        paths = day_archive.list_files(self.data_dir, "open_events", "events_*.json")
+        cutoff = self.cutoff(snapshot_date(paths[-1])) if paths else None
+        new = [path for path in paths if (cutoff is None or snapshot_date(path) >= cutoff)
+               and (os.path.basename(path) not in self.snapshots or snapshot_date(path) == refresh)]
+        for path in new:
+            date_str = snapshot_date(path)
+            events = day_archive.load_json(path).get('events', [])
+            current = {event['event_ticker'] for event in events}
+            for event in events:
+                self.add_event(event, seen=date_str)
+                self._add_event_markets(event['event_ticker'], date_str, event.get('category'))
+            # Snapshots arrive in date order, so the last one decides which events are still open
+            for doc in self.docs.values():
+                if doc['kind'] == 'event' and doc['event_ticker'] not in current:
+                    doc['status'] = 'closed'
+            if os.path.basename(path) not in self.snapshots:
+                self.snapshots.append(os.path.basename(path))
+        pruned = self.prune(cutoff) if cutoff else 0
+        if new or pruned:
+            self.vocabulary = sorted(token for token, ids in self.postings.items() if ids)
+            self.save()
+            logger.info("Indexed %d new snapshots, pruned %d documents (%d documents)",
+                        len(new), pruned, len(self.docs))
+        return len(new)
+
+    def cutoff(self, newest: str) -> Optional[str]:
+        """First YYYYMMDD kept when the newest snapshot is from newest."""
+        if self.keep_days is None:
+            return None
+        return (datetime.strptime(newest, "%Y%m%d") - timedelta(days=self.keep_days - 1)).strftime("%Y%m%d")
+
+    def prune(self, cutoff: str) -> int:
+        """Drop documents last seen before cutoff, and their snapshots. Returns how many documents went."""
+        stale = [doc_id for doc_id, doc in self.docs.items() if (doc.get('last_seen') or '') < cutoff]
+        for doc_id in stale:
+            for token in self.docs.pop(doc_id)['tokens']:
+                ids = self.postings.get(token)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del self.postings[token]
+        self.snapshots = [name for name in self.snapshots if name[len("events_"):-len(".json")] >= cutoff]
+        return len(stale)
+
+    def _add_event_markets(self, event_ticker: str, date_str: str, category: Optional[str]):
+        path = os.path.join(self.data_dir, "open_markets_individual",
+                            f"open_markets_{event_ticker}_{date_str}.json")
+        if not day_archive.exists(path):
+            return
+        markets = day_archive.load_json(path).get('all_markets', [])
+        for market in markets:
+            self.add_market(market, category, seen=date_str)
+
+    def _expand(self, term: str, fuzzy: bool) -> Dict[str, float]:
+        """Doc ids matching one query term, with a score (exact > prefix > fuzzy)."""
+        matches: Dict[str, float] = {}
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            weight = 2.0 if token == term else 1.0
+            for doc_id in self.postings[token]:
+                matches[doc_id] = max(matches.get(doc_id, 0.0), weight)
+        if not matches and fuzzy and len(term) > 2:
+            for token in difflib.get_close_matches(term, self.vocabulary, n=5, cutoff=0.75):
+                for doc_id in self.postings[token]:
+                    matches[doc_id] = max(matches.get(doc_id, 0.0), 0.5)
+        return matches
+
+    def search(self, query: str, category: Optional[str] = None, status: Optional[str] = None,
+               kind: Optional[str] = None, limit: int = 20, fuzzy: bool = True) -> List[Dict]:
+        """Documents matching every query term (prefix match, fuzzy when a term has no prefix match)."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores: Optional[Dict[str, float]] = None
+        for term in terms:
+            matches = self._expand(term, fuzzy)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {doc_id: scores[doc_id] + score for doc_id, score in matches.items() if doc_id in scores}
+            if not scores:
+                return []
+
+        results = []
+        for doc_id, score in sorted(scores.items(), key=lambda item: (-item[1], item[0])):
+            doc = self.docs[doc_id]
+            if category and (doc.get('category') or '').lower() != category.lower():
+                continue
+            if status and doc.get('status') != status:
+                continue
+            if kind and doc['kind'] != kind:
+                continue
+            result = {key: value for key, value in doc.items() if key != 'tokens'}
+            result['score'] = score
+            results.append(result)
+            if len(results) >= limit:
+                break
+        return results
+
+
+def main():
+    setup_logging("search_index")
+    parser = argparse.ArgumentParser(description="Update the event/market search index")
+    parser.add_argument("--refresh", help="Re-read this day (YYYYMMDD) even if already indexed, e.g. today")
+    parser.add_argument("--keep-days", type=int, default=30,
+                        help="Days up to the newest snapshot to keep indexed (0 keeps everything)")
+    args = parser.parse_args()
+    if args.refresh:
+        datetime.strptime(args.refresh, "%Y%m%d")
+
+    index = SearchIndex(keep_days=args.keep_days or None)
+    added = index.update(refresh=args.refresh)
+    logger.info("Search index: %d snapshots added, %d documents over %d snapshots", added, len(index.docs),
+                len(index.snapshots), extra={'event': 'search_index_updated', 'documents': len(index.docs)})
+
+
+if __name__ == "__main__":
+    main()
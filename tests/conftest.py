@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Empty historical_data/ tree in a temporary working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "historical_data"
+
+
+def write_day(data_dir, date_str: str, collected_at: str, yes_bid: int = 40, event_ticker: str = "EV",
+              market_ticker: str = None):
+    """Raw collector output of one day: an events snapshot and one event's market file."""
+    events_dir = data_dir / "open_events"
+    markets_dir = data_dir / "open_markets_individual"
+    events_dir.mkdir(parents=True, exist_ok=True)
+    markets_dir.mkdir(parents=True, exist_ok=True)
+    event = {'event_ticker': event_ticker, 'series_ticker': 'SER', 'title': 'Event', 'sub_title': '',
+             'category': 'Economics', 'mutually_exclusive': True, 'collateral_return_type': '',
+             'strike_date': f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}T20:00:00Z"}
+    (events_dir / f"events_{date_str}.json").write_text(json.dumps(
+        {'timestamp': collected_at, 'total_open_events': 1, 'events': [event]}))
+    market = {'ticker': market_ticker or f"{event_ticker}-A", 'event_ticker': event_ticker, 'market_type': 'binary',
+              'status': 'active', 'yes_bid': yes_bid, 'yes_ask': yes_bid + 2, 'no_bid': 98 - yes_bid,
+              'no_ask': 100 - yes_bid, 'last_price': yes_bid, 'volume': 10, 'open_interest': 5,
+              'liquidity': 100, 'open_time': collected_at, 'close_time': event['strike_date'],
+              'expiration_time': event['strike_date']}
+    (markets_dir / f"open_markets_{event_ticker}_{date_str}.json").write_text(json.dumps(
+        {'timestamp': collected_at, 'total_markets': 1, 'total_open_markets': 1, 'all_markets': [market]}))
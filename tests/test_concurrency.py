@@ -0,0 +1,48 @@
+import math
+import random
+
+from concurrency import OVERLOAD, AdaptiveLimiter
+
+
+def drive(limiter, requests, latency):
+    for i in range(requests):
+        limiter.acquire()
+        limiter.release(latency(i))
+
+
+def test_limit_stays_near_max_under_load_independent_latency_noise():
+    rng = random.Random(7)
+    sigma = 1.0  # Lognormal around a 100ms mean, whatever the concurrency
+    limiter = AdaptiveLimiter("test", initial=8, max_limit=32)
+    limits = []
+    for _ in range(500):
+        drive(limiter, 40, lambda i: rng.lognormvariate(math.log(0.1) - sigma ** 2 / 2, sigma))
+        limits.append(limiter.limit)
+
+    assert min(limits[10:]) >= 24
+    assert sum(limits) / len(limits) > 30
+
+
+def test_sustained_latency_rise_cuts_limit():
+    limiter = AdaptiveLimiter("test", initial=16, max_limit=16, min_window=20)
+    drive(limiter, 100, lambda i: 0.1)
+    drive(limiter, 20 * limiter.latency_windows, lambda i: 1.0)
+
+    assert limiter.limit < 16
+    assert limiter.history[-1]['reason'] == "latency"
+
+
+def test_single_slow_window_holds_limit():
+    limiter = AdaptiveLimiter("test", initial=16, max_limit=16, min_window=20)
+    drive(limiter, 100, lambda i: 0.1)
+    drive(limiter, 20, lambda i: 1.0)
+
+    assert limiter.limit == 16
+
+
+def test_overload_halves_limit():
+    limiter = AdaptiveLimiter("test", initial=16, max_limit=32)
+    limiter.acquire()
+    limiter.release(0.1, OVERLOAD)
+
+    assert limiter.limit == 8
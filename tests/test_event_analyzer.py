@@ -0,0 +1,13 @@
+from conftest import write_day
+from event_analyzer import EventAnalyzer
+
+
+def test_cache_dir_is_created_on_first_cached_load(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00")
+    analyzer = EventAnalyzer(str(data_dir))
+    assert not (data_dir / "cache").exists()
+
+    summary = analyzer.analyze_archive()
+
+    assert summary['total_events'] == 1
+    assert (data_dir / "cache").is_dir()
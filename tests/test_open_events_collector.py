@@ -0,0 +1,14 @@
+from open_events_collector import EventsCollector
+
+
+def test_change_report_defaults_only_missing_fields():
+    previous = [{'event_ticker': 'OLD', 'title': 'Old', 'category': None, 'strike_date': '', 'series_ticker': 'S'}]
+    current = [{'event_ticker': 'NEW', 'title': 'New'}]
+
+    collector = EventsCollector.__new__(EventsCollector)  # Diffing needs no API client
+    changes = collector.get_event_changes(current, previous)
+
+    assert changes['added'] == [{'event_ticker': 'NEW', 'title': 'New', 'category': 'N/A',
+                                 'strike_date': 'N/A', 'series_ticker': 'N/A'}]
+    assert changes['removed'] == [{'event_ticker': 'OLD', 'title': 'Old', 'category': None,
+                                   'strike_date': '', 'series_ticker': 'S'}]
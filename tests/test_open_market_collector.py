@@ -0,0 +1,26 @@
+import json
+import os
+from datetime import datetime
+
+from benchmark_pipeline import FakeKalshiServer, SyntheticDataGenerator, generate_key_file
+from open_market_collector import run_sharded
+
+
+def test_sharded_run_into_fresh_data_dir(data_dir, tmp_path):
+    generator = SyntheticDataGenerator(num_events=40, num_markets=200)
+    # Only today's events snapshot; the shards create every other directory at once
+    generator.write_open_events(str(data_dir), datetime.now().strftime('%Y%m%d'))
+    key_file = str(tmp_path / "key.pem")
+    generate_key_file(key_file)
+    server = FakeKalshiServer(generator)
+    server.start()
+    try:
+        filename = run_sharded("test", key_file, 4, base_url=server.url, request_delay=0)
+    finally:
+        server.stop()
+
+    with open(filename) as f:
+        merged = json.load(f)
+    assert merged['num_shards'] == 4
+    assert merged['total_events_processed'] == 40
+    assert len(os.listdir(data_dir / "open_markets" / "shards")) == 4
@@ -0,0 +1,17 @@
+import os
+from datetime import datetime, timezone
+
+from conftest import write_day
+from expiry_index import ExpiryIndex
+from reprocess import process_day
+
+
+def test_reprocessed_day_expiry_index_is_as_of_collection_time(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00")
+
+    process_day("20250101")
+
+    index = ExpiryIndex.load(os.path.join(data_dir, "processed_markets", "expiry_index_20250101.npz"))
+    assert index.as_of == datetime(2025, 1, 1, 12, tzinfo=timezone.utc).timestamp()
+    # Closes at 20:00 the same day: within 24h of collection, not in the past
+    assert index.buckets()['24h'] == ["EV-A"]
@@ -0,0 +1,24 @@
+import profiling
+from metrics import registry
+from profiling import category_seconds, profiled, timed
+
+
+def test_timers_record_nothing_outside_a_profiled_run():
+    before = category_seconds()
+    with timed('disk'):
+        pass
+
+    assert category_seconds() == before
+
+
+def test_profiled_run_attributes_nested_time(tmp_path):
+    registry.reset()
+    with profiled("job", enabled=True, profile_dir=str(tmp_path)):
+        with timed('pandas'):
+            with timed('json'):
+                sum(range(100000))
+
+    seconds = category_seconds()
+    assert seconds['json'] > 0 and seconds['pandas'] >= 0
+    assert (tmp_path / "job_profile.json").exists()
+    assert profiling._active == 0
@@ -0,0 +1,35 @@
+import day_archive
+from conftest import write_day
+from process_market_details import MarketDetailsProcessor
+from reprocess import BatchReprocessor, process_day
+
+
+def test_markets_of_a_day_come_from_that_days_file(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00", yes_bid=10)
+    write_day(data_dir, "20250102", "2025-01-02T12:00:00+00:00", yes_bid=90)
+
+    process_day("20250101")
+
+    markets = MarketDetailsProcessor().load_processed_markets("20250101")
+    assert markets['yes_bid'].tolist() == [10]
+
+
+def test_archived_day_is_read_from_its_bundle(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00", yes_bid=10)
+    write_day(data_dir, "20250102", "2025-01-02T12:00:00+00:00", yes_bid=90)
+    day_archive.archive_day(str(data_dir), "20250101")
+    assert not (data_dir / "open_markets_individual" / "open_markets_EV_20250101.json").exists()
+
+    process_day("20250101")
+
+    markets = MarketDetailsProcessor().load_processed_markets("20250101")
+    assert markets['yes_bid'].tolist() == [10]
+
+
+def test_other_days_inputs_do_not_invalidate_a_processed_day(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00")
+    first = BatchReprocessor("20250101", "20250101", workers=1).run()
+    write_day(data_dir, "20250102", "2025-01-02T12:00:00+00:00")
+    second = BatchReprocessor("20250101", "20250101", workers=1).run()
+
+    assert (first['processed'], second['skipped']) == (1, 1)
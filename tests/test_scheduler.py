@@ -0,0 +1,24 @@
+from auth_manager import AuthManager
+from benchmark_pipeline import FakeKalshiServer, SyntheticDataGenerator, generate_key_file
+from scheduler import CollectionScheduler
+
+
+def test_market_refresh_drops_failures_of_closed_events(data_dir, tmp_path):
+    generator = SyntheticDataGenerator(num_events=5, num_markets=20)
+    key_file = str(tmp_path / "key.pem")
+    generate_key_file(key_file)
+    server = FakeKalshiServer(generator)
+    server.start()
+    try:
+        scheduler = CollectionScheduler(AuthManager(key_id="test", key_file_path=key_file), adaptive=False)
+        scheduler.market_data.base_url = server.url
+        scheduler.open_events = generator.events
+        queue = scheduler.market_collector.failure_queue
+        queue.record("CLOSED-EVENT", "markets", TimeoutError("timed out"))
+        queue.record(generator.events[0]['event_ticker'], "markets", TimeoutError("timed out"))
+
+        scheduler.refresh_markets()
+    finally:
+        server.stop()
+
+    assert queue.entries == {}
@@ -0,0 +1,53 @@
+import day_archive
+from conftest import write_day
+from search_index import SearchIndex
+
+
+def test_market_with_an_event_ticker_does_not_replace_the_event(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00", event_ticker="FED", market_ticker="FED")
+
+    index = SearchIndex(str(data_dir))
+    index.update()
+
+    assert {doc['kind'] for doc in index.search('fed')} == {'event', 'market'}
+
+
+def test_archived_days_stay_indexed(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00", event_ticker="OLD")
+    write_day(data_dir, "20250102", "2025-01-02T12:00:00+00:00", event_ticker="NEW")
+    day_archive.archive_day(str(data_dir), "20250101")
+
+    index = SearchIndex(str(data_dir))
+    assert index.update() == 2
+    assert {doc['event_ticker'] for doc in index.search('event', kind='event')} == {'OLD', 'NEW'}
+    assert [doc['ticker'] for doc in index.search('old', kind='market')] == ['OLD-A']
+
+
+def test_refresh_picks_up_markets_collected_after_the_snapshot_was_indexed(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00")
+    (data_dir / "open_markets_individual" / "open_markets_EV_20250101.json").unlink()
+    index = SearchIndex(str(data_dir))
+    index.update()
+    assert index.search('ev', kind='market') == []
+
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00")
+    index.update(refresh="20250101")
+
+    assert [doc['ticker'] for doc in index.search('ev', kind='market')] == ['EV-A']
+    assert SearchIndex(str(data_dir)).snapshots == ['events_20250101.json']
+
+
+def test_index_keeps_only_recent_days(data_dir):
+    write_day(data_dir, "20250101", "2025-01-01T12:00:00+00:00", event_ticker="OLD")
+    write_day(data_dir, "20250105", "2025-01-05T12:00:00+00:00", event_ticker="MID")
+    index = SearchIndex(str(data_dir), keep_days=3)
+    index.update()
+    assert index.snapshots == ['events_20250105.json']
+
+    write_day(data_dir, "20250110", "2025-01-10T12:00:00+00:00", event_ticker="NEW")
+    index.update()
+
+    reloaded = SearchIndex(str(data_dir), keep_days=3)
+    assert reloaded.snapshots == ['events_20250110.json']
+    assert {doc['event_ticker'] for doc in reloaded.docs.values()} == {'NEW'}
+    assert reloaded.search('mid') == []